@@ -1,4 +1,5 @@
 import numpy as np
+from vision4leg.utilities.depth_processing import DepthProcessor
 
 
 class NormedStateHistory():
@@ -52,11 +53,12 @@ class NormedStateHistory():
     # normalize
     return (self.sensor_history.reshape(-1) - mean) / (std + 1e-4)
 
+# Missing returns (0) are treated as far away, like the clipped far range
+_depth_processor = DepthProcessor(
+  min_depth=0.3, max_depth=3, invalid_threshold=1e-3)
+
 def depth_process(depth):
-  depth[depth < 1e-3] = +np.inf
-  depth = np.clip(depth, a_min=0.3, a_max=3)
-  depth = np.sqrt(np.log(depth+1))
-  return depth
+  return _depth_processor.transform(depth)
 
 class VisualHistory():
   def __init__(
@@ -1,6 +1,7 @@
 import re
 import numpy as np
 import pybullet as pyb
+from vision4leg.robots import a1_kinematics
 
 URDF_NAME = "a1/a1.urdf"
 START_POS = [0, 0, 0.32]
@@ -225,8 +226,19 @@ class A1MotorModel(object):
 
 
 class SimpleRobot(object):
-  def __init__(self, pybullet_client, robot_uid, simulation_time_step):
+  def __init__(self, pybullet_client, robot_uid, simulation_time_step,
+               analytic_kinematics=True):
+    """Wraps a loaded A1.
+
+    Args:
+      pybullet_client: The client the robot is loaded in.
+      robot_uid: The unique id of the robot.
+      simulation_time_step: The physics time step.
+      analytic_kinematics: Whether the leg IK and the contact force mapping
+        use the closed form kinematics of a1_kinematics instead of pybullet.
+    """
     self.pybullet_client = pybullet_client
+    self._analytic_kinematics = analytic_kinematics
     self.time_step = simulation_time_step
     self.quadruped = robot_uid
     self.num_legs = NUM_LEGS
@@ -366,12 +378,27 @@ class SimpleRobot(object):
       link_id=self._foot_link_ids[leg_id],
     )
 
+  def ComputeLegJacobian(self, leg_id):
+    """Computes the 3 x 3 Jacobian of a leg in closed form, the columns of
+    the leg joints in ComputeJacobian()."""
+    leg_joint_states = self._joint_states[leg_id * 3:(leg_id + 1) * 3]
+    return a1_kinematics.leg_jacobians(
+      [state[0] for state in leg_joint_states], leg_id)
+
   def MapContactForceToJointTorques(self, leg_id, contact_force):
     """Maps the foot contact force to the leg joint torques."""
+    motors_per_leg = self.num_motors // self.num_legs
+    if self._analytic_kinematics:
+      leg_torques = np.matmul(contact_force, self.ComputeLegJacobian(leg_id))
+      return {
+        joint_id: torque * self._motor_direction[joint_id]
+        for joint_id, torque in zip(
+          range(leg_id * motors_per_leg, (leg_id + 1) * motors_per_leg),
+          leg_torques)
+      }
     jv = self.ComputeJacobian(leg_id)
     all_motor_torques = np.matmul(contact_force, jv)
     motor_torques = {}
-    motors_per_leg = self.num_motors // self.num_legs
     com_dof = 6
     for joint_id in range(leg_id * motors_per_leg,
                           (leg_id + 1) * motors_per_leg):
@@ -479,12 +506,17 @@ class SimpleRobot(object):
       i for i in range(leg_id * motors_per_leg, leg_id * motors_per_leg +
                        motors_per_leg)
     ]
-    joint_angles = self.joint_angles_from_link_position(
-      robot=self,
-      link_position=position,
-      link_id=toe_id,
-      joint_ids=joint_position_idxs,
-      position_in_world_frame=position_in_world_frame)
+    if self._analytic_kinematics and not position_in_world_frame:
+      joint_angles = (
+        a1_kinematics.joint_angles_from_foot_positions_in_base_frame(
+          position, leg_id))
+    else:
+      joint_angles = self.joint_angles_from_link_position(
+        robot=self,
+        link_position=position,
+        link_id=toe_id,
+        joint_ids=joint_position_idxs,
+        position_in_world_frame=position_in_world_frame)
     # Joint offset is necessary for A1.
     joint_angles = np.multiply(
       np.asarray(joint_angles) -
@@ -0,0 +1,63 @@
+import os
+os.environ['PYOPENGL_PLATFORM'] = 'egl'
+os.environ['EGL_LOG_LEVEL'] = 'fatal'
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import copy
+import argparse
+import numpy as np
+from vision4leg.get_env import get_env
+from torchrl.utils import get_params
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Env Reset Benchmark')
+  parser.add_argument("--config", type=str,
+                      default="config/rl/static/locotransformer/thin.json",
+                      help="config file")
+  parser.add_argument('--episodes', type=int, default=10,
+                      help='episodes per reset mode')
+  parser.add_argument('--episode_steps', type=int, default=10,
+                      help='env steps per episode')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='random seed')
+  parser.add_argument('--cache_settled_state', action='store_true',
+                      help='restore cached settled robot states')
+  return parser.parse_args()
+
+
+def episodes_per_second(params, hard_reset, episodes, episode_steps, seed,
+                        cache_settled_state=False):
+  env_param = copy.deepcopy(params["env"])
+  env_param["env_build"]["enable_hard_reset"] = hard_reset
+  if cache_settled_state:
+    env_param["env_build"]["cache_settled_state"] = True
+  env = get_env(params["env_name"], env_param)
+  env.seed(seed)
+  np.random.seed(seed)
+  action = np.zeros(env.action_space.shape)
+  reset_time = 0
+  start = time.time()
+  for _ in range(episodes):
+    reset_start = time.time()
+    env.reset()
+    reset_time += time.time() - reset_start
+    for _ in range(episode_steps):
+      env.step(action)
+  total_time = time.time() - start
+  env.close()
+  return episodes / total_time, reset_time / episodes
+
+
+if __name__ == "__main__":
+  args = get_args()
+  params = get_params(args.config)
+  print("{} episodes of {} steps, {}".format(
+    args.episodes, args.episode_steps, args.config))
+  for hard_reset in [True, False]:
+    eps, reset_time = episodes_per_second(
+      params, hard_reset, args.episodes, args.episode_steps, args.seed,
+      args.cache_settled_state)
+    print("{:>10}: {:.2f} episodes/s, {:.1f} ms per reset".format(
+      "hard" if hard_reset else "soft", eps, reset_time * 1000))
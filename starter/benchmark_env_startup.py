@@ -0,0 +1,51 @@
+import os
+os.environ['PYOPENGL_PLATFORM'] = 'egl'
+os.environ['EGL_LOG_LEVEL'] = 'fatal'
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import copy
+import argparse
+from vision4leg.get_env import get_subprocvec_env
+from torchrl.utils import get_params
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Env Startup Benchmark')
+  parser.add_argument("--config", type=str,
+                      default="config/rl/static/locotransformer/thin.json",
+                      help="config file")
+  parser.add_argument('--vec_env_nums', type=int, default=8,
+                      help='vec env nums')
+  parser.add_argument('--proc_nums', type=int, default=4,
+                      help='proc nums')
+  parser.add_argument('--start_methods', type=str, nargs='+',
+                      default=["spawn", "forkserver"],
+                      help='multiprocessing start methods to compare')
+  return parser.parse_args()
+
+
+def startup_time(params, vec_env_nums, proc_nums, start_method):
+  env_param = copy.deepcopy(params["env"])
+  env_param["start_method"] = start_method
+  start = time.time()
+  env = get_subprocvec_env(
+    params["env_name"], env_param, vec_env_nums, proc_nums)
+  construct_time = time.time() - start
+  # the first reset waits until every worker has built its envs
+  env.reset()
+  ready_time = time.time() - start
+  env.close()
+  return construct_time, ready_time
+
+
+if __name__ == "__main__":
+  args = get_args()
+  params = get_params(args.config)
+  print("{} envs in {} workers, {}".format(
+    args.vec_env_nums, args.proc_nums, args.config))
+  for start_method in args.start_methods:
+    construct_time, ready_time = startup_time(
+      params, args.vec_env_nums, args.proc_nums, start_method)
+    print("{:>10}: constructed {:.2f}s, first reset done {:.2f}s".format(
+      start_method, construct_time, ready_time))
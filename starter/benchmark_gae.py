@@ -0,0 +1,124 @@
+import sys
+sys.path.append(".")
+import time
+import argparse
+import numpy as np
+import torch
+from torchrl.replay_buffers.on_policy import OnPolicyReplayBuffer
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='GAE Benchmark')
+  parser.add_argument('--buffer_size', type=int, default=16384,
+                      help='replay buffer size')
+  parser.add_argument('--env_nums', type=int, default=16,
+                      help='vec env nums')
+  parser.add_argument('--repeat', type=int, default=5,
+                      help='number of repeats for timing')
+  parser.add_argument("--device", type=str, default=None,
+                      help="also benchmark torch backend on the device")
+  return parser.parse_args()
+
+
+def reference_gae(buffer, last_value, gamma, tau):
+  # Step by step implementation used before vectorization
+  A = 0
+  advs = []
+  estimate_returns = []
+  values = np.concatenate([buffer._values, np.array([last_value])], 0)
+  for t in reversed(range(len(buffer._rewards))):
+    delta = buffer._rewards[t] + \
+      (1 - buffer._terminals[t]) * gamma * values[t + 1] - \
+      values[t]
+    A = delta + (1 - buffer._terminals[t]) * gamma * tau * A
+    if buffer.time_limit_filter:
+      A = A * (1 - buffer._time_limits[t])
+    advs.insert(0, A)
+    estimate_returns.insert(0, A + values[t])
+  return np.array(advs), np.array(estimate_returns)
+
+
+def reference_discount_reward(buffer, last_value, gamma):
+  advs = []
+  estimate_returns = []
+  R = last_value
+  for t in reversed(range(len(buffer._rewards))):
+    if buffer.time_limit_filter:
+      R = (buffer._rewards[t] +
+           (1 - buffer._terminals[t]) * gamma * R *
+           (1 - buffer._time_limits[t])) + \
+        buffer._time_limits[t] * buffer._values[t]
+    else:
+      R = buffer._rewards[t] + \
+        (1 - buffer._terminals[t]) * gamma * R
+    advs.insert(0, R - buffer._values[t])
+    estimate_returns.insert(0, R)
+  return np.array(advs), np.array(estimate_returns)
+
+
+def build_buffer(args, time_limit_filter):
+  buffer = OnPolicyReplayBuffer(
+    env_nums=args.env_nums,
+    max_replay_buffer_size=args.buffer_size,
+    time_limit_filter=time_limit_filter
+  )
+  for _ in range(args.buffer_size // args.env_nums):
+    terminals = np.random.rand(args.env_nums, 1) < 0.01
+    buffer.add_sample({
+      "values": np.random.randn(args.env_nums, 1),
+      "rewards": np.random.randn(args.env_nums, 1),
+      "terminals": terminals,
+      "time_limits": terminals & (np.random.rand(args.env_nums, 1) < 0.5)
+    })
+  return buffer
+
+
+def timeit(func, repeat):
+  start = time.time()
+  for _ in range(repeat):
+    func()
+  return (time.time() - start) / repeat
+
+
+def benchmark(args, time_limit_filter):
+  buffer = build_buffer(args, time_limit_filter)
+  last_value = np.random.randn(args.env_nums, 1)
+  gamma, tau = 0.99, 0.95
+
+  cases = [
+    ("gae", lambda: reference_gae(buffer, last_value, gamma, tau),
+     lambda device: buffer.generalized_advantage_estimation(
+       last_value, gamma, tau, device=device)),
+    ("discount_reward",
+     lambda: reference_discount_reward(buffer, last_value, gamma),
+     lambda device: buffer.discount_reward(
+       last_value, gamma, device=device)),
+  ]
+  for name, reference_func, func in cases:
+    ref_advs, ref_rets = reference_func()
+    devices = [None]
+    if args.device is not None:
+      devices.append(args.device)
+    for device in devices:
+      func(device)
+      # numpy is exact, the torch scan sums in another order
+      check = np.array_equal if device is None else np.allclose
+      assert check(buffer._advs, ref_advs)
+      assert check(buffer._estimate_returns, ref_rets)
+
+    ref_time = timeit(reference_func, args.repeat)
+    print("{} (time_limit_filter={}): reference {:.4f}s".format(
+      name, time_limit_filter, ref_time))
+    for device in devices:
+      vec_time = timeit(lambda: func(device), args.repeat)
+      print("  {:>8}: {:.4f}s, speedup {:.1f}x".format(
+        "numpy" if device is None else device,
+        vec_time, ref_time / vec_time))
+
+
+if __name__ == "__main__":
+  args = get_args()
+  np.random.seed(0)
+  torch.manual_seed(0)
+  for time_limit_filter in [False, True]:
+    benchmark(args, time_limit_filter)
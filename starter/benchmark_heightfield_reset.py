@@ -0,0 +1,56 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import argparse
+import tempfile
+import numpy as np
+from vision4leg.envs import env_builder
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Heightfield Reset Benchmark')
+  parser.add_argument('--terrain_type', type=str, default="random_heightfield")
+  parser.add_argument('--resets', type=int, default=10,
+                      help='hard resets per mode')
+  parser.add_argument('--num_heightfields', type=int, default=8,
+                      help='heightfields of the cached mode')
+  parser.add_argument('--cache_settled_state', action='store_true',
+                      help='restore cached settled robot states')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='random seed')
+  return parser.parse_args()
+
+
+def seconds_per_reset(args, **params):
+  """Builds a hard reset env and times full resets, including the
+  heightfield and robot rebuild and the settle motion."""
+  np.random.seed(args.seed)
+  env = env_builder.build_a1_ground_env(
+    terrain_type=args.terrain_type, enable_hard_reset=True,
+    cache_settled_state=args.cache_settled_state, **params)
+  env.seed(args.seed)
+  # The first reset fills the caches.
+  env.reset()
+  start = time.perf_counter()
+  for _ in range(args.resets):
+    env.reset()
+  elapsed = time.perf_counter() - start
+  env.close()
+  return elapsed / args.resets
+
+
+if __name__ == "__main__":
+  args = get_args()
+  print("{} hard resets on {}".format(args.resets, args.terrain_type))
+  print("{:>10}: {:.1f} ms per reset".format(
+    "generated", seconds_per_reset(args) * 1e3))
+  with tempfile.TemporaryDirectory() as cache_dir:
+    # Generates and stores every field once.
+    seconds_per_reset(
+      args, num_heightfields=args.num_heightfields,
+      heightfield_cache_dir=cache_dir)
+    print("{:>10}: {:.1f} ms per reset".format(
+      "cached", seconds_per_reset(
+        args, num_heightfields=args.num_heightfields,
+        heightfield_cache_dir=cache_dir) * 1e3))
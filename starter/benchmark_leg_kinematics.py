@@ -0,0 +1,68 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import argparse
+import numpy as np
+import pybullet
+import pybullet_data as pd
+from pybullet_utils import bullet_client
+from mpc_controller import a1_sim as robot_sim
+from mpc_controller import locomotion_controller_example
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Leg Kinematics Benchmark')
+  parser.add_argument('--steps', type=int, default=500,
+                      help='control ticks per mode')
+  return parser.parse_args()
+
+
+def build_controller(analytic_kinematics):
+  p = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+  p.setAdditionalSearchPath(pd.getDataPath())
+  p.setPhysicsEngineParameter(numSolverIterations=30)
+  p.setPhysicsEngineParameter(enableConeFriction=0)
+  p.setTimeStep(0.001)
+  p.setGravity(0, 0, -9.8)
+  p.loadURDF("plane.urdf")
+  robot_uid = p.loadURDF(robot_sim.URDF_NAME, robot_sim.START_POS)
+  robot = robot_sim.SimpleRobot(
+    p, robot_uid, simulation_time_step=0.001,
+    analytic_kinematics=analytic_kinematics)
+  controller = locomotion_controller_example._setup_controller(robot)
+  controller.reset()
+  return robot, controller
+
+
+def run(analytic_kinematics, steps):
+  """Trots in place and times the leg controllers' get_action."""
+  robot, controller = build_controller(analytic_kinematics)
+  swing_time = stance_time = 0.
+  for _ in range(steps):
+    controller.update()
+    start = time.perf_counter()
+    swing_action = controller.swing_leg_controller.get_action()
+    swing_end = time.perf_counter()
+    stance_action, _ = controller.stance_leg_controller.get_action()
+    stance_time += time.perf_counter() - swing_end
+    swing_time += swing_end - start
+    action = []
+    for joint_id in range(robot.num_motors):
+      if joint_id in swing_action:
+        action.extend(swing_action[joint_id])
+      else:
+        action.extend(stance_action[joint_id])
+    robot.Step(np.array(action))
+  return swing_time / steps, stance_time / steps, robot.GetBasePosition()
+
+
+if __name__ == "__main__":
+  args = get_args()
+  for name, analytic_kinematics in [("pybullet", False), ("analytic", True)]:
+    swing_time, stance_time, base_position = run(
+      analytic_kinematics, args.steps)
+    print("{:>9}: swing get_action {:.1f}us, stance get_action {:.1f}us, "
+          "base ends at {}".format(
+            name, swing_time * 1e6, stance_time * 1e6,
+            np.round(base_position, 3)))
@@ -0,0 +1,137 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import argparse
+import numpy as np
+import pybullet
+import pybullet_data as pd
+from pybullet_utils import bullet_client
+from mpc_controller import a1_sim as robot_sim
+from vision4leg.envs import env_builder
+from vision4leg.robots import a1_kinematics
+from vision4leg.robots import minitaur
+
+# Joint ranges the random poses are drawn from, abduction, hip and knee.
+JOINT_LOW = np.array([-0.6, -0.8, -2.5])
+JOINT_HIGH = np.array([0.6, 1.6, -0.9])
+# Contact forces of a standing robot, in N.
+FORCE_SCALE = 60.
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Leg Kinematics Accuracy')
+  parser.add_argument('--poses', type=int, default=200,
+                      help='random poses per robot')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='random seed')
+  return parser.parse_args()
+
+
+def set_pose(robot, joint_ids, joint_angles):
+  for joint_id, angle in zip(joint_ids, joint_angles):
+    robot.pybullet_client.resetJointState(robot.quadruped, joint_id, angle)
+  robot.ReceiveObservation()
+
+
+def check_robot(robot, joint_ids, poses, random_state, pybullet_torques,
+                pybullet_ik):
+  """Compares the closed form kinematics of a robot with pybullet.
+
+  Args:
+    robot: An A1 or SimpleRobot with identity motor directions and offsets.
+    joint_ids: The pybullet joint ids of the 12 motors.
+    poses: The number of random poses.
+    random_state: A np.random.RandomState.
+    pybullet_torques: Maps (leg_id, force) to the motor torques through the
+      3 x N pybullet Jacobian.
+    pybullet_ik: Maps (leg_id, foot position) to the motor angles computed
+      by pybullet.
+
+  Returns:
+    A dictionary of the largest errors.
+  """
+  errors = dict(forward=0., jacobian=0., torque=0., ik=0., pybullet_ik=0.)
+  for _ in range(poses):
+    joint_angles = random_state.uniform(
+      JOINT_LOW, JOINT_HIGH, size=(a1_kinematics.NUM_LEGS, 3))
+    set_pose(robot, joint_ids, joint_angles.reshape(-1))
+    foot_positions = robot.GetFootPositionsInBaseFrame()
+    errors["forward"] = max(errors["forward"], np.abs(
+      a1_kinematics.foot_positions_in_base_frame(joint_angles) -
+      foot_positions).max())
+    for leg_id in range(a1_kinematics.NUM_LEGS):
+      jacobian = robot.ComputeJacobian(leg_id)
+      assert jacobian.shape == (3, 6 + robot.num_motors), jacobian.shape
+      errors["jacobian"] = max(errors["jacobian"], np.abs(
+        robot.ComputeLegJacobian(leg_id) -
+        jacobian[:, 6 + 3 * leg_id:9 + 3 * leg_id]).max())
+
+      force = random_state.uniform(-FORCE_SCALE, FORCE_SCALE, 3)
+      torques = robot.MapContactForceToJointTorques(leg_id, force)
+      reference = pybullet_torques(leg_id, force)
+      assert sorted(torques) == sorted(reference)
+      errors["torque"] = max(errors["torque"], max(
+        abs(torques[joint_id] - reference[joint_id]) for joint_id in torques))
+
+      # IK of the current foot position, solved from a neutral pose.
+      set_pose(robot, joint_ids, np.tile(
+        (JOINT_LOW + JOINT_HIGH) / 2, a1_kinematics.NUM_LEGS))
+      for name, ik in [("ik", robot.ComputeMotorAnglesFromFootLocalPosition),
+                       ("pybullet_ik", pybullet_ik)]:
+        _, angles = ik(leg_id, foot_positions[leg_id])
+        reached = a1_kinematics.foot_positions_in_base_frame(
+          angles, leg_id)
+        errors[name] = max(errors[name], np.abs(
+          reached - foot_positions[leg_id]).max())
+      set_pose(robot, joint_ids, joint_angles.reshape(-1))
+  return errors
+
+
+def check_a1(args):
+  env = env_builder.build_a1_ground_env()
+  robot = env.robot
+  errors = check_robot(
+    robot, robot._motor_id_list, args.poses,
+    np.random.RandomState(args.seed),
+    lambda leg_id, force: minitaur.Minitaur.MapContactForceToJointTorques(
+      robot, leg_id, force),
+    lambda leg_id, position: minitaur.Minitaur.
+    ComputeMotorAnglesFromFootLocalPosition(robot, leg_id, position))
+  env.close()
+  return errors
+
+
+def check_simple_robot(args):
+  p = bullet_client.BulletClient(connection_mode=pybullet.DIRECT)
+  p.setAdditionalSearchPath(pd.getDataPath())
+  p.setTimeStep(0.001)
+  p.setGravity(0, 0, -9.8)
+  robot_uid = p.loadURDF(robot_sim.URDF_NAME, robot_sim.START_POS)
+  robot = robot_sim.SimpleRobot(p, robot_uid, simulation_time_step=0.001)
+
+  def pybullet_path(method):
+    def call(leg_id, value):
+      robot._analytic_kinematics = False
+      try:
+        return method(leg_id, value)
+      finally:
+        robot._analytic_kinematics = True
+    return call
+
+  errors = check_robot(
+    robot, robot._motor_id_list, args.poses,
+    np.random.RandomState(args.seed),
+    pybullet_path(robot.MapContactForceToJointTorques),
+    pybullet_path(robot.ComputeMotorAnglesFromFootLocalPosition))
+  p.disconnect()
+  return errors
+
+
+if __name__ == "__main__":
+  args = get_args()
+  for name, check in [("A1", check_a1), ("SimpleRobot", check_simple_robot)]:
+    errors = check(args)
+    print("{:>11}: forward kinematics {:.1e}m, leg Jacobian {:.1e}, "
+          "torques {:.1e}Nm, IK {:.1e}m (pybullet IK {:.1e}m)".format(
+            name, errors["forward"], errors["jacobian"], errors["torque"],
+            errors["ik"], errors["pybullet_ik"]))
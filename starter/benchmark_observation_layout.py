@@ -0,0 +1,93 @@
+import os
+os.environ['PYOPENGL_PLATFORM'] = 'egl'
+os.environ['EGL_LOG_LEVEL'] = 'fatal'
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import argparse
+import multiprocessing
+import numpy as np
+from vision4leg.envs import env_builder
+from vision4leg.envs.utilities import env_utils
+
+# Terrains and sensor sets the flat layout is checked on.
+CONFIGS = [
+  dict(terrain_type="plane"),
+  dict(terrain_type="random_blocks_sparse", add_last_action_input=True,
+       rotate_sensor=True),
+  dict(terrain_type="random_heightfield", no_displacement=True,
+       get_image=True, depth_image=True, depth_norm=True),
+  dict(terrain_type="random_blocks_sparse_thin_wide",
+       domain_randomization=True, get_image=True, depth_image=True,
+       depth_norm=True, frame_extract=2, interpolation=True),
+  dict(terrain_type="stairs", add_last_action_input=True),
+  dict(terrain_type="mount", goal=True, get_image=True, depth_image=True),
+]
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Observation Layout Check')
+  parser.add_argument('--episodes', type=int, default=2,
+                      help='episodes per config')
+  parser.add_argument('--episode_steps', type=int, default=20,
+                      help='env steps per episode')
+  parser.add_argument('--seed', type=int, default=0,
+                      help='random seed')
+  return parser.parse_args()
+
+
+def dictionary_observation(env):
+  """Returns the current observation built as a dictionary and flattened by
+  env_utils.flatten_observations(), from the depth frames already rendered.
+  """
+  gym_env = env._gym_env
+  layout = gym_env._observation_layout
+  gym_env._flat_observation = False
+  gym_env._observation_layout = None
+  try:
+    observation = gym_env._get_observation(render=False)
+  finally:
+    gym_env._flat_observation = True
+    gym_env._observation_layout = layout
+  return env_utils.flatten_observations(observation)
+
+
+def check(params, episodes, episode_steps, seed):
+  """Compares the flat observations of seeded random episodes with the
+  flattened dictionaries of the same states.
+
+  Returns:
+    The number of observations compared and their size.
+  """
+  np.random.seed(seed)
+  env = env_builder.build_a1_ground_env(**params)
+  env.seed(seed)
+  count = 0
+  for _ in range(episodes):
+    observation = env.reset()
+    for step in range(episode_steps + 1):
+      reference = dictionary_observation(env)
+      assert observation.dtype == np.float32
+      assert observation.shape == reference.shape
+      # the layout writes the same values into a float32 buffer
+      assert np.array_equal(observation, reference.astype(np.float32)), \
+        "flat layout differs from flatten_observations on {}".format(params)
+      count += 1
+      if step == episode_steps:
+        break
+      action = np.array(env_builder.a1.INIT_MOTOR_ANGLES) + \
+        np.random.uniform(-0.3, 0.3, env.action_space.shape)
+      observation = env.step(action)[0]
+  env.close()
+  return count, observation.size
+
+
+if __name__ == "__main__":
+  args = get_args()
+  # A fresh process per config, EGL contexts of closed envs are not
+  # reliably released within a process.
+  context = multiprocessing.get_context("spawn")
+  for params in CONFIGS:
+    with context.Pool(1) as pool:
+      count, size = pool.apply(
+        check, (params, args.episodes, args.episode_steps, args.seed))
+    print("{}: {} observations of size {} equal".format(params, count, size))
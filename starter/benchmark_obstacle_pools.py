@@ -0,0 +1,60 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import argparse
+from vision4leg.envs import env_builder
+from vision4leg.envs.utilities import a1_randomizer_ground as a1_rg
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Obstacle Pool Benchmark')
+  parser.add_argument('--terrain_types', type=str, nargs='+',
+                      default=["random_blocks_sparse",
+                               "random_blocks_sparse_thin_wide"],
+                      help='terrain types to measure')
+  parser.add_argument('--builds', type=int, default=5,
+                      help='obstacle builds per terrain')
+  parser.add_argument('--resamples', type=int, default=50,
+                      help='layout resamples per terrain')
+  parser.add_argument('--steps', type=int, default=500,
+                      help='moving obstacle steps per terrain')
+  return parser.parse_args()
+
+
+def get_terrain_randomizer(env):
+  for randomizer in env._env_randomizers:
+    if isinstance(randomizer, a1_rg.TerrainRandomizer):
+      return randomizer
+
+
+def timed(fn, repeats):
+  start = time.perf_counter()
+  for _ in range(repeats):
+    fn()
+  return (time.perf_counter() - start) / repeats
+
+
+if __name__ == "__main__":
+  args = get_args()
+  for terrain_type in args.terrain_types:
+    env = env_builder.build_a1_ground_env(
+      terrain_type=terrain_type, moving=True)
+    env.reset()
+    randomizer = get_terrain_randomizer(env)
+
+    def build():
+      # What a hard reset does after resetSimulation(), the bodies of the
+      # previous builds stay in the world.
+      randomizer._created = False
+      randomizer.randomize_env(env)
+
+    build_time = timed(build, args.builds)
+    resample_time = timed(
+      lambda: randomizer.randomize_env(env), args.resamples)
+    # Off the steps that also redraw the block directions.
+    env._env_step_counter = 1
+    step_time = timed(lambda: randomizer.randomize_step(env), args.steps)
+    print("{}: build {:.2f}ms, resample {:.2f}ms, moving step {:.1f}us".format(
+      terrain_type, build_time * 1e3, resample_time * 1e3, step_time * 1e6))
+    env.close()
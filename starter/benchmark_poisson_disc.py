@@ -0,0 +1,97 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import math
+import time
+import argparse
+import numpy as np
+from vision4leg.envs.utilities import a1_randomizer_ground as a1_rg
+
+# (grid_length, grid_width, min_radius, max_sample_size) of the randomizers.
+LAYOUTS = [(26, 6, 1., 150), (26, 6, 1.1, 50), (24, 6, 1.2, 50)]
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Poisson Disc Benchmark')
+  parser.add_argument('--seeds', type=int, default=200,
+                      help='layouts checked per configuration')
+  parser.add_argument('--reference_seeds', type=int, default=10,
+                      help='layouts compared with the reference sampler')
+  return parser.parse_args()
+
+
+def reference_layout(grid_length, grid_width, min_radius, max_sample_size):
+  """Bridson sampling one sample at a time, checking all points."""
+  points = [np.random.random_sample(2) * [grid_length, grid_width]]
+  active_list = [points[0]]
+  while active_list:
+    active_point = active_list.pop()
+    for _ in range(max_sample_size):
+      random_radius = np.random.uniform(min_radius, 2 * min_radius)
+      random_angle = np.random.uniform(0, 2 * math.pi)
+      sample = random_radius * np.array(
+        [np.cos(random_angle), np.sin(random_angle)]) + active_point
+      if not (0 <= sample[0] < grid_length and 0 <= sample[1] < grid_width):
+        continue
+      if np.min(np.sum((np.array(points) - sample) ** 2, axis=1)) < (
+          min_radius ** 2):
+        continue
+      active_list.append(sample)
+      points.append(sample)
+  return points
+
+
+def sort_points(points):
+  points = np.array(points)
+  return points[np.lexsort(points.T[::-1])]
+
+
+def check(layout, seeds, reference_seeds):
+  grid_length, grid_width, min_radius, _ = layout
+  # Probe points to check that the layouts leave no big holes.
+  probes = np.stack(np.meshgrid(
+    np.linspace(0, grid_length, 105), np.linspace(0, grid_width, 25)),
+    axis=-1).reshape(-1, 2)
+  counts, min_distances, hole_radii = [], [], []
+  sample_time = 0.
+  for seed in range(seeds):
+    np.random.seed(seed)
+    start = time.perf_counter()
+    points = np.array(a1_rg.PoissonDisc2D(*layout).generate())
+    sample_time += time.perf_counter() - start
+    assert np.all((points >= 0) & (points < [grid_length, grid_width]))
+    distances = np.sqrt(np.sum(
+      (points[:, None] - points[None]) ** 2, axis=-1))
+    np.fill_diagonal(distances, np.inf)
+    counts.append(len(points))
+    min_distances.append(distances.min())
+    hole_radii.append(np.sqrt(np.sum(
+      (probes[:, None] - points[None]) ** 2, axis=-1)).min(axis=1).max())
+  sample_time /= seeds
+
+  # Same seed, same random stream: the layouts must be identical.
+  start = time.perf_counter()
+  for seed in range(reference_seeds):
+    np.random.seed(seed)
+    expected = sort_points(reference_layout(*layout))
+    np.random.seed(seed)
+    actual = sort_points(a1_rg.PoissonDisc2D(*layout).generate())
+    assert expected.shape == actual.shape and np.allclose(expected, actual), \
+      "layout {} differs from the reference for seed {}".format(layout, seed)
+  reference_time = (time.perf_counter() - start) / reference_seeds
+  assert min(min_distances) >= min_radius, \
+    "points closer than {}: {}".format(min_radius, min(min_distances))
+  # Every probe is within 2 * min_radius of a point unless sampling stopped
+  # early, which happens with probability vanishing in max_sample_size.
+  assert np.mean(np.array(hole_radii) < 2 * min_radius) > 0.95
+
+  print("{}: {:.1f} +- {:.1f} points, min distance {:.3f}, largest hole "
+        "{:.3f}, {:.2f}ms per layout (reference {:.1f}ms)".format(
+          layout, np.mean(counts), np.std(counts), min(min_distances),
+          max(hole_radii), sample_time * 1e3, reference_time * 1e3))
+
+
+if __name__ == "__main__":
+  args = get_args()
+  for layout in LAYOUTS:
+    check(layout, args.seeds, args.reference_seeds)
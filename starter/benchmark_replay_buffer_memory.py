@@ -0,0 +1,71 @@
+import sys
+sys.path.append(".")
+import argparse
+import numpy as np
+from torchrl.replay_buffers.on_policy import OnPolicyReplayBuffer
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Replay Buffer Memory')
+  parser.add_argument('--buffer_size', type=int, default=16384,
+                      help='replay buffer size')
+  parser.add_argument('--env_nums', type=int, default=16,
+                      help='vec env nums')
+  parser.add_argument('--state_dim', type=int, default=93,
+                      help='dim of the state part of obs')
+  parser.add_argument('--img_channels', type=int, default=4,
+                      help='channels of the depth image part of obs')
+  parser.add_argument('--act_dim', type=int, default=12,
+                      help='action dim')
+  return parser.parse_args()
+
+
+def fill(buffer, args):
+  obs_dim = args.state_dim + args.img_channels * 64 * 64
+  # Range of sqrt(log(depth + 1)) normalized by depth_norm
+  low, high = -1.74, 0.71
+  for _ in range(args.buffer_size // args.env_nums):
+    obs = np.concatenate([
+      np.random.randn(args.env_nums, args.state_dim),
+      np.random.uniform(
+        low, high, (args.env_nums, obs_dim - args.state_dim))
+    ], axis=-1)
+    buffer.add_sample({
+      "obs": obs,
+      "next_obs": obs,
+      "acts": np.random.randn(args.env_nums, args.act_dim),
+      "values": np.random.randn(args.env_nums, 1),
+      "rewards": np.random.randn(args.env_nums, 1),
+      "terminals": np.zeros((args.env_nums, 1)),
+      "time_limits": np.zeros((args.env_nums, 1))
+    })
+  return obs
+
+
+if __name__ == "__main__":
+  args = get_args()
+  img_quantize = {
+    "start": args.state_dim,
+    "quantized_dtype": "uint8",
+    "scale": (0.71 + 1.74) / 255,
+    "offset": -1.74
+  }
+  settings = [
+    ("float64 (before)", dict(default_dtype=np.float64)),
+    ("float32", dict()),
+    ("float32, last next_obs only", dict(store_next_obs=False)),
+    ("float32 + uint8 depth, last next_obs only", dict(
+      store_next_obs=False, quantize={"obs": img_quantize})),
+  ]
+  for name, kwargs in settings:
+    buffer = OnPolicyReplayBuffer(
+      env_nums=args.env_nums,
+      max_replay_buffer_size=args.buffer_size,
+      time_limit_filter=True,
+      **kwargs
+    )
+    last_obs = fill(buffer, args)
+    error = np.abs(buffer.last_sample(["obs"])["obs"] - last_obs).max()
+    print("== {} (max abs error {:.4f})".format(name, error))
+    print(buffer.memory_report())
+    del buffer
@@ -0,0 +1,56 @@
+import os
+os.environ['PYOPENGL_PLATFORM'] = 'egl'
+os.environ['EGL_LOG_LEVEL'] = 'fatal'
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import copy
+import argparse
+import numpy as np
+from vision4leg.get_env import get_single_env
+from vision4leg.robots import robot_config
+from torchrl.utils import get_params
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Robot Substep Benchmark')
+  parser.add_argument("--config", type=str,
+                      default="config/rl/static/locotransformer/thin.json",
+                      help="config file")
+  parser.add_argument('--steps', type=int, default=500,
+                      help='control steps per measurement')
+  parser.add_argument('--repeats', type=int, default=3,
+                      help='measurements per mode, the best one is reported')
+  return parser.parse_args()
+
+
+def get_gym_env(env):
+  while not hasattr(env, "_gym_env"):
+    env = env.env if hasattr(env, "env") else env._wrapped_env
+  return env._gym_env
+
+
+def substeps_per_second(robot, steps, follow_camera):
+  robot._follow_camera = follow_camera
+  action = np.array(robot.GetMotorAngles())
+  start = time.time()
+  for _ in range(steps):
+    robot.Step(action)
+  return steps * robot._action_repeat / (time.time() - start)
+
+
+if __name__ == "__main__":
+  args = get_args()
+  params = get_params(args.config)
+  env_param = copy.deepcopy(params["env"])
+  env_param["env_build"]["get_image"] = False
+  env = get_gym_env(get_single_env(params["env_name"], env_param))
+  env.reset()
+  robot = env.robot
+  assert (robot._motor_control_mode ==
+          robot_config.MotorControlMode.POSITION)
+  print("{}, action repeat {}".format(args.config, robot._action_repeat))
+  for name, follow_camera in [("camera calls", True), ("headless", False)]:
+    rate = max(substeps_per_second(robot, args.steps, follow_camera)
+               for _ in range(args.repeats))
+    print("{:>12}: {:.0f} substeps/s".format(name, rate))
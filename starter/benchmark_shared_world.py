@@ -0,0 +1,77 @@
+import os
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import argparse
+import multiprocessing
+import numpy as np
+from torchrl.env.vecenv import VecEnv
+from vision4leg.envs import env_builder
+from vision4leg.envs.shared_world_env import SharedWorldVecEnv
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Shared World Benchmark')
+  parser.add_argument('--env_nums', type=int, nargs='+', default=[1, 4, 8],
+                      help='robots per process')
+  parser.add_argument('--terrain_type', type=str,
+                      default="random_blocks_sparse")
+  parser.add_argument('--get_image', action='store_true',
+                      help='render the depth images too')
+  parser.add_argument('--steps', type=int, default=200,
+                      help='vector env steps per measurement')
+  return parser.parse_args()
+
+
+def build_params(args):
+  params = dict(terrain_type=args.terrain_type, cache_settled_state=True)
+  if args.get_image:
+    params.update(get_image=True, depth_image=True, depth_norm=True)
+  return params
+
+
+def rss_mb():
+  return int(open("/proc/self/statm").read().split()[1]) * 4096 / 2 ** 20
+
+
+def run(shared, env_nums, params, steps):
+  """Steps robots near their standing pose.
+
+  Returns:
+    The seconds per robot step and the memory the envs took, in MB.
+  """
+  start_rss = rss_mb()
+  if shared:
+    vec_env = SharedWorldVecEnv(
+      env_nums, env_builder.build_a1_ground_env, params)
+  else:
+    vec_env = VecEnv(
+      env_nums, lambda: env_builder.build_a1_ground_env(**params), [])
+  np.random.seed(0)
+  vec_env.reset()
+  actions = np.tile(env_builder.a1.INIT_MOTOR_ANGLES, (env_nums, 1))
+  start = time.perf_counter()
+  for _ in range(steps):
+    vec_env.step(actions + np.random.uniform(-0.2, 0.2, actions.shape))
+  elapsed = time.perf_counter() - start
+  memory = rss_mb() - start_rss
+  vec_env.close()
+  return elapsed / (steps * env_nums), memory
+
+
+if __name__ == "__main__":
+  args = get_args()
+  params = build_params(args)
+  # A fresh process per measurement, freed memory is not returned to the OS.
+  context = multiprocessing.get_context("spawn")
+  for env_nums in args.env_nums:
+    results = []
+    for shared in [False, True]:
+      with context.Pool(1) as pool:
+        results.append(pool.apply(
+          run, (shared, env_nums, params, args.steps)))
+    (separate, separate_memory), (shared, shared_memory) = results
+    print("{} robots: separate clients {:.2f}ms {:.0f}MB, shared world "
+          "{:.2f}ms {:.0f}MB per robot step ({:.2f}x)".format(
+            env_nums, separate * 1e3, separate_memory, shared * 1e3,
+            shared_memory, separate / shared))
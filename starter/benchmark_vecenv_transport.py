@@ -0,0 +1,80 @@
+import os
+os.environ['PYOPENGL_PLATFORM'] = 'egl'
+os.environ['EGL_LOG_LEVEL'] = 'fatal'
+import sys
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+import time
+import argparse
+import numpy as np
+from vision4leg.get_env import get_subprocvec_env
+
+
+def get_args():
+  parser = argparse.ArgumentParser(description='Vector Env Transport Benchmark')
+  parser.add_argument('--env_nums', type=int, default=8,
+                      help='envs in total')
+  parser.add_argument('--proc_nums', type=int, default=4,
+                      help='worker processes')
+  parser.add_argument('--terrain_type', type=str,
+                      default="random_blocks_sparse")
+  parser.add_argument('--horizon', type=int, default=25,
+                      help='episode steps, short to exercise auto reset')
+  parser.add_argument('--steps', type=int, default=100,
+                      help='vector env steps per transport')
+  return parser.parse_args()
+
+
+def build_param(args, shared_memory):
+  return {
+    "obs_norm": True,
+    "horizon": args.horizon,
+    "shared_memory": shared_memory,
+    "auto_reset": True,
+    "env_build": dict(
+      terrain_type=args.terrain_type, get_image=True, depth_image=True,
+      depth_norm=True, frame_extract=1)
+  }
+
+
+def run(args, shared_memory):
+  """Steps depth image envs through one transport.
+
+  Returns:
+    The seconds per vector env step and the shape of the observations.
+  """
+  vec_env = get_subprocvec_env(
+    "A1MoveGround", build_param(args, shared_memory), args.env_nums,
+    args.proc_nums)
+  np.random.seed(0)
+  obs = vec_env.reset()
+  shape = obs.shape
+  actions = np.zeros((args.env_nums,) + vec_env.action_space.shape)
+  done_steps = 0
+  start = time.perf_counter()
+  for _ in range(args.steps):
+    obs, rews, dones, infos = vec_env.step(
+      actions + np.random.uniform(-0.3, 0.3, actions.shape))
+    assert obs.shape == shape and rews.shape == dones.shape == (
+      args.env_nums, 1)
+    # the terminal obs of the envs that are not done are their obs
+    terminal_obs = infos["terminal_obs"]
+    assert terminal_obs.shape == shape
+    assert np.array_equal(
+      terminal_obs[~dones[:, 0]], obs[~dones[:, 0]])
+    done_steps += dones.sum()
+  elapsed = time.perf_counter() - start
+  vec_env.close()
+  assert done_steps > 0, "no env finished an episode"
+  return elapsed / args.steps, shape
+
+
+if __name__ == "__main__":
+  args = get_args()
+  results = {}
+  for shared_memory in [False, True]:
+    results[shared_memory] = run(args, shared_memory)
+    print("{:>13}: {:.1f}ms per step, obs {}".format(
+      "shared memory" if shared_memory else "pipe",
+      results[shared_memory][0] * 1e3, results[shared_memory][1]))
+  assert results[False][1] == results[True][1]
+  print("speedup {:.2f}x".format(results[False][0] / results[True][0]))
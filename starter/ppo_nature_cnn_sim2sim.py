@@ -80,10 +80,21 @@ def experiment(args):
     args.seed, params, args.log_dir, args.overwrite)
   params['general_setting']['env'] = env
 
+  # Store the image part of obs in a compact dtype, e.g.
+  # "quantize_img": {"quantized_dtype": "uint8", "scale": .., "offset": ..}
+  quantize = None
+  if "quantize_img" in buffer_param:
+    img_quantize = dict(
+      start=env.observation_space.shape[0],
+      **buffer_param["quantize_img"]
+    )
+    quantize = {"obs": img_quantize, "next_obs": img_quantize}
   replay_buffer = OnPolicyReplayBuffer(
     env_nums=args.vec_env_nums,
     max_replay_buffer_size=int(buffer_param['size']),
-    time_limit_filter=buffer_param['time_limit_filter']
+    time_limit_filter=buffer_param['time_limit_filter'],
+    store_next_obs=buffer_param.get("store_next_obs", True),
+    quantize=quantize
   )
   params['general_setting']['replay_buffer'] = replay_buffer
 
@@ -3,6 +3,7 @@ import torch
 import torch.optim as optim
 import torch.nn as nn
 from .on_rl_algo import OnRLAlgo
+import torchrl.algo.utils as atu
 
 
 class A2C(OnRLAlgo):
@@ -53,10 +54,10 @@ class A2C(OnRLAlgo):
     advs = batch['advs']
     est_rets = batch['estimate_returns']
 
-    obs = torch.Tensor(obs).to(self.device)
-    acts = torch.Tensor(acts).to(self.device)
-    advs = torch.Tensor(advs).to(self.device)
-    est_rets = torch.Tensor(est_rets).to(self.device)
+    obs = atu.to_tensor(obs, self.device)
+    acts = atu.to_tensor(acts, self.device)
+    advs = atu.to_tensor(advs, self.device)
+    est_rets = atu.to_tensor(est_rets, self.device)
 
     out = self.pf.update(obs, acts)
     log_probs = out['log_prob']
@@ -13,12 +13,21 @@ class OnRLAlgo(RLAlgo):
       shuffle=True,
       tau=None,
       gae=True,
+      advantage_device=None,
+      rollout_on_device=False,
+      pin_memory=False,
       **kwargs):
     super(OnRLAlgo, self).__init__(**kwargs)
     self.sample_key = ["obs", "acts", "advs", "estimate_returns"]
     self.shuffle = shuffle
     self.tau = tau
     self.gae = gae
+    # Device for computing advantages with torch, numpy is used if None
+    self.advantage_device = advantage_device
+    # Move the rollout to training device once per epoch and sample
+    # minibatches on device
+    self.rollout_on_device = rollout_on_device
+    self.pin_memory = pin_memory
 
   def process_epoch_samples(self):
     sample = self.replay_buffer.last_sample(
@@ -27,18 +36,37 @@ class OnRLAlgo(RLAlgo):
     last_value = self.vf(last_ob).detach().cpu().numpy()
     last_value = last_value * (1 - sample["terminals"])
     if self.gae:
-      self.replay_buffer.generalized_advantage_estimation(last_value,
-                                                          self.discount,
-                                                          self.tau)
+      self.replay_buffer.generalized_advantage_estimation(
+        last_value, self.discount, self.tau,
+        device=self.advantage_device)
     else:
-      self.replay_buffer.discount_reward(last_value, self.discount)
+      self.replay_buffer.discount_reward(
+        last_value, self.discount, device=self.advantage_device)
+
+  @property
+  def iteration_device(self):
+    if self.rollout_on_device:
+      return self.device
+    return None
+
+  def rollout_to_device(self):
+    if self.rollout_on_device:
+      self.replay_buffer.to_device(
+        self.sample_key, self.device, pin_memory=self.pin_memory)
+
+  def release_rollout(self):
+    if self.rollout_on_device:
+      self.replay_buffer.release_device()
 
   def update_per_epoch(self):
     self.process_epoch_samples()
+    self.rollout_to_device()
     for batch in self.replay_buffer.one_iteration(
-        self.batch_size, self.sample_key, self.shuffle):
+        self.batch_size, self.sample_key, self.shuffle,
+        device=self.iteration_device):
       infos = self.update(batch)
       self.logger.add_update_info(infos)
+    self.release_rollout()
 
   @property
   def networks(self):
@@ -5,6 +5,7 @@ import torch.optim as optim
 import torch.nn as nn
 from .a2c import A2C
 import torchrl.algo.utils as atu
+import torchrl.policies as policies
 
 
 class PPO(A2C):
@@ -17,6 +18,7 @@ class PPO(A2C):
       clip_para=0.2,
       opt_epochs=10,
       clipped_value_loss=False,
+      fused_actor_critic=False,
       **kwargs):
     self.target_pf = copy.deepcopy(pf)
     super(PPO, self).__init__(pf=pf, **kwargs)
@@ -25,6 +27,14 @@ class PPO(A2C):
     self.clipped_value_loss = clipped_value_loss
     self.sample_key = ["obs", "acts", "advs", "estimate_returns", "values"]
 
+    # For pf & vf sharing the encoder, compute encoder once per update.
+    # Gradients of both losses are then taken at the same encoder
+    # parameters, instead of after the critic step.
+    self.actor_critic = None
+    if fused_actor_critic:
+      self.actor_critic = policies.SharedEncoderActorCritic(
+        self.pf, self.vf)
+
   def update_per_epoch(self):
     self.process_epoch_samples()
     atu.update_linear_schedule(
@@ -32,22 +42,23 @@ class PPO(A2C):
     atu.update_linear_schedule(
       self.vf_optimizer, self.current_epoch, self.num_epochs, self.vlr)
     atu.copy_model_params_from_to(self.pf, self.target_pf)
+    self.rollout_to_device()
     for _ in range(self.opt_epochs):
-      for batch in self.replay_buffer.one_iteration(self.batch_size,
-                                                    self.sample_key,
-                                                    self.shuffle):
+      for batch in self.replay_buffer.one_iteration(
+          self.batch_size, self.sample_key, self.shuffle,
+          device=self.iteration_device):
         infos = self.update(batch)
         self.logger.add_update_info(infos)
+    self.release_rollout()
 
-  def update_actor(
+  def actor_loss(
       self,
       info,
+      out,
       obs,
       actions,
       advs
   ):
-
-    out = self.pf.update(obs, actions)
     log_probs = out['log_prob']
     ent = out['ent']
     log_std = out['log_std']
@@ -68,12 +79,6 @@ class PPO(A2C):
       surrogate_loss_clip, surrogate_loss_pre_clip))
     policy_loss = policy_loss - self.entropy_coeff * ent.mean()
 
-    self.pf_optimizer.zero_grad()
-    policy_loss.backward()
-    pf_grad_norm = torch.nn.utils.clip_grad_norm_(
-      self.pf.parameters(), 0.5)
-    self.pf_optimizer.step()
-
     info['Training/policy_loss'] = policy_loss.item()
 
     info['logprob/mean'] = log_probs.mean().item()
@@ -88,17 +93,34 @@ class PPO(A2C):
 
     info['ratio/max'] = ratio.max().item()
     info['ratio/min'] = ratio.min().item()
+    return policy_loss
+
+  def update_actor(
+      self,
+      info,
+      obs,
+      actions,
+      advs
+  ):
+
+    out = self.pf.update(obs, actions)
+    policy_loss = self.actor_loss(info, out, obs, actions, advs)
+
+    self.pf_optimizer.zero_grad()
+    policy_loss.backward()
+    pf_grad_norm = torch.nn.utils.clip_grad_norm_(
+      self.pf.parameters(), 0.5)
+    self.pf_optimizer.step()
 
     info['grad_norm/pf'] = pf_grad_norm.item()
 
-  def update_critic(
+  def critic_loss(
       self,
       info,
-      obs,
+      values,
       old_values,
       est_rets
   ):
-    values = self.vf(obs)
     assert values.shape == est_rets.shape, \
       print(values.shape, est_rets.shape)
 
@@ -113,15 +135,62 @@ class PPO(A2C):
     else:
       vf_loss = self.vf_criterion(values, est_rets)
 
+    info['Training/vf_loss'] = vf_loss.item()
+    return vf_loss
+
+  def update_critic(
+      self,
+      info,
+      obs,
+      old_values,
+      est_rets
+  ):
+    values = self.vf(obs)
+    vf_loss = self.critic_loss(info, values, old_values, est_rets)
+
     self.vf_optimizer.zero_grad()
     vf_loss.backward()
     vf_grad_norm = torch.nn.utils.clip_grad_norm_(
       self.vf.parameters(), 0.5)
     self.vf_optimizer.step()
 
-    info['Training/vf_loss'] = vf_loss.item()
     info['grad_norm/vf'] = vf_grad_norm.item()
 
+  def update_actor_critic(
+      self,
+      info,
+      obs,
+      actions,
+      advs,
+      old_values,
+      est_rets
+  ):
+    out = self.actor_critic.update(obs, actions)
+    vf_loss = self.critic_loss(info, out["value"], old_values, est_rets)
+    policy_loss = self.actor_loss(info, out, obs, actions, advs)
+
+    # Both gradients are computed before any step since the encoder
+    # parameters are updated in place by both optimizers
+    vf_params = list(self.vf.parameters())
+    pf_params = list(self.pf.parameters())
+    vf_grads = torch.autograd.grad(
+      vf_loss, vf_params, retain_graph=True, allow_unused=True)
+    pf_grads = torch.autograd.grad(
+      policy_loss, pf_params, allow_unused=True)
+
+    for param, grad in zip(vf_params, vf_grads):
+      param.grad = grad
+    vf_grad_norm = torch.nn.utils.clip_grad_norm_(vf_params, 0.5)
+    self.vf_optimizer.step()
+
+    for param, grad in zip(pf_params, pf_grads):
+      param.grad = grad
+    pf_grad_norm = torch.nn.utils.clip_grad_norm_(pf_params, 0.5)
+    self.pf_optimizer.step()
+
+    info['grad_norm/vf'] = vf_grad_norm.item()
+    info['grad_norm/pf'] = pf_grad_norm.item()
+
   def update(self, batch):
     self.training_update_num += 1
 
@@ -133,11 +202,11 @@ class PPO(A2C):
     old_values = batch['values']
     est_rets = batch['estimate_returns']
 
-    obs = torch.Tensor(obs).to(self.device)
-    actions = torch.Tensor(actions).to(self.device)
-    advs = torch.Tensor(advs).to(self.device)
-    old_values = torch.Tensor(old_values).to(self.device)
-    est_rets = torch.Tensor(est_rets).to(self.device)
+    obs = atu.to_tensor(obs, self.device)
+    actions = atu.to_tensor(actions, self.device)
+    advs = atu.to_tensor(advs, self.device)
+    old_values = atu.to_tensor(old_values, self.device)
+    est_rets = atu.to_tensor(est_rets, self.device)
 
     info['advs/mean'] = advs.mean().item()
     info['advs/std'] = advs.std().item()
@@ -147,8 +216,12 @@ class PPO(A2C):
     # Normalize the advantage
     advs = (advs - advs.mean()) / (advs.std() + 1e-5)
 
-    self.update_critic(info, obs, old_values, est_rets)
-    self.update_actor(info, obs, actions, advs)
+    if self.actor_critic is not None:
+      self.update_actor_critic(
+        info, obs, actions, advs, old_values, est_rets)
+    else:
+      self.update_critic(info, obs, old_values, est_rets)
+      self.update_actor(info, obs, actions, advs)
 
     return info
 
@@ -156,6 +156,7 @@ class RLAlgo():
         self.train_time = 0
         infos.update(eval_infos)
         infos.update(finish_epoch_info)
+        infos.update(self.step_profile_infos())
 
         self.logger.add_epoch_info(
           epoch, total_frames, time.time() - self.start, infos)
@@ -167,6 +168,20 @@ class RLAlgo():
     self.snapshot(self.save_dir, "finish")
     self.collector.terminate()
 
+  def step_profile_infos(self):
+    """
+    Mean milliseconds per call of every env step phase since the last
+    log, only if the training envs are built with profile_step
+    """
+    if not getattr(self.env, "profile_step", False):
+      return {}
+    infos = {}
+    profile = self.env.get_step_profile(reset=True)
+    for phase, (total_time, calls) in profile.items():
+      infos["Step_Profile_{}_ms".format(phase)] = \
+        1000 * total_time / max(calls, 1)
+    return infos
+
   def update(self, batch):
     raise NotImplementedError
 
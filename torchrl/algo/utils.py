@@ -13,6 +13,16 @@ def huber(x, k=1.0):
   return torch.where(x.abs() < k, 0.5 * x.pow(2), k * (x.abs() - 0.5 * k))
 
 
+def to_tensor(data, device):
+  """
+  Convert batch data to float tensor on device,
+  data already on device (see OnPolicyReplayBuffer.to_device) is not copied
+  """
+  if isinstance(data, torch.Tensor):
+    return data.to(device)
+  return torch.Tensor(data).to(device)
+
+
 def soft_update_from_to(source, target, tau):
   for target_param, param in zip(target.parameters(), source.parameters()):
     target_param.data.copy_(
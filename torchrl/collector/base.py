@@ -204,7 +204,8 @@ class VecCollector(BaseCollector):
 
     sample_dict = {
       "obs": self.current_ob,
-      "next_obs": next_ob,
+      # with auto reset, done envs already return the next episode's obs
+      "next_obs": infos.get("terminal_obs", next_ob),
       "acts": act,
       "rewards": reward,
       "terminals": done,
@@ -223,7 +224,11 @@ class VecCollector(BaseCollector):
       # if np.any(done):
       #     flag = done
       flag = (self.current_step >= self.max_episode_frames) | done
-      next_ob = self.env.partial_reset(np.squeeze(flag, axis=-1))
+      reset_flag = flag
+      if "terminal_obs" in infos:
+        reset_flag = flag & ~done
+      if np.any(reset_flag):
+        next_ob = self.env.partial_reset(np.squeeze(reset_flag, axis=-1))
       self.current_step[flag] = 0
 
     self.replay_buffer.add_sample(sample_dict)
@@ -269,7 +274,7 @@ class VecCollector(BaseCollector):
           traj_len = traj_len + (1 - epi_done)
 
           epi_done = epi_done | done
-          if np.any(done):
+          if np.any(done) and not self.eval_env.auto_reset:
             eval_obs = self.eval_env.partial_reset(
               np.squeeze(done, axis=-1)
             )
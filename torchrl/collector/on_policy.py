@@ -3,6 +3,7 @@ import numpy as np
 import copy
 from .base import BaseCollector, VecCollector
 from torchrl.env import VecEnv
+from torchrl.policies import SharedEncoderActorCritic
 
 
 class OnPolicyCollectorBase(BaseCollector):
@@ -86,19 +87,24 @@ class VecOnPolicyCollector(VecCollector):
     self.vf = vf
     super().__init__(**kwargs)
     self.discount = discount
+    # Compute the shared encoder once for both policy and value function
+    self.actor_critic = None
+    if SharedEncoderActorCritic.shares_encoder(self.pf, self.vf):
+      self.actor_critic = SharedEncoderActorCritic(self.pf, self.vf)
 
   def take_actions(self):
     ob_tensor = torch.Tensor(
       self.current_ob
     ).to(self.device)
 
-    out = self.pf.explore(ob_tensor)
+    if self.actor_critic is not None:
+      out = self.actor_critic.explore(ob_tensor)
+      values = out["value"].detach().cpu().numpy()
+    else:
+      out = self.pf.explore(ob_tensor)
     acts = out["action"]
     acts = acts.detach().cpu().numpy()
 
-    values = self.vf(ob_tensor)
-    values = values.detach().cpu().numpy()
-
     if type(acts) is not int:
       if np.isnan(acts).any():
         print("NaN detected. BOOM")
@@ -106,7 +112,16 @@ class VecOnPolicyCollector(VecCollector):
         print(self.pf.forward(ob_tensor))
         exit()
 
-    next_obs, rewards, dones, infos = self.env.step(acts)
+    # Estimate values while the envs are simulating
+    self.env.step_async(acts)
+
+    if self.actor_critic is None:
+      values = self.vf(ob_tensor)
+      values = values.detach().cpu().numpy()
+
+    next_obs, rewards, dones, infos = self.env.step_wait()
+    # with auto reset, done envs already return the next episode's obs
+    terminal_obs = infos.get("terminal_obs", next_obs)
 
     if self.train_render:
       self.env.render()
@@ -114,7 +129,7 @@ class VecOnPolicyCollector(VecCollector):
 
     sample_dict = {
       "obs": self.current_ob,
-      "next_obs": next_obs,
+      "next_obs": terminal_obs,
       "acts": acts,
       "values": values,
       "rewards": rewards,
@@ -134,7 +149,7 @@ class VecOnPolicyCollector(VecCollector):
 
       surpass_flag = self.current_step >= self.max_episode_frames
       last_ob = torch.Tensor(
-        next_obs
+        terminal_obs
       ).to(self.device)
 
       last_value = self.vf(last_ob).detach().cpu().numpy()
@@ -142,9 +157,13 @@ class VecOnPolicyCollector(VecCollector):
       sample_dict["rewards"] = rewards + \
         self.discount * last_value * surpass_flag
 
-      next_obs = self.env.partial_reset(
-        np.squeeze(dones | surpass_flag, axis=-1)
-      )
+      reset_flag = dones | surpass_flag
+      if "terminal_obs" in infos:
+        reset_flag = surpass_flag & ~dones
+      if np.any(reset_flag):
+        next_obs = self.env.partial_reset(
+          np.squeeze(reset_flag, axis=-1)
+        )
       self.current_step[dones | surpass_flag] = 0
       self.train_rew[dones | surpass_flag] = 0
 
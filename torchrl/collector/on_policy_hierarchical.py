@@ -49,6 +49,8 @@ class VecOnPolicyHierarchicalCollector(VecOnPolicyCollector):
         exit()
 
     next_obs, rewards, dones, infos = self.env.step(low_level_acts)
+    # with auto reset, done envs already return the next episode's obs
+    terminal_obs = infos.get("terminal_obs", next_obs)
 
     if self.train_render:
       self.env.render()
@@ -56,7 +58,7 @@ class VecOnPolicyHierarchicalCollector(VecOnPolicyCollector):
 
     sample_dict = {
       "obs": self.current_ob,
-      "next_obs": next_obs,
+      "next_obs": terminal_obs,
       "acts": acts,
       "values": values,
       "rewards": rewards,
@@ -76,7 +78,7 @@ class VecOnPolicyHierarchicalCollector(VecOnPolicyCollector):
 
       surpass_flag = self.current_step >= self.max_episode_frames
       last_ob = torch.Tensor(
-        next_obs
+        terminal_obs
       ).to(self.device)
 
       last_value = self.vf(last_ob).detach().cpu().numpy()
@@ -84,9 +86,13 @@ class VecOnPolicyHierarchicalCollector(VecOnPolicyCollector):
       sample_dict["rewards"] = rewards + \
         self.discount * last_value * surpass_flag
 
-      next_obs = self.env.partial_reset(
-        np.squeeze(dones | surpass_flag, axis=-1)
-      )
+      reset_flag = dones | surpass_flag
+      if "terminal_obs" in infos:
+        reset_flag = surpass_flag & ~dones
+      if np.any(reset_flag):
+        next_obs = self.env.partial_reset(
+          np.squeeze(reset_flag, axis=-1)
+        )
       self.current_step[dones | surpass_flag] = 0
 
     self.replay_buffer.add_sample(sample_dict)
@@ -146,7 +152,7 @@ class VecOnPolicyHierarchicalCollector(VecOnPolicyCollector):
           traj_len = traj_len + (1 - epi_done)
 
           epi_done = epi_done | done
-          if np.any(done):
+          if np.any(done) and not self.eval_env.auto_reset:
             eval_obs = self.eval_env.partial_reset(
               np.squeeze(done, axis=-1)
             )
@@ -3,6 +3,12 @@ import numpy as np
 import copy
 import torch
 
+# Steps of gym's wrappers, which only change the actions, observations or
+# rewards through their action / observation / reward hooks
+GYM_WRAPPER_STEPS = (
+  gym.Wrapper.step, gym.ActionWrapper.step, gym.ObservationWrapper.step,
+  gym.RewardWrapper.step)
+
 
 class BaseWrapper(gym.Wrapper):
   def __init__(self, env):
@@ -28,6 +34,32 @@ class BaseWrapper(gym.Wrapper):
   def copy_state(self, source_env):
     pass
 
+  def step_async(self, actions):
+    """
+    Async half of step, applies the action hook of gym's ActionWrapper
+        wrappers with a step of their own need a step_wait of their own,
+        otherwise the async path would skip them
+    """
+    if type(self).step not in GYM_WRAPPER_STEPS and \
+        type(self).step_wait is BaseWrapper.step_wait:
+      raise NotImplementedError(
+        '{} overrides step but not step_wait.'.format(type(self).__name__))
+    if isinstance(self, gym.ActionWrapper):
+      actions = self.action(actions)
+    self._wrapped_env.step_async(actions)
+
+  def step_wait(self):
+    """
+    Wait half of step, applies the observation and reward hooks of gym's
+    ObservationWrapper and RewardWrapper
+    """
+    obs, rews, dones, infos = self._wrapped_env.step_wait()
+    if isinstance(self, gym.ObservationWrapper):
+      obs = self.observation(obs)
+    if isinstance(self, gym.RewardWrapper):
+      rews = self.reward(rews)
+    return obs, rews, dones, infos
+
 
 class RewardShift(gym.RewardWrapper, BaseWrapper):
   def __init__(self, env, reward_scale=1):
@@ -121,6 +153,29 @@ class NormObs(gym.ObservationWrapper, BaseWrapper):
       self._obs_normalizer.update_estimate(observation)
     return self._obs_normalizer.filt(observation)
 
+  def terminal_observation(self, infos):
+    # terminal obs of auto reset envs are normalized without updating
+    if "terminal_obs" in infos:
+      infos["terminal_obs"] = self._obs_normalizer.filt(
+        infos["terminal_obs"])
+    return infos
+
+  def partial_reset(self, index_mask, **kwargs):
+    # only the reset envs update the estimate
+    obs = self._wrapped_env.partial_reset(index_mask, **kwargs)
+    if self.training:
+      self._obs_normalizer.update_estimate(obs[index_mask])
+    return self._obs_normalizer.filt(obs)
+
+  def step(self, action):
+    obs, rews, dones, infos = super().step(action)
+    return obs, rews, dones, self.terminal_observation(infos)
+
+  def step_wait(self):
+    obs, rews, dones, infos = self._wrapped_env.step_wait()
+    obs = self.observation(obs)
+    return obs, rews, dones, self.terminal_observation(infos)
+
 
 class NormRet(BaseWrapper):
   def __init__(self, env, discount=0.99, epsilon=1e-4):
@@ -132,8 +187,7 @@ class NormRet(BaseWrapper):
     self.discount = discount
     self.epsilon = 1e-4
 
-  def step(self, act):
-    obs, rews, done, infos = self.env.step(act)
+  def normalize_reward(self, rews, done):
     if self.training:
       self.ret = self.ret * self.discount + rews
       # if self.ret_rms:
@@ -141,7 +195,15 @@ class NormRet(BaseWrapper):
         self.ret_mean, self.ret_var, self.count, self.ret, 0, 1)
       rews = rews / np.sqrt(self.ret_var + self.epsilon)
       self.ret *= (1-done)
-    return obs, rews, done, infos
+    return rews
+
+  def step(self, act):
+    obs, rews, done, infos = self.env.step(act)
+    return obs, self.normalize_reward(rews, done), done, infos
+
+  def step_wait(self):
+    obs, rews, done, infos = self._wrapped_env.step_wait()
+    return obs, self.normalize_reward(rews, done), done, infos
 
   def reset(self, **kwargs):
     self.ret = 0
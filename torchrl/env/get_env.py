@@ -70,7 +70,7 @@ def get_single_env(env_id, env_param):
 def get_vec_env(env_id, env_param, vec_env_nums):
   vec_env = VecEnv(
     vec_env_nums, get_single_env,
-    [env_id, env_param])
+    [env_id, env_param], auto_reset=env_param.get("auto_reset", False))
 
   if "obs_norm" in env_param and env_param["obs_norm"]:
     vec_env = NormObs(vec_env)
@@ -78,9 +78,14 @@ def get_vec_env(env_id, env_param, vec_env_nums):
 
 
 def get_subprocvec_env(env_id, env_param, vec_env_nums, proc_nums):
+  shared_memory = "shared_memory" in env_param and \
+    env_param["shared_memory"]
+  start_method = env_param.get("start_method", None)
+  auto_reset = env_param.get("auto_reset", False)
   vec_env = SubProcVecEnv(
     proc_nums, vec_env_nums, get_single_env,
-    [env_id, env_param])
+    [env_id, env_param], shared_memory=shared_memory,
+    start_method=start_method, auto_reset=auto_reset)
 
   if "obs_norm" in env_param and env_param["obs_norm"]:
     vec_env = NormObs(vec_env)
@@ -1,42 +1,117 @@
 import numpy as np
-from .vecenv import VecEnv
+from .vecenv import VecEnv, step_with_auto_reset, pop_terminal_obs, \
+  partial_reset_env
 import multiprocessing as mp
+from multiprocessing import forkserver
 from toolz.dicttoolz import merge_with
+import os
 import sys
+import traceback
 
 mp.set_start_method('spawn', force=True)
 
-mp.set_start_method('spawn', force=True)
+
+def attach_shared_buffers(shm_specs, env_idx_start, env_idx_end):
+  """
+  Re-open the shared observation / reward / done buffers created by the
+  parent and return views restricted to the envs owned by this worker
+  """
+  # posix_ipc is only required when shared memory transport is enabled
+  from torchrl.replay_buffers.shared.shmarray import NpShmemArray
+  shm_buffers = {}
+  for key, (shape, dtype, tag) in shm_specs.items():
+    shm_buffers[key] = NpShmemArray(
+      shape, dtype, tag, create=False)[:, env_idx_start: env_idx_end]
+  return shm_buffers
+
+
+class WorkerError(RuntimeError):
+  """
+  Error of an env worker, carries the traceback of the worker process
+  """
+
+
+def recv(parent_pipe):
+  """
+  Receive the reply of an env worker, raise the error of a failed worker
+  """
+  result = parent_pipe.recv()
+  if isinstance(result, WorkerError):
+    raise result
+  return result
 
 
 def env_worker(
-    env_funcs, env_args, child_pipe, parent_pipe
+    env_funcs, env_args, child_pipe, parent_pipe,
+    shm_specs=None, env_idx_start=0, env_idx_end=0, auto_reset=False
 ):
-  envs = [
-    env_func(*env_arg)
-    for env_func, env_arg in zip(env_funcs, env_args)
-  ]
-  sys.stderr = open("train_process.stderr", "a")
-  sys.stdout = open("train_process.stdout", "a")
+  def step(env, action):
+    if auto_reset:
+      return step_with_auto_reset(env, action)
+    return env.step(action)
 
   # parent_pipe.close()
 
+  envs = []
   try:
+    envs = [
+      env_func(*env_arg)
+      for env_func, env_arg in zip(env_funcs, env_args)
+    ]
+    sys.stderr = open("train_process.stderr", "a")
+    sys.stdout = open("train_process.stdout", "a")
+
+    # With shared memory transport, obs / rewards / dones are written into
+    # the shared buffers directly and only infos go through the pipe
+    shm_buffers = None
+    if shm_specs is not None:
+      shm_buffers = attach_shared_buffers(
+        shm_specs, env_idx_start, env_idx_end)
+
     while True:
       command, data = child_pipe.recv()
       if command == 'step':
+        if shm_buffers is not None:
+          data, slot = data
         results = [
-          env.step(np.squeeze(action)) for env, action in zip(envs, data)
+          step(env, np.squeeze(action)) for env, action in zip(envs, data)
         ]
+        if shm_buffers is not None:
+          obs, rews, dones, infos = zip(*results)
+          shm_buffers["obs"][slot] = obs
+          shm_buffers["rews"][slot] = rews
+          shm_buffers["dones"][slot] = dones
+          if auto_reset:
+            pop_terminal_obs(
+              shm_buffers["obs"][slot], infos,
+              out=shm_buffers["terminal_obs"][slot])
+          results = infos
         child_pipe.send(results)
       elif command == 'reset':
+        if shm_buffers is not None:
+          data, slot = data
         results = [env.reset(**data) for env in envs]
+        if shm_buffers is not None:
+          shm_buffers["obs"][slot] = results
+          results = None
         child_pipe.send(results)
       elif command == 'partial_reset':
-        index_mask, kwargs = data
+        if shm_buffers is not None:
+          index_mask, kwargs, slot = data
+        else:
+          index_mask, kwargs = data
         indexs = np.argwhere(index_mask == 1).reshape((-1))
-        results = [envs[index].reset(**kwargs) for index in indexs]
+        results = [
+          partial_reset_env(envs[index], **kwargs) for index in indexs]
+        if shm_buffers is not None:
+          if len(indexs) > 0:
+            shm_buffers["obs"][slot, indexs] = results
+          results = None
         child_pipe.send(results)
+      elif command == 'get_step_profile':
+        child_pipe.send(merge_with(
+          lambda totals: np.sum(totals, axis=0),
+          *[env.get_step_profile(reset=data) for env in envs]))
       # elif command == 'render':
       #     child_pipe.send(env.render(mode='rgb_array'))
       elif command == 'train':
@@ -48,27 +123,89 @@ def env_worker(
       elif command == 'close':
         child_pipe.close()
         break
-  except Exception as e:
-    print(e)
+  except Exception:
+    # raised by the parent on its next recv instead of blocking it forever
+    child_pipe.send(WorkerError(traceback.format_exc()))
   finally:
     for env in envs:
       env.close()
 
 
 class SubProcVecEnv(VecEnv):
-  def __init__(self, proc_nums, env_nums, env_funcs, env_args):
+  """
+  Vector Env running envs in sub processes
+      shared_memory: workers write obs / rewards / dones into
+          preallocated shared memory buffers instead of pickling them
+          through the pipe. Buffers are double buffered, so the obs
+          returned by the previous step / reset stays valid until the
+          next call writes into the same slot.
+      start_method: multiprocessing start method of the workers, the
+          default spawn re-imports every module in each worker. With
+          forkserver, workers are forked from a server process that has
+          preloaded the env modules, so they skip the imports. Envs are
+          still built inside the workers, pybullet clients and EGL
+          contexts do not survive a fork.
+      auto_reset: workers reset done envs inside step, see VecEnv. The
+          reset then overlaps with the other workers stepping instead
+          of costing an extra partial_reset round trip.
+  Besides step, stepping could be split into step_async / step_wait so
+  that work in the main process overlaps with simulation.
+  """
+
+  def __init__(
+      self, proc_nums, env_nums, env_funcs, env_args,
+      shared_memory=False, start_method=None, auto_reset=False):
     self.proc_nums = proc_nums
-    super().__init__(env_nums, env_funcs, env_args)
+    self.shared_memory = shared_memory
+    self.start_method = start_method
+    super().__init__(env_nums, env_funcs, env_args, auto_reset=auto_reset)
+
+  def preload_modules(self):
+    # modules defining the env constructors pull in the heavy imports
+    modules = {env_func.__module__ for env_func in self.env_funcs}
+    modules.add(__name__)
+    return sorted(modules)
+
+  def start_forkserver(self):
+    """
+    Start the forkserver with the current sys.path
+        the server ignores runtime sys.path changes (e.g. the starter
+        scripts appending the repo root), they are handed over via
+        PYTHONPATH only while it starts, or the preload imports fail
+        silently
+    """
+    old_python_path = os.environ.get("PYTHONPATH")
+    os.environ["PYTHONPATH"] = os.pathsep.join(
+      path for path in sys.path if path)
+    try:
+      forkserver.ensure_running()
+    finally:
+      if old_python_path is None:
+        del os.environ["PYTHONPATH"]
+      else:
+        os.environ["PYTHONPATH"] = old_python_path
 
   def set_up_envs(self):
-    self.example_env = self.env_funcs[0](*self.env_args[0])
     self.workers = []
     self.parent_pipes = []
 
     assert self.env_nums % self.proc_nums == 0
     self.env_nums_per_proc = self.env_nums // self.proc_nums
 
-    self.ctx = mp.get_context()
+    # whether the workers have been sent actions but not received yet
+    self._stepping = False
+
+    # shared buffers are shaped by the example env, otherwise it is
+    # built after the workers are started and overlaps with them
+    self.shm_specs = None
+    if self.shared_memory:
+      self.example_env = self.env_funcs[0](*self.env_args[0])
+      self.set_up_shared_buffers()
+
+    self.ctx = mp.get_context(self.start_method)
+    if self.ctx.get_start_method() == 'forkserver':
+      self.ctx.set_forkserver_preload(self.preload_modules())
+      self.start_forkserver()
     for i in range(self.proc_nums):
       env_idx_start = i * self.env_nums_per_proc
       env_idx_end = (i + 1) * self.env_nums_per_proc
@@ -79,7 +216,11 @@ class SubProcVecEnv(VecEnv):
           self.env_funcs[env_idx_start: env_idx_end],
           self.env_args[env_idx_start: env_idx_end],
           child_pipe,
-          parent_pipe
+          parent_pipe,
+          self.shm_specs,
+          env_idx_start,
+          env_idx_end,
+          self.auto_reset
         )
       )
       p.start()
@@ -87,6 +228,33 @@ class SubProcVecEnv(VecEnv):
       self.workers.append(p)
       self.parent_pipes.append(parent_pipe)
 
+    if not self.shared_memory:
+      self.example_env = self.env_funcs[0](*self.env_args[0])
+
+  def set_up_shared_buffers(self):
+    from torchrl.replay_buffers.shared.shmarray import NpShmemArray
+    from torchrl.replay_buffers.shared.shmarray import get_random_tag
+
+    tag = get_random_tag()
+    # The observation space of image envs only covers the state, the obs
+    # buffer is shaped by a real obs
+    example_obs = np.asarray(self.example_env.reset())
+    # Two slots per buffer: current step and previous step
+    buffer_specs = {
+      "obs": ((2, self.env_nums) + example_obs.shape, example_obs.dtype),
+      "rews": ((2, self.env_nums), np.float64),
+      "dones": ((2, self.env_nums), np.bool_),
+    }
+    if self.auto_reset:
+      buffer_specs["terminal_obs"] = buffer_specs["obs"]
+    self.shm_specs = {}
+    self.shm_buffers = {}
+    for key, (shape, dtype) in buffer_specs.items():
+      current_tag = tag + "_vecenv_" + key
+      self.shm_buffers[key] = NpShmemArray(shape, dtype, current_tag)
+      self.shm_specs[key] = (shape, dtype, current_tag)
+    self._slot = 0
+
   def train(self):
     for parent_pipe in self.parent_pipes:
       parent_pipe.send(('train', None))
@@ -100,18 +268,38 @@ class SubProcVecEnv(VecEnv):
       parent_pipe.send(('close', None))
 
   def reset(self, **kwargs):
+    if self.shared_memory:
+      self._slot = 1 - self._slot
+      for parent_pipe in self.parent_pipes:
+        parent_pipe.send(('reset', (kwargs, self._slot)))
+      for parent_pipe in self.parent_pipes:
+        recv(parent_pipe)
+      self._obs = self.shm_buffers["obs"][self._slot]
+      return self._obs
+
     for parent_pipe in self.parent_pipes:
       parent_pipe.send(('reset', kwargs))
 
     obs = []
     for parent_pipe in self.parent_pipes:
-      obs += parent_pipe.recv()
+      obs += recv(parent_pipe)
 
     self._obs = np.stack(obs)
     return self._obs
 
   def partial_reset(self, index_mask, **kwargs):
     index_mask_per_proc = np.split(index_mask, self.proc_nums)
+    if self.shared_memory:
+      # reset obs are written in place into the current slot
+      for index_mask_current, parent_pipe in zip(
+          index_mask_per_proc, self.parent_pipes):
+        parent_pipe.send(
+          ('partial_reset', (index_mask_current, kwargs, self._slot))
+        )
+      for parent_pipe in self.parent_pipes:
+        recv(parent_pipe)
+      return self._obs
+
     for index_mask_current, parent_pipe in zip(
         index_mask_per_proc, self.parent_pipes):
       parent_pipe.send(
@@ -120,29 +308,70 @@ class SubProcVecEnv(VecEnv):
 
     partial_obs = []
     for parent_pipe in self.parent_pipes:
-      partial_obs += parent_pipe.recv()
+      partial_obs += recv(parent_pipe)
     self._obs[index_mask] = partial_obs
     return self._obs
 
-  def step(self, actions):
-    actions = np.split(actions, self.proc_nums * self.env_nums_per_proc)
+  def step_async(self, actions):
+    """
+    Send actions to the workers without waiting for the results
+    """
+    assert not self._stepping, "the workers are already stepping"
+    actions = np.split(actions, self.env_nums)
+    if self.shared_memory:
+      self._slot = 1 - self._slot
     for index, parent_pipe in enumerate(self.parent_pipes):
-      parent_pipe.send((
-        'step',
-        actions[
-          index * self.env_nums_per_proc: (index + 1) * self.env_nums_per_proc
-        ]
-      ))
+      current_actions = actions[
+        index * self.env_nums_per_proc: (index + 1) * self.env_nums_per_proc
+      ]
+      if self.shared_memory:
+        parent_pipe.send(('step', (current_actions, self._slot)))
+      else:
+        parent_pipe.send(('step', current_actions))
+    self._stepping = True
+
+  def step_wait(self):
+    assert self._stepping, "step_wait requires step_async first"
     results = []
     for parent_pipe in self.parent_pipes:
-      results += parent_pipe.recv()
+      results += recv(parent_pipe)
+    self._stepping = False
+
+    if self.shared_memory:
+      # Workers have finished writing, return views of the shared buffers
+      infos = merge_with(np.array, *results)
+      if self.auto_reset:
+        infos["terminal_obs"] = self.shm_buffers["terminal_obs"][self._slot]
+      self._obs = self.shm_buffers["obs"][self._slot]
+      return self._obs, \
+        self.shm_buffers["rews"][self._slot][:, np.newaxis], \
+        self.shm_buffers["dones"][self._slot][:, np.newaxis], infos
 
     obs, rews, dones, infos = zip(*results)
     self._obs = np.stack(obs)
+    terminal_obs = pop_terminal_obs(self._obs, infos) \
+      if self.auto_reset else None
     infos = merge_with(np.array, *infos)
+    if terminal_obs is not None:
+      infos["terminal_obs"] = terminal_obs
     return self._obs, np.stack(rews)[:, np.newaxis], \
       np.stack(dones)[:, np.newaxis], infos
 
+  def step(self, actions):
+    self.step_async(actions)
+    return self.step_wait()
+
+  def get_step_profile(self, reset=False):
+    """
+    Per phase step time of all envs summed up across workers,
+    {phase: np.array([total seconds, calls])}
+    """
+    for parent_pipe in self.parent_pipes:
+      parent_pipe.send(('get_step_profile', reset))
+    return merge_with(
+      lambda totals: np.sum(totals, axis=0),
+      *[recv(parent_pipe) for parent_pipe in self.parent_pipes])
+
   def seed(self, seed):
     for idx, parent_pipe in enumerate(self.parent_pipes):
       parent_pipe.send(('seed', seed * self.env_nums + idx))
@@ -3,16 +3,61 @@ from .base_wrapper import BaseWrapper
 from toolz.dicttoolz import merge_with
 
 
+def partial_reset_env(env, **kwargs):
+  """
+  Reset an env for a partial reset of the vector env, envs built with
+  num_reset_snapshots start from one of their reset snapshots, the reset
+  still goes through all wrappers of the env
+  """
+  if getattr(env, "num_reset_snapshots", 0):
+    kwargs["from_snapshot"] = True
+  return env.reset(**kwargs)
+
+
+def step_with_auto_reset(env, action):
+  """
+  Step an env and reset it right away once the episode is done,
+  the returned obs is then the first obs of the next episode and the
+  last obs of the finished one is kept in info["terminal_obs"], only
+  done envs carry it
+  """
+  obs, rew, done, info = env.step(action)
+  if done:
+    info["terminal_obs"] = obs
+    obs = partial_reset_env(env)
+  return obs, rew, done, info
+
+
+def pop_terminal_obs(obs, infos, out=None):
+  """
+  Batch the terminal obs of auto reset envs, the obs of the envs that
+  are not done and the info["terminal_obs"] of the done ones, which is
+  popped from their infos
+      out: array to write into, a new one by default
+  """
+  if out is None:
+    out = np.empty_like(obs)
+  out[...] = obs
+  for index, info in enumerate(infos):
+    if "terminal_obs" in info:
+      out[index] = info.pop("terminal_obs")
+  return out
+
+
 class VecEnv(BaseWrapper):
   """
   Vector Env
       Each env should have
       1. same observation space shape
       2. same action space shape
+      auto_reset: envs are reset inside step when they are done, like
+          gym's autoreset. The terminal obs goes into
+          infos["terminal_obs"], so done envs need no partial_reset.
   """
 
-  def __init__(self, env_nums, env_funcs, env_args):
+  def __init__(self, env_nums, env_funcs, env_args, auto_reset=False):
     self.env_nums = env_nums
+    self.auto_reset = auto_reset
     self.env_funcs = env_funcs
     self.env_args = env_args
     if isinstance(env_funcs, list):
@@ -47,20 +92,42 @@ class VecEnv(BaseWrapper):
 
   def partial_reset(self, index_mask, **kwargs):
     indexs = np.argwhere(index_mask == 1).reshape((-1))
-    reset_obs = [self.envs[index].reset() for index in indexs]
+    reset_obs = [partial_reset_env(self.envs[index]) for index in indexs]
     self._obs[index_mask] = reset_obs
     return self._obs
 
-  def step(self, actions):
-    actions = np.split(actions, self.env_nums)
-    result = [env.step(np.squeeze(action)) for env, action in
+  def step_async(self, actions):
+    self._actions = actions
+
+  def step_wait(self):
+    actions = np.split(self._actions, self.env_nums)
+    step = step_with_auto_reset if self.auto_reset else \
+      lambda env, action: env.step(action)
+    result = [step(env, np.squeeze(action)) for env, action in
               zip(self.envs, actions)]
     obs, rews, dones, infos = zip(*result)
     self._obs = np.stack(obs)
+    terminal_obs = pop_terminal_obs(self._obs, infos) \
+      if self.auto_reset else None
     infos = merge_with(np.array, *infos)
+    if terminal_obs is not None:
+      infos["terminal_obs"] = terminal_obs
     return self._obs, np.stack(rews)[:, np.newaxis], \
       np.stack(dones)[:, np.newaxis], infos
 
+  def step(self, actions):
+    self.step_async(actions)
+    return self.step_wait()
+
+  def get_step_profile(self, reset=False):
+    """
+    Per phase step time of all envs summed up,
+    {phase: np.array([total seconds, calls])}
+    """
+    return merge_with(
+      lambda totals: np.sum(totals, axis=0),
+      *[env.get_step_profile(reset=reset) for env in self.envs])
+
   def seed(self, seed):
     # for env in self.envs:
     #     env.seed(seed)
@@ -993,7 +993,11 @@ class LocoTransformer(nn.Module):
 
     self.normalizer = None
 
-  def forward(self, x):
+  def encode(self, x):
+    """
+    Compute the tokens of the shared encoder, which could be fed to
+    multiple LocoTransformers sharing the same encoder with forward
+    """
     state_input = x[..., :self.state_input_shape]
     visual_input = x[..., self.state_input_shape:].view(
       torch.Size(state_input.shape[:-1] + self.visual_input_shape)
@@ -1003,7 +1007,12 @@ class LocoTransformer(nn.Module):
       visual_input, state_input,
       detach=self.detach
     )
-    out = visual_out
+    return visual_out
+
+  def forward(self, x, tokens=None):
+    if tokens is None:
+      tokens = self.encode(x)
+    out = tokens
     if self.token_norm:
       out = self.token_ln(out)
     if not self.use_pytorch_encoder:
@@ -82,8 +82,9 @@ class GaussianContPolicyBase():
       mean = torch.tanh(mean)
     return mean.squeeze(0).detach().cpu().numpy()
 
-  def explore(self, x, return_log_probs=False, return_pre_tanh=False):
-    mean, std, log_std = self.forward(x)
+  def explore(self, x, return_log_probs=False, return_pre_tanh=False,
+              **kwargs):
+    mean, std, log_std = self.forward(x, **kwargs)
 
     if self.tanh_action:
       dis = TanhNormal(mean, std)
@@ -124,8 +125,8 @@ class GaussianContPolicyBase():
     dic["action"] = action.squeeze(0)
     return dic
 
-  def update(self, obs, actions):
-    mean, std, log_std = self.forward(obs)
+  def update(self, obs, actions, **kwargs):
+    mean, std, log_std = self.forward(obs, **kwargs)
 
     if self.tanh_action:
       dis = TanhNormal(mean, std)
@@ -483,10 +484,48 @@ class GaussianContPolicyLocoTransformer(
     self.logstd = nn.Parameter(torch.ones(output_shape) * np.log(log_init))
     self.tanh_action = tanh_action
 
-  def forward(self, x):
-    mean = super().forward(x)
+  def forward(self, x, tokens=None):
+    mean = super().forward(x, tokens=tokens)
     logstd = self.logstd
     logstd = torch.clamp(logstd, LOG_SIG_MIN, LOG_SIG_MAX)
     std = torch.exp(logstd)
     std = std.unsqueeze(0).expand_as(mean)
     return mean, std, logstd
+
+
+class SharedEncoderActorCritic(nn.Module):
+  """
+  Actor Critic for policy and value function sharing the same encoder
+  (e.g. LocoTransformer), the encoder tokens are computed once and fed
+  to both heads
+  """
+
+  def __init__(self, pf, vf):
+    super().__init__()
+    assert self.shares_encoder(pf, vf), \
+      "policy and value function should share the same encoder"
+    self.pf = pf
+    self.vf = vf
+
+  @staticmethod
+  def shares_encoder(pf, vf):
+    return hasattr(pf, "encode") and hasattr(vf, "encode") and \
+      getattr(pf, "encoder", None) is not None and \
+      pf.encoder is getattr(vf, "encoder", None) and \
+      pf.detach == vf.detach
+
+  def explore(self, x, **kwargs):
+    tokens = self.pf.encode(x)
+    out = self.pf.explore(x, tokens=tokens, **kwargs)
+    out["value"] = self.vf(x, tokens=tokens)
+    return out
+
+  def update(self, obs, actions):
+    tokens = self.pf.encode(obs)
+    out = self.pf.update(obs, actions, tokens=tokens)
+    out["value"] = self.vf(obs, tokens=tokens)
+    return out
+
+  def forward(self, x):
+    tokens = self.pf.encode(x)
+    return self.pf(x, tokens=tokens), self.vf(x, tokens=tokens)
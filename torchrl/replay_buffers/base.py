@@ -1,22 +1,45 @@
 import numpy as np
+from .quantized_array import QuantizedArray
 
 
 class BaseReplayBuffer():
   """
   Basic Replay Buffer
+      default_dtype: dtype used to store every key
+      key_dtypes: dtype for specific keys, e.g. {"obs": np.float16}
+      quantize: quantized storage for specific keys,
+          e.g. {"obs": {"start": 100, "quantized_dtype": "uint8",
+                        "scale": 0.01, "offset": -2}}
+          see QuantizedArray for details
   """
 
   def __init__(
       self,
       max_replay_buffer_size,
       env_nums=1,
-      time_limit_filter=False):
+      time_limit_filter=False,
+      default_dtype=np.float64,
+      key_dtypes=None,
+      quantize=None):
     self.env_nums = env_nums
     self._max_replay_buffer_size = max_replay_buffer_size // self.env_nums
     self._top = 0
     self._size = 0
     self.time_limit_filter = time_limit_filter
 
+    self.default_dtype = default_dtype
+    self.key_dtypes = key_dtypes if key_dtypes is not None else {}
+    self.quantize = quantize if quantize is not None else {}
+    # shape of every key added, used for memory report
+    self._key_shapes = {}
+
+  def build_storage(self, key, shape):
+    self._key_shapes[key] = shape
+    dtype = self.key_dtypes.get(key, self.default_dtype)
+    if key in self.quantize:
+      return QuantizedArray(shape, dtype=dtype, **self.quantize[key])
+    return np.zeros(shape, dtype=dtype)
+
   def add_sample(self, sample_dict, **kwargs):
     for key in sample_dict:
       if not hasattr(self, "_" + key):
@@ -24,11 +47,32 @@ class BaseReplayBuffer():
         # since it's included in data itself
         self.__setattr__(
           "_" + key,
-          np.zeros((self._max_replay_buffer_size,) +
-                   np.shape(sample_dict[key])))
+          self.build_storage(
+            key,
+            (self._max_replay_buffer_size,) + np.shape(sample_dict[key])))
       self.__getattribute__("_" + key)[self._top, ...] = sample_dict[key]
     self._advance()
 
+  def memory_report(self):
+    """
+    Memory used by every key, compared with storing it in float64
+    """
+    lines = []
+    total_bytes = 0
+    total_float64_bytes = 0
+    for key, shape in self._key_shapes.items():
+      float64_bytes = int(np.prod(shape)) * np.dtype(np.float64).itemsize
+      nbytes = 0
+      if hasattr(self, "_" + key):
+        nbytes = self.__getattribute__("_" + key).nbytes
+      total_bytes += nbytes
+      total_float64_bytes += float64_bytes
+      lines.append("{}: {:.2f} MB (float64: {:.2f} MB)".format(
+        key, nbytes / 1024 ** 2, float64_bytes / 1024 ** 2))
+    lines.append("Total: {:.2f} MB (float64: {:.2f} MB)".format(
+      total_bytes / 1024 ** 2, total_float64_bytes / 1024 ** 2))
+    return "\n".join(lines)
+
   def terminate_episode(self):
     pass
 
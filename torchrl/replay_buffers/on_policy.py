@@ -1,79 +1,176 @@
 import numpy as np
+import torch
 from .base import BaseReplayBuffer
 
 
+def backward_recursion(
+    inputs, coeffs, masks=None, init=0, biases=None, device=None):
+  """
+  Compute out[t] = (inputs[t] + coeffs[t] * out[t + 1] * masks[t])
+  + biases[t] backward in time, with out[T] = init.
+  All arrays are (Time, Env Nums, ...) and every env is processed at once,
+  outputs are written into a preallocated array.
+  The term order follows the per step formulas of GAE / discount reward,
+  so the results are identical to the step by step computation.
+  """
+  # Outputs keep the precision of the recursion, e.g. float64 for
+  # float32 storage with float64 values
+  dtype = np.result_type(*[
+    array for array in [inputs, coeffs, masks, biases, init]
+    if array is not None
+  ])
+  if device is not None:
+    return backward_recursion_torch(
+      inputs, coeffs, masks, init, biases, device, dtype)
+
+  outs = np.zeros(inputs.shape, dtype=dtype)
+  out = init
+  for t in reversed(range(len(inputs))):
+    if masks is None:
+      out = inputs[t] + coeffs[t] * out
+    elif biases is None:
+      out = inputs[t] + coeffs[t] * out
+      out = out * masks[t]
+    else:
+      out = (inputs[t] + coeffs[t] * out * masks[t]) + biases[t]
+    outs[t] = out
+  return outs
+
+
+def backward_recursion_torch(
+    inputs, coeffs, masks=None, init=0, biases=None, device="cpu",
+    dtype=np.float64):
+  """
+  Same recursion as backward_recursion, as a scan over the steps
+  out[t] = a[t] + c[t] * out[t + 1], composed pairwise in log2(Time)
+  passes over all steps instead of one pass per step,
+  results match numpy up to rounding
+  """
+  def to_tensor(array):
+    return torch.tensor(np.asarray(array, dtype=dtype), device=device)
+
+  init = to_tensor(np.broadcast_to(init, inputs.shape[1:]))
+  adds = to_tensor(inputs)
+  muls = to_tensor(coeffs)
+  if masks is not None:
+    masks = to_tensor(masks)
+    muls = muls * masks
+    if biases is None:
+      adds = adds * masks
+  if biases is not None:
+    adds = adds + to_tensor(biases)
+  adds[-1] += muls[-1] * init
+
+  # After the pass with offset, step t maps out[t + 2 * offset] to out[t]
+  offset = 1
+  while offset < len(adds):
+    adds[:-offset] = adds[:-offset] + muls[:-offset] * adds[offset:]
+    muls[:-offset] = muls[:-offset] * muls[offset:]
+    offset *= 2
+  return adds.cpu().numpy()
+
+
 class OnPolicyReplayBufferBase:
   """
   Replay Buffer for On Policy algorithms
   """
 
+  def add_sample(self, sample_dict, **kwargs):
+    if not self.store_next_obs and "next_obs" in sample_dict:
+      # Only next obs of the last step is used to bootstrap the value,
+      # copy it since obs from vec env could be reused in place
+      sample_dict = dict(sample_dict)
+      next_obs = sample_dict.pop("next_obs")
+      if "next_obs" not in self._key_shapes:
+        self._key_shapes["next_obs"] = \
+          (self._max_replay_buffer_size,) + np.shape(next_obs)
+      self._last_next_obs = np.array(
+        next_obs, dtype=self.key_dtypes.get("obs", self.default_dtype))
+    super().add_sample(sample_dict, **kwargs)
+
   def last_sample(self, sample_key):
     return_dict = {}
     for key in sample_key:
+      if key == "next_obs" and not self.store_next_obs:
+        return_dict[key] = self._last_next_obs
+        continue
       return_dict[key] = self.__getattribute__("_"+key)[
         self._max_replay_buffer_size - 1]
     return return_dict
 
-  def generalized_advantage_estimation(self, last_value, gamma, tau):
+  def generalized_advantage_estimation(
+      self, last_value, gamma, tau, device=None):
     """
     use GAE to process rewards
+        device: run the backward recursion with torch on the given device
+            instead of numpy, results are the same up to rounding
     """
-    A = 0
-    advs = []
-    estimate_returns = []
     values = np.concatenate([self._values, np.array([last_value])], 0)
 
+    # Terms not depending on the recursion are computed for all steps
+    # and all envs at once
+    deltas = self._rewards + \
+      (1 - self._terminals) * gamma * values[1:] - \
+      values[:-1]
+    coeffs = (1 - self._terminals) * gamma * tau
+    masks = None
     if self.time_limit_filter:
-      for t in reversed(range(len(self._rewards))):
-        delta = self._rewards[t] + \
-          (1 - self._terminals[t]) * gamma * values[t + 1] - \
-          values[t]
-        A = delta + (1 - self._terminals[t]) * gamma * tau * A
-        A = A * (1 - self._time_limits[t])
-        advs.insert(0, A)
-        estimate_returns.insert(0, A + values[t])
-    else:
-      for t in reversed(range(len(self._rewards))):
-        delta = self._rewards[t] + \
-          (1 - self._terminals[t]) * gamma * values[t + 1] - \
-          values[t]
-        A = delta + (1 - self._terminals[t]) * gamma * tau * A
-        advs.insert(0, A)
-        estimate_returns.insert(0, A + values[t])
-
-    self._advs = np.array(advs)
-    self._estimate_returns = np.array(estimate_returns)
-
-  def discount_reward(self, last_value, gamma):
+      masks = 1 - self._time_limits
+
+    advs = backward_recursion(deltas, coeffs, masks, device=device)
+
+    self._advs = advs
+    self._estimate_returns = advs + values[:-1]
+
+  def discount_reward(self, last_value, gamma, device=None):
     """
     Compute the discounted reward to estimate return and advantages
+        device: run the backward recursion with torch on the given device
+            instead of numpy, results are the same up to rounding
     """
-    advs = []
-    estimate_returns = []
-
-    R = last_value
+    coeffs = (1 - self._terminals) * gamma
     if self.time_limit_filter:
-      for t in reversed(range(len(self._rewards))):
-        R = (self._rewards[t] +
-             (1 - self._terminals[t]) * gamma * R *
-             (1 - self._time_limits[t])) + \
-          self._time_limits[t] * self._values[t]
-        advs.insert(0, R - self._values[t])
-        estimate_returns.insert(0, R)
+      estimate_returns = backward_recursion(
+        self._rewards, coeffs, 1 - self._time_limits,
+        init=last_value,
+        biases=self._time_limits * self._values,
+        device=device)
     else:
-      for t in reversed(range(len(self._rewards))):
-        R = self._rewards[t] + \
-          (1 - self._terminals[t]) * gamma * R
-        advs.insert(0, R - self._values[t])
-        estimate_returns.insert(0, R)
+      estimate_returns = backward_recursion(
+        self._rewards, coeffs, init=last_value, device=device)
+
+    self._advs = estimate_returns - self._values
+    self._estimate_returns = estimate_returns
+
+  def to_device(self, sample_key, device, pin_memory=False):
+    """
+    Copy the whole rollout of sample_key to device once, so that
+    one_iteration with device yields tensors on the device without
+    per minibatch host to device copies
+        pin_memory: stage the data in pinned memory before copying
+    """
+    self._device_data = {}
+    for key in sample_key:
+      data = np.asarray(
+        self.__getattribute__("_"+key)[:], dtype=np.float32)
+      data = torch.from_numpy(data)
+      if pin_memory:
+        data = data.pin_memory()
+      self._device_data[key] = data.to(device, non_blocking=pin_memory)
 
-    self._advs = np.array(advs)
-    self._estimate_returns = np.array(estimate_returns)
+  def release_device(self):
+    self._device_data = None
 
-  def one_iteration(self, batch_size, sample_key, shuffle):
+  def one_iteration(self, batch_size, sample_key, shuffle, device=None):
     assert batch_size % self.env_nums == 0, \
       "batch size should be dividable by env_nums"
     batch_size //= self.env_nums
+
+    if device is not None:
+      yield from self.one_iteration_on_device(
+        batch_size, sample_key, shuffle, device)
+      return
+
     indices = np.arange(self._max_replay_buffer_size)
     if shuffle:
       indices = np.random.permutation(self._max_replay_buffer_size)
@@ -91,6 +188,43 @@ class OnPolicyReplayBufferBase:
       yield return_dict
       pos += batch_size
 
+  def one_iteration_on_device(self, batch_size, sample_key, shuffle, device):
+    if getattr(self, "_device_data", None) is None or \
+        any(key not in self._device_data for key in sample_key):
+      self.to_device(sample_key, device)
+
+    # Permutation generated on device, minibatches are gathered on device
+    if shuffle:
+      indices = torch.randperm(self._max_replay_buffer_size, device=device)
+    else:
+      indices = torch.arange(self._max_replay_buffer_size, device=device)
+
+    pos = 0
+    while pos < self._max_replay_buffer_size:
+      return_dict = {}
+      batch_indices = indices[pos: pos+batch_size]
+      for key in sample_key:
+        data = self._device_data[key][batch_indices]
+        return_dict[key] = data.reshape(
+          (-1,) + tuple(data.shape[2:]))
+
+      yield return_dict
+      pos += batch_size
+
 
 class OnPolicyReplayBuffer(OnPolicyReplayBufferBase, BaseReplayBuffer):
-  pass
+  """
+  On policy replay buffer, stored in float32 by default
+      store_next_obs: store next obs of every step, only the last one
+          is kept if False
+  """
+
+  def __init__(
+      self,
+      max_replay_buffer_size,
+      store_next_obs=True,
+      default_dtype=np.float32,
+      **kwargs):
+    super().__init__(
+      max_replay_buffer_size, default_dtype=default_dtype, **kwargs)
+    self.store_next_obs = store_next_obs
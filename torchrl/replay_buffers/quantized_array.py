@@ -0,0 +1,61 @@
+import numpy as np
+
+
+class QuantizedArray():
+  """
+  Array storing the last dimension from start onwards (e.g. the depth
+  image slice of the observation) in a compact dtype:
+      quantized = round((data - offset) / scale)
+  The part before start is stored with dtype.
+  Supports the indexing used by replay buffers and returns dequantized
+  arrays of dtype.
+  """
+
+  def __init__(
+      self,
+      shape,
+      start=0,
+      dtype=np.float32,
+      quantized_dtype=np.uint8,
+      scale=1.,
+      offset=0.):
+    self.shape = tuple(shape)
+    self.start = start
+    self.dtype = np.dtype(dtype)
+    self.quantized_dtype = np.dtype(quantized_dtype)
+    self.scale = scale
+    self.offset = offset
+
+    self._raw = np.zeros(self.shape[:-1] + (start,), dtype=self.dtype)
+    self._quantized = np.zeros(
+      self.shape[:-1] + (self.shape[-1] - start,),
+      dtype=self.quantized_dtype)
+
+  def quantize(self, data):
+    data = (np.asarray(data, dtype=self.dtype) - self.offset) / self.scale
+    if np.issubdtype(self.quantized_dtype, np.integer):
+      info = np.iinfo(self.quantized_dtype)
+      data = np.clip(np.rint(data), info.min, info.max)
+    return data.astype(self.quantized_dtype)
+
+  def dequantize(self, data):
+    return data.astype(self.dtype) * self.scale + self.offset
+
+  def __setitem__(self, index, value):
+    value = np.asarray(value)
+    self._raw[index] = value[..., :self.start]
+    self._quantized[index] = self.quantize(value[..., self.start:])
+
+  def __getitem__(self, index):
+    raw = self._raw[index]
+    out = np.empty(raw.shape[:-1] + self.shape[-1:], dtype=self.dtype)
+    out[..., :self.start] = raw
+    out[..., self.start:] = self.dequantize(self._quantized[index])
+    return out
+
+  def __len__(self):
+    return self.shape[0]
+
+  @property
+  def nbytes(self):
+    return self._raw.nbytes + self._quantized.nbytes
@@ -0,0 +1,106 @@
+"""A preallocated ring buffer of the recent depth frames of an env.
+
+Frames are addressed by age like the deque the envs used before: age 0 is the
+newest frame. Selecting the stacked observation frames is one vectorized take
+into a preallocated output, and the delay interpolation (mean of the frames
+idx..idx+delay) is a difference of two entries of a running prefix sum, so no
+per-step arrays are allocated on the observation path.
+"""
+import numpy as np
+
+
+class DepthFrameHistory(object):
+  """Keeps the last frames of a depth camera in a ring buffer."""
+
+  def __init__(self,
+               num_frames,
+               frame_shape=(1, 64, 64),
+               num_selected=4,
+               max_delay=None,
+               dtype=np.float32):
+    """Initializes the history.
+
+    Args:
+      num_frames: The number of frames addressable by select().
+      frame_shape: The shape of a single frame.
+      num_selected: The number of frames returned by select / interpolate.
+      max_delay: The largest delay passed to interpolate(), None disables
+        interpolation and the prefix sum bookkeeping.
+      dtype: The dtype of the stored frames.
+    """
+    self.num_frames = num_frames
+    self.frame_shape = tuple(frame_shape)
+    self.max_delay = max_delay
+    # Interpolation reads up to max_delay frames older than the oldest
+    # selectable one, plus the prefix sum entry right before them.
+    self.capacity = num_frames
+    if max_delay is not None:
+      self.capacity += max_delay + 1
+
+    self._frames = np.zeros(
+      (self.capacity,) + self.frame_shape, dtype=dtype)
+    self._head = 0
+    self._output = np.zeros(
+      (num_selected,) + self.frame_shape, dtype=dtype)
+    self._prefix_sum = None
+    if max_delay is not None:
+      # float64 keeps the running sum exact enough over long episodes
+      self._prefix_sum = np.zeros(
+        (self.capacity,) + self.frame_shape, dtype=np.float64)
+      self._window_sum = np.zeros(
+        (num_selected,) + self.frame_shape, dtype=np.float64)
+      self._window_start = np.zeros_like(self._window_sum)
+
+  def reset(self, frame):
+    """Fills the whole history with a frame."""
+    self._head = self.capacity - 1
+    self._frames[:] = frame
+    if self._prefix_sum is not None:
+      # Slot i holds the sum of the frames from the oldest one up to slot i.
+      counts = np.arange(1, self.capacity + 1, dtype=np.float64)
+      self._prefix_sum[:] = counts.reshape(
+        (-1,) + (1,) * len(self.frame_shape)) * self._frames[0]
+
+  def append(self, frame):
+    """Adds the newest frame, overwriting the oldest one."""
+    previous = self._head
+    self._head = (self._head + 1) % self.capacity
+    self._frames[self._head] = frame
+    if self._prefix_sum is not None:
+      np.add(self._prefix_sum[previous], self._frames[self._head],
+             out=self._prefix_sum[self._head])
+
+  def slots(self, ages):
+    """Converts frame ages into ring buffer slots."""
+    return (self._head - np.asarray(ages)) % self.capacity
+
+  def __getitem__(self, age):
+    return self._frames[(self._head - age) % self.capacity]
+
+  def select(self, frame_idx):
+    """Returns the frames of the given ages stacked along the first axis.
+
+    The result is a view of a buffer owned by the history, it is overwritten
+    by the next select / interpolate call.
+    """
+    np.take(self._frames, self.slots(frame_idx), axis=0, out=self._output)
+    return self._output
+
+  def interpolate(self, frame_idx, delay):
+    """Returns the mean of the frames idx, ..., idx + delay for each idx.
+
+    The result is a view of a buffer owned by the history, it is overwritten
+    by the next select / interpolate call.
+    """
+    if delay == 0:
+      return self.select(frame_idx)
+    assert self._prefix_sum is not None and delay <= self.max_delay
+    frame_idx = np.asarray(frame_idx)
+    np.take(self._prefix_sum, self.slots(frame_idx), axis=0,
+            out=self._window_sum)
+    np.take(self._prefix_sum, self.slots(frame_idx + delay + 1), axis=0,
+            out=self._window_start)
+    np.subtract(self._window_sum, self._window_start, out=self._window_sum)
+    np.divide(self._window_sum, delay + 1, out=self._output,
+              casting='same_kind')
+    return self._output
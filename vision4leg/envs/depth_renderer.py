@@ -0,0 +1,134 @@
+"""Per-process depth rendering service for the locomotion gym envs.
+
+Every env of a worker process registers its pybullet client here instead of
+loading the EGL plugin on its own. The renderer keeps one plugin handle per
+physics client (pybullet instantiates renderer plugins per physics server, so
+the EGL context itself cannot be shared between clients), computes the robot
+camera view and renders the 64x64 depth views of the envs.
+"""
+import pkgutil
+import weakref
+
+import numpy as np
+import pybullet  # pytype: disable=import-error
+
+egl = pkgutil.get_loader('eglRenderer')
+
+DEPTH_WIDTH = 64
+DEPTH_HEIGHT = 64
+# Fixed projection of the head camera (fov 60, near 0.01, far 1000).
+DEPTH_PROJECTION_MATRIX = [
+  1.0825318098068237, 0.0, 0.0, 0.0, 0.0, 1.732050895690918, 0.0, 0.0, 0.0, 0.0,
+  -1.0002000331878662, -1.0, 0.0, 0.0, -0.020002000033855438, 0.0
+]
+# Offset of the camera from the trunk origin along the forward axis.
+CAMERA_FORWARD_OFFSET = 0.2309
+
+_RENDERER = None
+
+
+def get_renderer():
+  """Returns the depth renderer of the current process, creating it once."""
+  global _RENDERER
+  if _RENDERER is None:
+    _RENDERER = DepthRenderer()
+  return _RENDERER
+
+
+class DepthRenderer(object):
+  """Renders the head camera depth views of all envs in a process."""
+
+  def __init__(self,
+               width=DEPTH_WIDTH,
+               height=DEPTH_HEIGHT,
+               projection_matrix=DEPTH_PROJECTION_MATRIX):
+    self.width = width
+    self.height = height
+    self.projection_matrix = projection_matrix
+    # Keyed by the client object, client ids are reused after disconnect.
+    self._plugin_ids = weakref.WeakKeyDictionary()
+
+  def attach(self, pybullet_client):
+    """Loads the EGL renderer for a client unless it is already attached.
+
+    Args:
+      pybullet_client: The BulletClient of an env.
+
+    Returns:
+      The plugin id of the EGL renderer inside that client.
+    """
+    if pybullet_client in self._plugin_ids:
+      return self._plugin_ids[pybullet_client]
+    plugin_id = pybullet_client.loadPlugin(
+      egl.get_filename(), "_eglRendererPlugin")
+    assert plugin_id != -1, 'Cannot load PyBullet plugin'
+    pybullet_client.configureDebugVisualizer(pybullet.COV_ENABLE_RENDERING, 0)
+    pybullet_client.configureDebugVisualizer(pybullet.COV_ENABLE_GUI, 0)
+    self._plugin_ids[pybullet_client] = plugin_id
+    return plugin_id
+
+  def detach(self, pybullet_client):
+    """Unloads the EGL renderer of a client, e.g. before it disconnects."""
+    plugin_id = self._plugin_ids.pop(pybullet_client, None)
+    if plugin_id is not None:
+      pybullet_client.unloadPlugin(plugin_id)
+
+  def view_matrix(self, pybullet_client, body_id, front=False):
+    """Computes the view matrix of the camera mounted on the robot trunk.
+
+    Args:
+      pybullet_client: The BulletClient the robot lives in.
+      body_id: The unique id of the robot.
+      front: Whether the camera looks straight ahead instead of tilted down.
+
+    Returns:
+      A tuple of the view matrix and the camera position.
+    """
+    linkstate = pybullet_client.getLinkState(
+      body_id, 0, computeForwardKinematics=True)
+    camMat = pybullet_client.getMatrixFromQuaternion(linkstate[1])
+    forwardVec = [camMat[0], camMat[3], camMat[6]]
+    camPos = [
+      linkstate[0][i] + forwardVec[i] * CAMERA_FORWARD_OFFSET
+      for i in range(3)]
+
+    if front:
+      camUpVec = [0, 0, 1]
+      forwardVec2 = forwardVec
+    else:
+      camUpVec = [
+        (camMat[2] + camMat[0]) / 2,
+        (camMat[5] + camMat[3]) / 2,
+        (camMat[8] + camMat[6]) / 2]
+      forwardVec2 = [
+        (-camMat[2] + camMat[0]) / 2,
+        (-camMat[5] + camMat[3]) / 2,
+        (-camMat[8] + camMat[6]) / 2]
+
+    camTarget = [camPos[i] + forwardVec2[i] * 10 for i in range(3)]
+    return pybullet_client.computeViewMatrix(
+      camPos, camTarget, camUpVec), camPos
+
+  def render(self, pybullet_client, view_matrix, out=None):
+    """Renders one depth view.
+
+    Args:
+      pybullet_client: The BulletClient to render.
+      view_matrix: The view matrix returned by view_matrix().
+      out: Optional (1, height, width) array to write the depth buffer into.
+
+    Returns:
+      The raw (non-linear, in [0, 1]) depth buffer of shape (1, height, width).
+    """
+    _, _, _, depth_img, _ = pybullet_client.getCameraImage(
+      self.width, self.height,
+      viewMatrix=view_matrix, projectionMatrix=self.projection_matrix,
+      shadow=1,
+      lightDirection=[1, 1, 1],
+      renderer=pybullet.ER_BULLET_HARDWARE_OPENGL,
+    )
+    depth_img = np.reshape(depth_img, (1, self.height, self.width))
+    if out is None:
+      return np.array(depth_img, dtype=np.float32)
+    out[...] = depth_img
+    return out
@@ -142,7 +142,7 @@ class RandoDirWrapper(gym.ObservationWrapper):
 
     return obs
 
-  def reset(self):
+  def reset(self, **kwargs):
     self.time_count_randdir = 0
     self.current_angle = np.random.uniform(
       low=-np.pi / 2,
@@ -153,7 +153,7 @@ class RandoDirWrapper(gym.ObservationWrapper):
       np.sin(self.current_angle)
     ])
     self.env.task.target_vel_dir = self.current_vec
-    return super().reset()
+    return super().reset(**kwargs)
 
 
 def build_a1_ground_env(
@@ -200,6 +200,16 @@ def build_a1_ground_env(
     curriculum=False,
     interpolation=False,
     fixed_delay_observation=False,
+    depth_lookup_table=False,
+    profile_step=False,
+    enable_hard_reset=False,
+    reset_time=2,
+    cache_settled_state=False,
+    num_heightfields=None,
+    heightfield_cache_dir=None,
+    pybullet_client=None,
+    tile_origin=None,
+    num_reset_snapshots=0,
 ):
 
   sim_params = locomotion_gym_config.SimulationParameters()
@@ -213,13 +223,15 @@ def build_a1_ground_env(
     print("Use TORQUE or POSITION")
     exit()
 
-  sim_params.reset_time = 2
+  sim_params.reset_time = reset_time
   sim_params.time_step_s = time_step_s
   sim_params.num_action_repeat = num_action_repeat
   sim_params.enable_action_interpolation = enable_action_interpolation
   sim_params.enable_action_filter = enable_action_filter
   sim_params.enable_clip_motor_commands = False
 
+  # soft resets keep the robot, ground and obstacle bodies and re-pose them
+  sim_params.enable_hard_reset = enable_hard_reset
   if subgoal:
     sim_params.enable_hard_reset = False
 
@@ -303,13 +315,17 @@ def build_a1_ground_env(
     mesh_scale=[0.6, 0.3, 0.2],
     height_range=0.1,
     random_shape=random_shape,
-    moving=moving
+    moving=moving,
+    num_heightfields=num_heightfields,
+    heightfield_cache_dir=heightfield_cache_dir
   )
   randomizers.append(terrain_randomizer)
 
   init_pos = None
   init_ori = None
   init_pos = a1_rg.QUADRUPED_INIT_POSITION[terrain_type]
+  if tile_origin is not None:
+    init_pos = list(np.add(init_pos, tile_origin))
   if "mount" in terrain_type:
     init_ori = a1_rg.QUADRUPED_INIT_ORI[terrain_type]
   env = locomotion_gym_env_with_rich_information.LocomotionGymEnv(
@@ -331,7 +347,13 @@ def build_a1_ground_env(
     reset_frame_idx=reset_frame_idx,
     reset_frame_idx_each_step=reset_frame_idx_each_step,
     interpolation=interpolation,
-    fixed_delay_observation=fixed_delay_observation
+    fixed_delay_observation=fixed_delay_observation,
+    depth_lookup_table=depth_lookup_table,
+    profile_step=profile_step,
+    cache_settled_state=cache_settled_state,
+    pybullet_client=pybullet_client,
+    tile_origin=tile_origin,
+    num_reset_snapshots=num_reset_snapshots
   )
 
   env = observation_dictionary_to_array_wrapper.ObservationDictionaryToArrayWrapper(
@@ -397,6 +419,11 @@ def build_a1_ground_mpc_env(
     curriculum=False,
     interpolation=False,
     vision_only=False,
+    depth_lookup_table=False,
+    profile_step=False,
+    enable_hard_reset=False,
+    num_heightfields=None,
+    heightfield_cache_dir=None,
 ):
 
   sim_params = locomotion_gym_config.SimulationParameters()
@@ -417,6 +444,8 @@ def build_a1_ground_mpc_env(
   sim_params.enable_action_filter = enable_action_filter
   sim_params.enable_clip_motor_commands = False
 
+  # soft resets keep the robot, ground and obstacle bodies and re-pose them
+  sim_params.enable_hard_reset = enable_hard_reset
   if subgoal:
     sim_params.enable_hard_reset = False
 
@@ -468,7 +497,9 @@ def build_a1_ground_mpc_env(
     mesh_scale=[0.6, 0.3, 0.2],
     height_range=0.1,
     random_shape=random_shape,
-    moving=moving
+    moving=moving,
+    num_heightfields=num_heightfields,
+    heightfield_cache_dir=heightfield_cache_dir
   )
   randomizers.append(terrain_randomizer)
 
@@ -496,7 +527,9 @@ def build_a1_ground_mpc_env(
     get_image_interval=get_image_interval,
     reset_frame_idx=reset_frame_idx,
     reset_frame_idx_each_step=reset_frame_idx_each_step,
-    interpolation=interpolation
+    interpolation=interpolation,
+    depth_lookup_table=depth_lookup_table,
+    profile_step=profile_step
   )
   env = observation_dictionary_to_array_wrapper.ObservationDictionaryToArrayWrapper(
     env)
@@ -72,10 +72,10 @@ class CurriculumWrapperEnv(object):
     self._total_step_count += 1
     return self._gym_env.step(action)
 
-  def reset(self):
+  def reset(self, **kwargs):
     if self._enable_curriculum():
       self._update_time_limit()
-    return self._gym_env.reset()
+    return self._gym_env.reset(**kwargs)
 
   def _enable_curriculum(self):
     """Check if curriculum is enabled."""
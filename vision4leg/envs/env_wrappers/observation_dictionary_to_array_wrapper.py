@@ -27,6 +27,13 @@ class ObservationDictionaryToArrayWrapper(gym.Env):
     self.observation_space = self._flatten_observation_spaces(
       self._gym_env.observation_space)
     self.action_space = self._gym_env.action_space
+    # Envs that write their observations into one flat array at fixed
+    # offsets return it directly, without building the dictionary.
+    self._flat_observation = (
+      not observation_excluded and
+      hasattr(self._gym_env, "enable_flat_observation"))
+    if self._flat_observation:
+      self._gym_env.enable_flat_observation()
 
   def __getattr__(self, attr):
     return getattr(self._gym_env, attr)
@@ -39,11 +46,27 @@ class ObservationDictionaryToArrayWrapper(gym.Env):
 
   def _flatten_observation(self, input_observation):
     """Flatten the dictionary to an array."""
+    if self._flat_observation:
+      return input_observation
     return env_utils.flatten_observations(
       observation_dict=input_observation,
       observation_excluded=self.observation_excluded)
 
-  def reset(self, initial_motor_angles=None, reset_duration=0.0):
+  def reset(self, initial_motor_angles=None, reset_duration=0.0,
+            from_snapshot=False):
+    """Resets the wrapped environment.
+
+    Args:
+      initial_motor_angles: The desired joint angles after reset.
+      reset_duration: The time (in seconds) to rotate the motors to them.
+      from_snapshot: Whether to start from a reset snapshot instead, see
+        partial_reset(). Lets vector envs reset through the wrappers above.
+
+    Returns:
+      The flattened initial observation.
+    """
+    if from_snapshot:
+      return self.partial_reset()
     observation = self._gym_env.reset(
       initial_motor_angles=initial_motor_angles,
       reset_duration=reset_duration)
@@ -62,5 +85,13 @@ class ObservationDictionaryToArrayWrapper(gym.Env):
     observation_dict, reward, done, _ = self._gym_env.step(action)
     return self._flatten_observation(observation_dict), reward, done, _
 
+  def restore_snapshot(self, snapshot_id, restore_random_state=True):
+    observation = self._gym_env.restore_snapshot(
+      snapshot_id, restore_random_state=restore_random_state)
+    return self._flatten_observation(observation)
+
+  def partial_reset(self):
+    return self._flatten_observation(self._gym_env.partial_reset())
+
   def render(self, mode='human'):
     return self._gym_env.render(mode)
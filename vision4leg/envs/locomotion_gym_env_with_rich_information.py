@@ -18,16 +18,22 @@ import sys
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 from vision4leg.envs.sensors import space_utils
 from vision4leg.envs.sensors import sensor
+from vision4leg.envs.sensors import sensor_wrappers
 from vision4leg.robots import robot_config
 import cv2
 import vision4leg.envs.pybullet_client as bullet_client
+from vision4leg.envs import depth_renderer
+from vision4leg.envs import depth_frame_history
+from vision4leg.utilities import depth_processing
+from vision4leg.envs import step_profiler
 import pybullet  # pytype: disable=import-error
 import numpy as np
 from gym.utils import seeding
 from gym import spaces
 import gym
 import collections
-import pkgutil
+import copy
+import random
 from collections import deque
 
 # import pybullet_utils.bullet_client as bullet_client
@@ -36,9 +42,11 @@ from collections import deque
 _ACTION_EPS = 0.01
 _NUM_SIMULATION_ITERATION_STEPS = 300
 _LOG_BUFFER_LENGTH = 5000
-
-
-egl = pkgutil.get_loader('eglRenderer')
+# Env attributes that change during an episode, saved by save_snapshot().
+_SNAPSHOT_ATTRIBUTES = (
+  "_env_step_counter", "_last_action", "_last_base_position", "_world_dict",
+  "frame_idx", "interpolation_delay", "current_frames", "depth_frames",
+  "count_t")
 
 
 class LocomotionGymEnv(gym.Env):
@@ -73,7 +81,13 @@ class LocomotionGymEnv(gym.Env):
                reset_frame_idx_each_step=False,
                blinding_spot=True,
                interpolation=False,
+               depth_lookup_table=False,
+               profile_step=False,
                fixed_delay_observation=False,
+               cache_settled_state=False,
+               pybullet_client=None,
+               tile_origin=None,
+               num_reset_snapshots=0,
                ):
     """Initializes the locomotion gym environment.
 
@@ -88,13 +102,28 @@ class LocomotionGymEnv(gym.Env):
       env_randomizers: A list of EnvRandomizer(s). An EnvRandomizer may
         randomize the physical property of minitaur, change the terrrain during
         reset(), or add perturbation forces during step().
+      cache_settled_state: Whether the robots rebuilt by hard resets restore
+        the state captured after the first settle down motion instead of
+        simulating it again.
+      pybullet_client: A pybullet_client.TileClient on a world shared with
+        other envs. The env then neither connects nor resets the simulation,
+        it adds its ground and robot to the world and only resets softly.
+      tile_origin: The world position of the tile of a shared world, the
+        terrain is built around it. init_pos is in world coordinates.
+      num_reset_snapshots: The size of the pool of start states drawn by
+        partial_reset(). The first resets save a snapshot each until the pool
+        is full.
 
     Raises:
-      ValueError: If the num_action_repeat is less than 1.
+      ValueError: If the num_action_repeat is less than 1, if an env on a
+        shared world is configured for hard resets, or if reset snapshots are
+        asked for along with hard resets or a shared world.
 
     """
     self.count_t = 0
     self.seed()
+    self.profile_step = profile_step
+    self.step_profiler = step_profiler.StepProfiler(enabled=profile_step)
     self._gym_config = gym_config
     self._robot_class = robot_class
     self._robot_sensors = robot_sensors
@@ -132,6 +161,12 @@ class LocomotionGymEnv(gym.Env):
     self.front = front
     self.fric_coeff = fric_coeff
     self.stateId = -1
+    self._settled_state_cache = {} if cache_settled_state else None
+    # Snapshots by pybullet state id, and their ids for O(1) random draws.
+    self._snapshots = {}
+    self._snapshot_ids = []
+    # The pool fills from the first reset after the construction.
+    self._num_reset_snapshots = 0
     self._sensors = env_sensors if env_sensors is not None else list()
     if self._robot_class is None:
       raise ValueError('robot_class cannot be None.')
@@ -158,6 +193,15 @@ class LocomotionGymEnv(gym.Env):
     self._num_bullet_solver_iterations = int(
       _NUM_SIMULATION_ITERATION_STEPS / self._num_action_repeat)
     self._is_render = gym_config.simulation_parameters.enable_rendering
+    self._shared_world = pybullet_client is not None
+    if (self._shared_world and
+        gym_config.simulation_parameters.enable_hard_reset):
+      raise ValueError('envs on a shared world only support soft resets.')
+    if num_reset_snapshots and (
+        self._shared_world or
+        gym_config.simulation_parameters.enable_hard_reset):
+      raise ValueError(
+        'reset snapshots need soft resets and a world of the env\'s own.')
 
     # The wall-clock time at which the last frame is rendered.
     self._last_frame_time = 0.0
@@ -172,9 +216,20 @@ class LocomotionGymEnv(gym.Env):
       0 + self.frame_extract * 3
     ]
     self.current_frames = deque(maxlen=self.num_stored_frames)
-    self.depth_frames = deque(maxlen=self.num_stored_frames)
-
-    if self._is_render:
+    self._depth_frame = np.zeros((1, 64, 64), dtype=np.float32)
+    self.depth_processor = depth_processing.DepthProcessor(
+      min_depth=0.3, max_depth=10, use_lookup_table=depth_lookup_table)
+    self._flat_observation = False
+    self._observation_layout = None
+    # Historic sensors are updated together, see sensor_wrappers.
+    self._sensor_history_groups = None
+    self.depth_frames = depth_frame_history.DepthFrameHistory(
+      self.num_stored_frames,
+      max_delay=self.frame_extract - 1 if self.interpolation else None)
+
+    if self._shared_world:
+      self._pybullet_client = pybullet_client
+    elif self._is_render:
       if self._record_video:
         self._pybullet_client = pybullet
         self._pybullet_client .connect(
@@ -192,17 +247,18 @@ class LocomotionGymEnv(gym.Env):
         connection_mode=pybullet.DIRECT,
         # options=optionstring
       )
-      if self.get_image:
-        self.plugin_id = self._pybullet_client.loadPlugin(
-          egl.get_filename(),
-          "_eglRendererPlugin")
-        assert self.plugin_id != -1, 'Cannot load PyBullet plugin'
-        print(self.plugin_id)
-
-        self.pybullet_client.configureDebugVisualizer(
-          pybullet.COV_ENABLE_RENDERING, 0)
-        self.pybullet_client.configureDebugVisualizer(
-          pybullet.COV_ENABLE_GUI, 0)
+    if self.get_image:
+      self.depth_renderer = depth_renderer.get_renderer()
+      # A GUI client renders through its own OpenGL context, the EGL plugin
+      # is only loaded into headless clients.
+      if not self._is_render:
+        self.plugin_id = self.depth_renderer.attach(
+          pybullet_client.shared_client if self._shared_world
+          else self._pybullet_client)
+    # Terrain code builds through the client of the tile, if any.
+    self._world_client = self._pybullet_client
+    if tile_origin is not None:
+      self._world_client = self._pybullet_client.translated(tile_origin)
 
     self.pybullet_client.setAdditionalSearchPath(
       os.path.join(os.path.dirname(__file__), '../assets'))
@@ -223,6 +279,7 @@ class LocomotionGymEnv(gym.Env):
     self.reset()
 
     self._hard_reset = gym_config.simulation_parameters.enable_hard_reset
+    self._num_reset_snapshots = num_reset_snapshots
 
     # Construct the observation space from the list of sensors. Note that we
     # will reconstruct the observation_space after the robot is created.
@@ -277,6 +334,8 @@ class LocomotionGymEnv(gym.Env):
   def close(self):
     if hasattr(self, '_robot') and self._robot:
       self._robot.Terminate()
+    if hasattr(self, 'depth_renderer'):
+      self.depth_renderer.detach(self._pybullet_client)
 
   def seed(self, seed=None):
     self.np_random, self.np_random_seed = seeding.np_random(seed)
@@ -336,7 +395,11 @@ class LocomotionGymEnv(gym.Env):
       self.interpolation_delay = np.random.randint(0, self.frame_extract)
     # Clear the simulation world and rebuild the robot interface.
     if self._hard_reset:
-      self._pybullet_client.resetSimulation()
+      # The saved states refer to the bodies removed here.
+      for snapshot_id in list(self._snapshot_ids):
+        self.remove_snapshot(snapshot_id)
+      if not self._shared_world:
+        self._pybullet_client.resetSimulation()
       self._pybullet_client.setPhysicsEngineParameter(
         numSolverIterations=self._num_bullet_solver_iterations)
       self._pybullet_client.setTimeStep(self._sim_time_step)
@@ -346,7 +409,7 @@ class LocomotionGymEnv(gym.Env):
 
       # Rebuild the world.
       self._world_dict = {
-        "ground": self._pybullet_client.loadURDF("plane_implicit.urdf")
+        "ground": self._world_client.loadURDF("plane_implicit.urdf")
       }
       # Rebuild the robot
       self._robot = self._robot_class(
@@ -367,7 +430,9 @@ class LocomotionGymEnv(gym.Env):
         allow_knee_contact=self._gym_config.simulation_parameters.
         allow_knee_contact,
         reset_position_random_range=self.random_init_range,
-        init_pos=self.init_pos
+        init_pos=self.init_pos,
+        is_render=self._is_render,
+        settled_state_cache=self._settled_state_cache
       )
     for env_randomizer in self._env_randomizers:
       env_randomizer.randomize_env(self)
@@ -393,6 +458,11 @@ class LocomotionGymEnv(gym.Env):
 
     for s in self.all_sensors():
       s.on_reset(self)
+    if self._sensor_history_groups is None:
+      self._sensor_history_groups = sensor_wrappers.group_historic_sensors(
+        self.all_sensors())
+    for group in self._sensor_history_groups:
+      group.on_reset(self)
 
     if self._task and hasattr(self._task, 'reset'):
       self._task.reset(self)
@@ -404,7 +474,10 @@ class LocomotionGymEnv(gym.Env):
       rollingFriction=self.fric_coeff[2]
     )
 
-    return self._get_observation(reset=True)
+    observation = self._get_observation(reset=True)
+    if len(self._snapshot_ids) < self._num_reset_snapshots:
+      self.save_snapshot()
+    return observation
 
   def step(self, action):
     """Step forward the simulation, given the action.
@@ -428,6 +501,17 @@ class LocomotionGymEnv(gym.Env):
       ValueError: The action dimension is not the same as the number of motors.
       ValueError: The magnitude of actions is out of bounds.
     """
+    lap_time = self._start_step(action)
+    self._robot.Step(action)
+    lap_time = self.step_profiler.lap("robot_step", lap_time)
+    return self._finish_step(lap_time)
+
+  def _start_step(self, action):
+    """Runs the part of step() before the robot is stepped.
+
+    Returns:
+      The profiler mark to pass on to _finish_step().
+    """
     self._last_base_position = self._robot.GetBasePosition()
     self._last_action = action
 
@@ -435,14 +519,27 @@ class LocomotionGymEnv(gym.Env):
       self._pybullet_client.configureDebugVisualizer(
         self._pybullet_client.COV_ENABLE_SINGLE_STEP_RENDERING, 1)
 
+    profiler = self.step_profiler
+    lap_time = profiler.start()
     for env_randomizer in self._env_randomizers:
       env_randomizer.randomize_step(self)
+    return profiler.lap("randomize_step", lap_time)
 
-    # robot class and put the logics here.
-    self._robot.Step(action)
+  def _finish_step(self, lap_time):
+    """Runs the part of step() after the robot is stepped.
 
+    Args:
+      lap_time: The profiler mark the sensor phase is measured from.
+
+    Returns:
+      The observation, reward, done and info of step().
+    """
+    profiler = self.step_profiler
     for s in self.all_sensors():
       s.on_step(self)
+    for group in self._sensor_history_groups:
+      group.on_step(self)
+    lap_time = profiler.lap("sensor_on_step", lap_time)
 
     if self._task and hasattr(self._task, 'update'):
       self._task.update(self)
@@ -453,6 +550,7 @@ class LocomotionGymEnv(gym.Env):
     self._env_step_counter += 1
     if done:
       self._robot.Terminate()
+    profiler.lap("task", lap_time)
     return self._get_observation(), reward, done, {}
 
   def render(self, mode='rgb_array'):
@@ -530,13 +628,159 @@ class LocomotionGymEnv(gym.Env):
       return self._task(self)
     return 0
 
-  def _get_observation(self, reset=False):
+  def depth_view(self):
+    """Returns the view matrix of the depth camera."""
+    view_mat, _ = self.depth_renderer.view_matrix(
+      self.pybullet_client, self._robot.quadruped, front=self.front)
+    return view_mat
+
+  def get_step_profile(self, reset=False):
+    """Returns {phase: np.array([total seconds, calls])} of the steps."""
+    return self.step_profiler.profile(reset=reset)
+
+  def _snapshot_objects(self):
+    """Returns the objects whose attributes are saved by snapshots."""
+    objects = list(self.all_sensors()) + list(self._sensor_history_groups)
+    objects += self._env_randomizers
+    if self._task is not None and self._task not in objects:
+      objects.append(self._task)
+    return objects
+
+  def _snapshot_memo(self, objects):
+    """Returns a deepcopy memo that keeps references to shared objects.
+
+    Attributes referring to the env, the robot, the pybullet client or one of
+    the snapshot objects are kept as they are, everything else they own, like
+    sensor histories or obstacle positions, is copied.
+    """
+    shared = [self, self._robot, self._pybullet_client] + objects
+    return {id(obj): obj for obj in shared}
+
+  def save_snapshot(self):
+    """Saves the current state of the episode in memory.
+
+    The simulation is saved with pybullet's saveState(), that covers the
+    poses and velocities of the robot and all obstacles. Saved along with it
+    are the attributes of the robot, the env counters and depth frames, the
+    state of the sensors, the task and the randomizers, and the random number
+    generators. Masses and frictions are not part of it, restoring keeps the
+    ones set by the last randomization. Bodies must not be added or removed
+    before restoring, so hard resets drop all snapshots.
+
+    Returns:
+      The id of the snapshot, see restore_snapshot().
+
+    Raises:
+      RuntimeError: If the env is on a shared world, saveState() would cover
+        the other envs too.
+    """
+    if self._shared_world:
+      raise RuntimeError('cannot save snapshots of a shared world.')
+    objects = self._snapshot_objects()
+    attributes = {name: getattr(self, name) for name in _SNAPSHOT_ATTRIBUTES
+                  if hasattr(self, name)}
+    snapshot_id = self._pybullet_client.saveState()
+    self._snapshots[snapshot_id] = {
+      "robot": self._robot.GetSnapshot(),
+      "env": copy.deepcopy(
+        (attributes, [obj.__dict__ for obj in objects]),
+        self._snapshot_memo(objects)),
+      "random_state": (self.np_random.get_state(), np.random.get_state(),
+                       random.getstate()),
+    }
+    self._snapshot_ids.append(snapshot_id)
+    return snapshot_id
+
+  def restore_snapshot(self, snapshot_id, restore_random_state=True):
+    """Returns the env to the state saved by save_snapshot().
+
+    Args:
+      snapshot_id: The id returned by save_snapshot(). A snapshot can be
+        restored any number of times.
+      restore_random_state: Whether the random number generators are restored
+        too, which replays the same randomization after the snapshot.
+
+    Returns:
+      The observation at the time the snapshot was saved.
+    """
+    snapshot = self._snapshots[snapshot_id]
+    self._pybullet_client.restoreState(stateId=snapshot_id)
+    self._robot.RestoreSnapshot(snapshot["robot"])
+    objects = self._snapshot_objects()
+    attributes, object_attributes = copy.deepcopy(
+      snapshot["env"], self._snapshot_memo(objects))
+    for name, value in attributes.items():
+      setattr(self, name, value)
+    for obj, obj_attributes in zip(objects, object_attributes):
+      obj.__dict__.update(obj_attributes)
+    if restore_random_state:
+      np_random_state, global_np_state, python_state = snapshot["random_state"]
+      self.np_random.set_state(np_random_state)
+      np.random.set_state(global_np_state)
+      random.setstate(python_state)
+    return self._get_observation(render=False)
+
+  def remove_snapshot(self, snapshot_id):
+    """Frees a snapshot saved by save_snapshot()."""
+    del self._snapshots[snapshot_id]
+    self._snapshot_ids.remove(snapshot_id)
+    self._pybullet_client.removeState(snapshot_id)
+
+  def partial_reset(self):
+    """Starts a new episode from a random saved snapshot.
+
+    Saving a few snapshots right after reset() makes a pool of settled start
+    states, drawing one only restores it instead of rebuilding the terrain
+    and settling the robot. The random number generators are not restored,
+    so episodes from the same snapshot are randomized differently. Until the
+    pool holds num_reset_snapshots snapshots, or one if that is 0, this is a
+    full reset() that fills it.
+
+    Returns:
+      The observation at the time the drawn snapshot was saved.
+    """
+    if len(self._snapshot_ids) < max(self._num_reset_snapshots, 1):
+      return self.reset()
+    snapshot_id = self._snapshot_ids[
+      self.np_random.randint(len(self._snapshot_ids))]
+    return self.restore_snapshot(snapshot_id, restore_random_state=False)
+
+  def enable_flat_observation(self):
+    """Makes reset() and step() return one flat float32 array.
+
+    The observations are written into a preallocated array at the offsets of
+    the sorted observation dictionary, see space_utils.ObservationLayout.
+    """
+    self._flat_observation = True
+    self._observation_layout = None
+
+  def _return_observation(self, observations):
+    if not self._flat_observation:
+      return observations
+    if self._observation_layout is None:
+      # Compiled from the first dictionary, later calls write directly.
+      layout = space_utils.ObservationLayout.from_observation(observations)
+      layout.write(observations)
+      self._observation_layout = layout
+    return self._observation_layout.array()
+
+  def _get_observation(self, reset=False, render=True):
     """Get observation of this environment from a list of sensors.
 
+    Args:
+      reset: Whether the depth frame history starts over with this frame.
+      render: Whether a new depth frame is rendered, otherwise the image is
+        built from the stored frames.
+
     Returns:
       observations: sensory observation in the numpy array format
     """
+    profiler = self.step_profiler
+    lap_time = profiler.start()
     sensors_dict = {}
+    if self._observation_layout is not None:
+      # written in place, no need to sort
+      sensors_dict = self._observation_layout
     for s in self.all_sensors():
       sensors_dict[s.get_name()] = s.get_observation()
 
@@ -544,9 +788,19 @@ class LocomotionGymEnv(gym.Env):
       if hasattr(r, 'env_info'):
         sensors_dict[r.get_name()] = r.env_info
 
-    observations = collections.OrderedDict(
-      sorted(list(sensors_dict.items())))
-    if self.get_image and self._env_step_counter % self.get_image_interval == 0:
+    observations = sensors_dict
+    if self._observation_layout is None:
+      observations = collections.OrderedDict(
+        sorted(list(sensors_dict.items())))
+    lap_time = profiler.lap("sensor_observation", lap_time)
+    if self.get_image and self.empty_image and not render:
+      observations['raw_img'] = np.concatenate(
+        [self.current_frames[idx] for idx in self.frame_idx],
+        axis=0
+      ).reshape(-1)
+      return self._return_observation(observations)
+    if (render and self.get_image and
+        self._env_step_counter % self.get_image_interval == 0):
       if self.reset_frame_idx_each_step:
         # assert self.frame_extract > 1
         self.frame_idx = [
@@ -564,101 +818,42 @@ class LocomotionGymEnv(gym.Env):
           [self.current_frames[idx] for idx in self.frame_idx],
           axis=0
         ).reshape(-1)
-        return observations
-
-      linkstate = self.pybullet_client.getLinkState(
-        self.robot.quadruped, 0, computeForwardKinematics=True)
-      camInfo = self.pybullet_client.getDebugVisualizerCamera()
-      proj_mat = camInfo[3]
-      proj_mat = [
-        1.0825318098068237, 0.0, 0.0, 0.0, 0.0, 1.732050895690918, 0.0, 0.0, 0.0, 0.0,
-        -1.0002000331878662, -1.0, 0.0, 0.0, -0.020002000033855438, 0.0
-      ]
-      camOrn = linkstate[1]
-      camMat = self.pybullet_client.getMatrixFromQuaternion(camOrn)
-      forwardVec = [camMat[0], camMat[3],
-                    camMat[6]]
-      camPos = linkstate[0]
-      camPos = [camPos[i] + forwardVec[i] * 0.2309 for i in range(3)]
-      self.camPos = camPos
-
-      camUpVec2 = [
-        (camMat[2] + camMat[0]) / 2,
-        (camMat[5] + camMat[3]) / 2,
-        (camMat[8] + camMat[6]) / 2]
-      forwardVec2 = [
-        (-camMat[2] + camMat[0]) / 2,
-        (-camMat[5] + camMat[3]) / 2,
-        (-camMat[8] + camMat[6]) / 2]
-
-      if self.front:
-        camUpVec2 = [
-          camMat[2],
-          camMat[5],
-          camMat[8]]
-        forwardVec2 = [
-          camMat[0],
-          camMat[3],
-          camMat[6]]
-        camUpVec2 = [0, 0, 1]
-        forwardVec[2] = 0
-
-      camTarget2 = [camPos[i] + forwardVec2[i] * 10 for i in range(3)]
-      viewMat2 = self.pybullet_client.computeViewMatrix(
-        camPos, camTarget2, camUpVec2
-      )
+        return self._return_observation(observations)
 
-      camera_image_set = self.pybullet_client.getCameraImage(
-        64, 64, viewMatrix=viewMat2, projectionMatrix=proj_mat,
-        # flags=pybullet.ER_NO_SEGMENTATION_MASK,
-        shadow=1,
-        lightDirection=[1, 1, 1],
-        renderer=pybullet.ER_BULLET_HARDWARE_OPENGL,
-      )
-      _, _, _, depth_img, _ = camera_image_set
-
-      depth = depth_img[np.newaxis, ...]
+      view_mat = self.depth_view()
+      depth = self.depth_renderer.render(
+        self.pybullet_client, view_mat, out=self._depth_frame)
       if self.depth_image:
         # Map to real depth
-        far = 1000
-        near = 0.01
-        depth = far * near / (far - (far - near) * depth)
+        depth_processing.buffer_to_metric(depth, out=depth)
         if self.blinding_spot:
-          num_spots = self.np_random.randint(3, 30)
-          blinding_indices = self.np_random.randint(0, 64, size=(num_spots, 2))
-          for idx in blinding_indices:
-            depth[:, idx[0], idx[1]] = 10
-        depth = np.clip(depth, a_min=0.3, a_max=10)
-        depth = np.sqrt(np.log(depth + 1))
+          self.depth_processor.add_blinding_spots(depth, self.np_random)
+        self.depth_processor.transform(depth, out=depth)
+      lap_time = profiler.lap("render_depth", lap_time)
 
       if reset:
-        for _ in range(self.num_stored_frames):
-          self.depth_frames.appendleft(depth)
+        self.depth_frames.reset(depth)
       else:
-        self.depth_frames.appendleft(depth)
+        self.depth_frames.append(depth)
     if self.get_image:
       if self.interpolation:
-        concated_depths = []
-        for idx in self.frame_idx:
-          img = self.depth_frames[idx].copy()
-          for k in range(self.interpolation_delay):
-            img += self.depth_frames[idx + k + 1]
-          concated_depths.append(img / (self.interpolation_delay + 1))
-        concated_depths = np.concatenate(concated_depths, axis=0).reshape(-1)
+        concated_depths = self.depth_frames.interpolate(
+          self.frame_idx, self.interpolation_delay)
       else:
-        concated_depths = np.concatenate(
-          [self.depth_frames[idx] for idx in self.frame_idx],
-          axis=0
-        ).reshape(-1)
+        concated_depths = self.depth_frames.select(self.frame_idx)
       if self.depth_norm and self.depth_image:
-        concated_depths = (concated_depths - 1.25) / 0.425
+        # in place, the selected frames live in a buffer of the history
+        concated_depths -= 1.25
+        concated_depths /= 0.425
+      concated_depths = concated_depths.reshape(-1)
 
       if self.rgbd:
         raise NotImplementedError
       else:
         if self.depth_image:
           observations['raw_img'] = concated_depths
-    return observations
+      profiler.lap("frame_history", lap_time)
+    return self._return_observation(observations)
 
   def set_time_step(self, num_action_repeat, sim_step=0.001):
     """Sets the time step of the environment.
@@ -695,16 +890,24 @@ class LocomotionGymEnv(gym.Env):
 
   @property
   def pybullet_client(self):
-    return self._pybullet_client
+    return self._world_client
 
   @property
   def robot(self):
     return self._robot
 
+  @property
+  def env_randomizers(self):
+    return self._env_randomizers
+
   @property
   def env_step_counter(self):
     return self._env_step_counter
 
+  @property
+  def num_reset_snapshots(self):
+    return self._num_reset_snapshots
+
   @property
   def hard_reset(self):
     return self._hard_reset
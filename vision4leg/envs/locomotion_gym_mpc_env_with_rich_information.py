@@ -34,13 +34,16 @@ from mpc_controller import torque_stance_leg_controller
 from mpc_controller import a1_sim as robot_sim
 from copy import deepcopy
 import vision4leg.envs.pybullet_client as bullet_client
+from vision4leg.envs import depth_renderer
+from vision4leg.envs import depth_frame_history
+from vision4leg.utilities import depth_processing
+from vision4leg.envs import step_profiler
 import pybullet  # pytype: disable=import-error
 import numpy as np
 from gym.utils import seeding
 from gym import spaces
 import gym
 import collections
-import pkgutil
 from collections import deque
 import os
 import sys
@@ -48,8 +51,6 @@ sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
 # import pybullet_utils.bullet_client as bullet_client
 
 
-egl = pkgutil.get_loader('eglRenderer')
-
 # from __future__ import google_type_annotations
 currentdir = os.path.dirname(os.path.abspath(
   inspect.getfile(inspect.currentframe())))
@@ -113,7 +114,9 @@ class LocomotionGymEnv(gym.Env):
                reset_frame_idx=False,
                reset_frame_idx_each_step=False,
                blinding_spot=True,
-               interpolation=False
+               interpolation=False,
+               depth_lookup_table=False,
+               profile_step=False,
                ):
     """Initializes the locomotion gym environment with an MPC controller as low level policy.
 
@@ -136,6 +139,8 @@ class LocomotionGymEnv(gym.Env):
     self.count_t = 0
     self._policy_freq = policy_freq
     self.seed()
+    self.profile_step = profile_step
+    self.step_profiler = step_profiler.StepProfiler(enabled=profile_step)
     self._gym_config = gym_config
     self.get_image_interval = get_image_interval
     self.init_pos = init_pos
@@ -205,7 +210,14 @@ class LocomotionGymEnv(gym.Env):
       0 + self.frame_extract * 3
     ]
     self.current_frames = deque(maxlen=self.num_stored_frames)
-    self.depth_frames = deque(maxlen=self.num_stored_frames)
+    self._depth_frame = np.zeros((1, 64, 64), dtype=np.float32)
+    self.depth_processor = depth_processing.DepthProcessor(
+      min_depth=0.3, max_depth=10, use_lookup_table=depth_lookup_table)
+    self._flat_observation = False
+    self._observation_layout = None
+    self.depth_frames = depth_frame_history.DepthFrameHistory(
+      self.num_stored_frames,
+      max_delay=self.frame_extract - 1 if self.interpolation else None)
 
     if self._is_render:
       if self._record_video:
@@ -227,18 +239,12 @@ class LocomotionGymEnv(gym.Env):
         connection_mode=pybullet.DIRECT,
         # options=optionstring
       )
-      if self.get_image:
-        self.plugin_id = self._pybullet_client.loadPlugin(
-          egl.get_filename(),
-          "_eglRendererPlugin")
-        # physicsClientId=self._pybullet_client._client)
-        assert self.plugin_id != -1, 'Cannot load PyBullet plugin'
-        print(self.plugin_id)
-
-        self.pybullet_client.configureDebugVisualizer(
-          pybullet.COV_ENABLE_RENDERING, 0)
-        self.pybullet_client.configureDebugVisualizer(
-          pybullet.COV_ENABLE_GUI, 0)
+    if self.get_image:
+      self.depth_renderer = depth_renderer.get_renderer()
+      # A GUI client renders through its own OpenGL context, the EGL plugin
+      # is only loaded into headless clients.
+      if not self._is_render:
+        self.plugin_id = self.depth_renderer.attach(self._pybullet_client)
 
     self.pybullet_client.setAdditionalSearchPath(
       os.path.join(os.path.dirname(__file__), '../assets'))
@@ -344,6 +350,8 @@ class LocomotionGymEnv(gym.Env):
   def close(self):
     if hasattr(self, '_robot') and self._robot:
       self._robot.Terminate()
+    if hasattr(self, 'depth_renderer'):
+      self.depth_renderer.detach(self._pybullet_client)
 
   def seed(self, seed=None):
     self.np_random, self.np_random_seed = seeding.np_random(seed)
@@ -474,8 +482,11 @@ class LocomotionGymEnv(gym.Env):
       self._pybullet_client.configureDebugVisualizer(
         self._pybullet_client.COV_ENABLE_SINGLE_STEP_RENDERING, 1)
 
+    profiler = self.step_profiler
+    lap_time = profiler.start()
     for env_randomizer in self._env_randomizers:
       env_randomizer.randomize_step(self)
+    lap_time = profiler.lap("randomize_step", lap_time)
     # control xy
     lin_speed, ang_speed = action[0], action[1]
     lin_speed = np.concatenate([[lin_speed], np.zeros(2)])
@@ -486,7 +497,9 @@ class LocomotionGymEnv(gym.Env):
     for _ in range(self._policy_freq):
       self.controller.update()
       action, _ = self.controller.get_action()
+      lap_time = profiler.lap("controller", lap_time)
       self._robot.Step(action)
+      lap_time = profiler.lap("robot_step", lap_time)
 
     if self._task and hasattr(self._task, 'update'):
       self._task.update(self)
@@ -497,6 +510,7 @@ class LocomotionGymEnv(gym.Env):
     self._env_step_counter += 1
     if done:
       self._robot.Terminate()
+    profiler.lap("task", lap_time)
     return self._get_observation(), reward, done, {}
 
   def render(self, mode='rgb_array'):
@@ -572,20 +586,56 @@ class LocomotionGymEnv(gym.Env):
       return self._task(self)
     return 0
 
+  def depth_view(self):
+    """Returns the view matrix of the depth camera."""
+    view_mat, _ = self.depth_renderer.view_matrix(
+      self.pybullet_client, self._robot.quadruped, front=self.front)
+    return view_mat
+
+  def get_step_profile(self, reset=False):
+    """Returns {phase: np.array([total seconds, calls])} of the steps."""
+    return self.step_profiler.profile(reset=reset)
+
+  def enable_flat_observation(self):
+    """Makes reset() and step() return one flat float32 array.
+
+    The observations are written into a preallocated array at the offsets of
+    the sorted observation dictionary, see space_utils.ObservationLayout.
+    """
+    self._flat_observation = True
+    self._observation_layout = None
+
+  def _return_observation(self, observations):
+    if not self._flat_observation:
+      return observations
+    if self._observation_layout is None:
+      # Compiled from the first dictionary, later calls write directly.
+      layout = space_utils.ObservationLayout.from_observation(observations)
+      layout.write(observations)
+      self._observation_layout = layout
+    return self._observation_layout.array()
+
   def _get_observation(self, reset=False):
     """Get observation of this environment from a list of sensors.
 
     Returns:
       observations: sensory observation in the numpy array format
     """
+    profiler = self.step_profiler
+    lap_time = profiler.start()
     sensors_dict = {}
+    if self._observation_layout is not None:
+      # written in place, no need to sort
+      sensors_dict = self._observation_layout
     if not self.vision_only:
-      sensors_dict = {
-        "com_vel": self.state_estimator._com_velocity_world_frame,
-        "imu": self._robot.GetBaseRollPitchYaw()}
-
-    observations = collections.OrderedDict(
-      sorted(list(sensors_dict.items())))
+      sensors_dict["com_vel"] = self.state_estimator._com_velocity_world_frame
+      sensors_dict["imu"] = self._robot.GetBaseRollPitchYaw()
+
+    observations = sensors_dict
+    if self._observation_layout is None:
+      observations = collections.OrderedDict(
+        sorted(list(sensors_dict.items())))
+    lap_time = profiler.lap("sensor_observation", lap_time)
     if self.get_image and self._env_step_counter % self.get_image_interval == 0:
       if self.reset_frame_idx_each_step:
         # assert self.frame_extract > 1
@@ -604,104 +654,42 @@ class LocomotionGymEnv(gym.Env):
           [self.current_frames[idx] for idx in self.frame_idx],
           axis=0
         ).reshape(-1)
-        return observations
-
-      linkstate = self.pybullet_client.getLinkState(
-        self._robot.quadruped, 0, computeForwardKinematics=True)
-      camInfo = self.pybullet_client.getDebugVisualizerCamera()
-      proj_mat = camInfo[3]
-      proj_mat = [
-        1.0825318098068237, 0.0, 0.0, 0.0, 0.0, 1.732050895690918, 0.0, 0.0, 0.0, 0.0,
-        -1.0002000331878662, -1.0, 0.0, 0.0, -0.020002000033855438, 0.0
-      ]
-      camOrn = linkstate[1]
-      camMat = self.pybullet_client.getMatrixFromQuaternion(camOrn)
-      forwardVec = [camMat[0], camMat[3],
-                    camMat[6]]
-      camPos = linkstate[0]
-      camPos = [camPos[i] + forwardVec[i] * 0.2309 for i in range(3)]
-      self.camPos = camPos
-
-      camUpVec2 = [
-        (camMat[2] + camMat[0]) / 2,
-        (camMat[5] + camMat[3]) / 2,
-        (camMat[8] + camMat[6]) / 2]
-      forwardVec2 = [
-        (-camMat[2] + camMat[0]) / 2,
-        (-camMat[5] + camMat[3]) / 2,
-        (-camMat[8] + camMat[6]) / 2]
-
-      if self.front:
-        camUpVec2 = [
-          camMat[2],
-          camMat[5],
-          camMat[8]]
-        forwardVec2 = [
-          camMat[0],
-          camMat[3],
-          camMat[6]]
-        camUpVec2 = [0, 0, 1]
-        forwardVec[2] = 0
-
-      camTarget2 = [camPos[i] + forwardVec2[i] * 10 for i in range(3)]
-      viewMat2 = self.pybullet_client.computeViewMatrix(
-        camPos, camTarget2, camUpVec2
-      )
+        return self._return_observation(observations)
 
-      camera_image_set = self.pybullet_client.getCameraImage(
-        64, 64, viewMatrix=viewMat2, projectionMatrix=proj_mat,
-        # flags=pybullet.ER_NO_SEGMENTATION_MASK,
-        shadow=1,
-        lightDirection=[1, 1, 1],
-        renderer=pybullet.ER_BULLET_HARDWARE_OPENGL,
-      )
-      _, _, _, depth_img, _ = camera_image_set
-
-      depth = depth_img[np.newaxis, ...]
+      view_mat = self.depth_view()
+      depth = self.depth_renderer.render(
+        self.pybullet_client, view_mat, out=self._depth_frame)
       if self.depth_image:
-        far = 1000
-        near = 0.01
-        depth = far * near / (far - (far - near) * depth)
+        # Map to real depth
+        depth_processing.buffer_to_metric(depth, out=depth)
         if self.blinding_spot:
-          num_spots = self.np_random.randint(3, 30)
-          blinding_indices = self.np_random.randint(
-            0, 64, size=(num_spots, 2))
-          for idx in blinding_indices:
-            depth[:, idx[0], idx[1]] = 10
-        depth = np.clip(depth, a_min=0.3, a_max=10)
-        depth = np.sqrt(np.log(depth + 1))
+          self.depth_processor.add_blinding_spots(depth, self.np_random)
+        self.depth_processor.transform(depth, out=depth)
+      lap_time = profiler.lap("render_depth", lap_time)
 
       if reset:
-        for _ in range(self.num_stored_frames):
-          self.depth_frames.appendleft(depth)
+        self.depth_frames.reset(depth)
       else:
-        self.depth_frames.appendleft(depth)
+        self.depth_frames.append(depth)
     if self.get_image:
       if self.interpolation:
-        concated_depths = []
-        for idx in self.frame_idx:
-          img = self.depth_frames[idx].copy()
-          for k in range(self.interpolation_delay):
-            img += self.depth_frames[idx + k + 1]
-          concated_depths.append(
-            img / (self.interpolation_delay + 1))
-          # print(concated_depths)
-        concated_depths = np.concatenate(
-          concated_depths, axis=0).reshape(-1)
+        concated_depths = self.depth_frames.interpolate(
+          self.frame_idx, self.interpolation_delay)
       else:
-        concated_depths = np.concatenate(
-          [self.depth_frames[idx] for idx in self.frame_idx],
-          axis=0
-        ).reshape(-1)
+        concated_depths = self.depth_frames.select(self.frame_idx)
       if self.depth_norm and self.depth_image:
-        concated_depths = (concated_depths - 1.25) / 0.425
+        # in place, the selected frames live in a buffer of the history
+        concated_depths -= 1.25
+        concated_depths /= 0.425
+      concated_depths = concated_depths.reshape(-1)
 
       if self.rgbd:
         raise NotImplementedError
       else:
         if self.depth_image:
           observations['raw_img'] = concated_depths
-    return observations
+      profiler.lap("frame_history", lap_time)
+    return self._return_observation(observations)
 
   def set_time_step(self, num_action_repeat, sim_step=0.001):
     """Sets the time step of the environment.
@@ -48,3 +48,81 @@ class BulletClient(object):
     if name == "disconnect":
       self._client = -1
     return attribute
+
+
+class TileClient(object):
+  """The view of one env on a pybullet world shared by several envs.
+
+  Every env owns a tile of the world and a collision group. Bodies created
+  through the view, the ground, the robot and the obstacles, are put in that
+  group and only collide with each other. With an origin, the positions given
+  to createMultiBody(), loadURDF() and resetBasePositionAndOrientation() are
+  relative to the tile origin, so terrain code written for a world of its own
+  builds the terrain on the tile. Everything else, including all getters,
+  goes to the shared client unchanged and uses world coordinates. Code that
+  passes a position it got from a getter back to a translated setter moves
+  the body by the origin, see shared_world_env.SUPPORTED_RANDOMIZERS.
+  """
+
+  def __init__(self, pybullet_client, collision_group, origin=None):
+    """Creates the view.
+
+    Args:
+      pybullet_client: The BulletClient of the shared world.
+      collision_group: The bit mask of the collision group of the env.
+      origin: The world position of the tile origin. None leaves positions
+        untranslated.
+    """
+    self.shared_client = pybullet_client
+    self.collision_group = collision_group
+    self.origin = None if origin is None else [float(x) for x in origin]
+
+  def translated(self, origin):
+    """Returns a view of the same env whose positions are relative to
+    origin."""
+    return TileClient(self.shared_client, self.collision_group, origin)
+
+  def __getattr__(self, name):
+    """Forwards to the shared client, caching the bound functions."""
+    attribute = getattr(self.shared_client, name)
+    if name != "disconnect":
+      self.__dict__[name] = attribute
+    return attribute
+
+  def _to_world(self, position):
+    if self.origin is None:
+      return position
+    return [x + o for x, o in zip(position, self.origin)]
+
+  def _add_to_group(self, body_id):
+    client = self.shared_client
+    for link_id in range(-1, client.getNumJoints(body_id)):
+      client.setCollisionFilterGroupMask(
+        body_id, link_id, self.collision_group, self.collision_group)
+
+  def createMultiBody(self, *args, **kwargs):
+    if "batchPositions" in kwargs:
+      kwargs["batchPositions"] = [
+        self._to_world(position) for position in kwargs["batchPositions"]]
+    elif len(args) > 3:
+      args = args[:3] + (self._to_world(args[3]),) + args[4:]
+    else:
+      kwargs["basePosition"] = self._to_world(
+        kwargs.get("basePosition", [0, 0, 0]))
+    body_ids = self.shared_client.createMultiBody(*args, **kwargs)
+    # Batched creation returns the ids of all bodies.
+    for body_id in (body_ids if isinstance(body_ids, (tuple, list))
+                    else [body_ids]):
+      self._add_to_group(body_id)
+    return body_ids
+
+  def loadURDF(self, fileName, basePosition=(0, 0, 0), *args, **kwargs):
+    body_id = self.shared_client.loadURDF(
+      fileName, self._to_world(basePosition), *args, **kwargs)
+    self._add_to_group(body_id)
+    return body_id
+
+  def resetBasePositionAndOrientation(self, bodyUniqueId, posObj, ornObj,
+                                      **kwargs):
+    self.shared_client.resetBasePositionAndOrientation(
+      bodyUniqueId, self._to_world(posObj), ornObj, **kwargs)
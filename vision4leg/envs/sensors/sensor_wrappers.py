@@ -88,6 +88,38 @@ class SensorWrapper(sensor.BoxSpaceSensor):
     self._wrapped_sensor.on_terminate(env)
 
 
+class HistoryBuffer(object):
+  """A fixed-size ring buffer of rows that is read newest first.
+
+  Every row is stored twice, at slot i and i + num_history, so the
+  num_history most recent rows always form the contiguous slice
+  [head, head + num_history) of the storage and can be read as a view.
+  """
+
+  def __init__(self, num_history: int, width: int, dtype=np.float64) -> None:
+    self.num_history = num_history
+    self._storage = np.zeros((2 * num_history, width), dtype=dtype)
+    self._head = 0
+
+  def reset(self, row: _ARRAY) -> None:
+    """Fills the whole history with one row."""
+    self._storage[:] = row
+    self._head = 0
+
+  def append(self, row: _ARRAY) -> None:
+    """Adds the newest row, overwriting the oldest one."""
+    self._head = (self._head - 1) % self.num_history
+    self._storage[self._head] = row
+    self._storage[self._head + self.num_history] = self._storage[self._head]
+
+  def view(self) -> np.ndarray:
+    """Returns the (num_history, width) rows, the most recent one first.
+
+    The result is a view of the storage, it changes with the next append.
+    """
+    return self._storage[self._head:self._head + self.num_history]
+
+
 class HistoricSensorWrapper(SensorWrapper):
   """A sensor wrapper for maintaining the history of the sensor."""
 
@@ -129,12 +161,29 @@ class HistoricSensorWrapper(SensorWrapper):
     shape = lower_bound.shape
 
     self._history_buffer = None
+    # The columns of the history buffer holding this sensor, the buffer is
+    # shared with other sensors when a HistoricSensorGroup updates it.
+    self._history_columns = slice(None)
+    self._observation_shape = None
+    self._observation_dtype = None
+    self._grouped = False
     super(HistoricSensorWrapper, self).__init__(name=name,
                                                 shape=shape,
                                                 lower_bound=lower_bound,
                                                 upper_bound=upper_bound,
                                                 wrapped_sensor=wrapped_sensor)
 
+  @property
+  def num_history(self) -> int:
+    return self._num_history
+
+  def share_history(self, history_buffer: HistoryBuffer,
+                    columns: slice) -> None:
+    """Reads the history from columns of a buffer updated by a group."""
+    self._history_buffer = history_buffer
+    self._history_columns = columns
+    self._grouped = True
+
   def on_reset(self, env) -> None:
     """A callback for the reset event that initializes the history buffer.
 
@@ -143,9 +192,16 @@ class HistoricSensorWrapper(SensorWrapper):
     """
     super(HistoricSensorWrapper, self).on_reset(env)
 
-    self._history_buffer = collections.deque(maxlen=self._num_history)
-    for _ in range(self._num_history):
-      self._history_buffer.appendleft(self._wrapped_sensor.get_observation())
+    observation = np.asarray(self._wrapped_sensor.get_observation())
+    self._observation_shape = observation.shape
+    self._observation_dtype = observation.dtype
+    if self._grouped:
+      return
+    if (self._history_buffer is None or
+        self._history_buffer.view().shape[1] != observation.size):
+      self._history_buffer = HistoryBuffer(
+        self._num_history, observation.size, dtype=observation.dtype)
+    self._history_buffer.reset(observation.ravel())
 
   def on_step(self, env):
     """A callback for the step event that updates the history buffer.
@@ -154,16 +210,88 @@ class HistoricSensorWrapper(SensorWrapper):
       env: the environment who invokes this callback function (unused)
     """
     super(HistoricSensorWrapper, self).on_step(env)
-    self._history_buffer.appendleft(self._wrapped_sensor.get_observation())
+    if not self._grouped:
+      self._history_buffer.append(
+        np.ravel(self._wrapped_sensor.get_observation()))
 
   def get_observation(self) -> _ARRAY:
-    """Returns the observation by concatenating the history buffer."""
+    """Returns the observation by concatenating the history buffer.
+
+    Unless the sensor shares its buffer with a group, the result is a view
+    of the history buffer and changes with the next step.
+    """
+    history = self.history_buffer
     if self._append_history_axis:
-      return np.stack(self._history_buffer, axis=-1)
+      return np.moveaxis(history, 0, -1)
     else:
-      return np.concatenate(self._history_buffer)
+      return history.reshape((-1,) + self._observation_shape[1:])
 
   @property
   def history_buffer(self):
-    """Returns the raw history buffer."""
-    return self._history_buffer
+    """Returns the history as one array, the most recent observation first."""
+    history = self._history_buffer.view()[:, self._history_columns]
+    return history.reshape((self._num_history,) + self._observation_shape)
+
+
+class HistoricSensorGroup(object):
+  """Updates the histories of several HistoricSensorWrappers in one pass.
+
+  The wrapped observations of all sensors are concatenated into one row of a
+  shared HistoryBuffer per step, instead of every sensor keeping a buffer of
+  its own. The env calls on_reset / on_step of the group after those of the
+  sensors.
+  """
+
+  def __init__(self, sensors: typing.List[HistoricSensorWrapper]) -> None:
+    self._sensors = list(sensors)
+    assert len(set(s.num_history for s in self._sensors)) == 1
+    self._history_buffer = None
+    self._row = None
+
+  def _observe(self) -> np.ndarray:
+    offset = 0
+    for s in self._sensors:
+      observation = np.ravel(s._wrapped_sensor.get_observation())
+      self._row[offset:offset + observation.size] = observation
+      offset += observation.size
+    return self._row
+
+  def on_reset(self, env) -> None:
+    """Initializes the shared history buffer.
+
+    Args:
+      env: the environment who invokes this callback function (unused)
+    """
+    del env
+    sizes = [
+      int(np.prod(s._observation_shape)) for s in self._sensors]
+    if self._history_buffer is None:
+      dtype = np.result_type(*[s._observation_dtype for s in self._sensors])
+      self._history_buffer = HistoryBuffer(
+        self._sensors[0].num_history, sum(sizes), dtype=dtype)
+      self._row = np.zeros(sum(sizes), dtype=dtype)
+      offset = 0
+      for s, size in zip(self._sensors, sizes):
+        s.share_history(self._history_buffer, slice(offset, offset + size))
+        offset += size
+    self._history_buffer.reset(self._observe())
+
+  def on_step(self, env) -> None:
+    """Appends the current observations of all sensors.
+
+    Args:
+      env: the environment who invokes this callback function (unused)
+    """
+    del env
+    self._history_buffer.append(self._observe())
+
+
+def group_historic_sensors(
+    sensors: typing.Iterable[sensor.Sensor]
+) -> typing.List[HistoricSensorGroup]:
+  """Groups the HistoricSensorWrappers with the same history length."""
+  groups = collections.OrderedDict()
+  for s in sensors:
+    if isinstance(s, HistoricSensorWrapper):
+      groups.setdefault(s.num_history, []).append(s)
+  return [HistoricSensorGroup(group) for group in groups.values()]
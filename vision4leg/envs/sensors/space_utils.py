@@ -26,6 +26,7 @@ currentdir = os.path.dirname(os.path.abspath(
 parentdir = os.path.dirname(os.path.dirname(currentdir))
 os.sys.path.insert(0, parentdir)
 
+import collections
 import gym
 from gym import spaces
 import numpy as np
@@ -124,3 +125,47 @@ def convert_sensors_to_gym_space_dictionary(
     else:
       raise UnsupportedConversionError('sensors = ' + str(sensors))
   return spaces.Dict(gym_space_dict)
+
+
+class ObservationLayout(object):
+  """Fixed slices of named observations in one flat array.
+
+  The layout is compiled once from an observation dictionary and keeps its
+  order, so the flat array is the one env_utils.flatten_observations()
+  returns for dictionaries with the same keys. Observations are then written
+  into their slice of a preallocated buffer instead of being collected in a
+  dictionary and concatenated.
+  """
+
+  def __init__(self, sizes, dtype=np.float32):
+    """Initializes the layout.
+
+    Args:
+      sizes: A list of (name, size) pairs in the order of the flat array.
+      dtype: The dtype of the flat array.
+    """
+    self.slices = collections.OrderedDict()
+    offset = 0
+    for name, size in sizes:
+      self.slices[name] = slice(offset, offset + size)
+      offset += size
+    self.buffer = np.zeros(offset, dtype=dtype)
+
+  @classmethod
+  def from_observation(cls, observation_dict, dtype=np.float32):
+    return cls([(name, np.size(value))
+                for name, value in observation_dict.items()], dtype=dtype)
+
+  def keys(self):
+    return self.slices.keys()
+
+  def __setitem__(self, name, value):
+    self.buffer[self.slices[name]] = np.ravel(value)
+
+  def write(self, observation_dict):
+    for name, value in observation_dict.items():
+      self[name] = value
+
+  def array(self):
+    """Returns a copy of the flat array."""
+    return self.buffer.copy()
@@ -0,0 +1,184 @@
+"""A vector env whose robots share one pybullet world.
+
+Every env of a VecEnv owns a pybullet client with one robot, so a process
+steps each of its robots in a world of its own. Here the envs are tiles of
+one world instead: each env builds its ground, robot and terrain on a tile
+along the y axis and in a collision group of its own, see
+pybullet_client.TileClient, so the robots never touch each other or the
+terrain of another tile. An env step applies the motor commands of all
+robots and calls stepSimulation() once per action repeat for all of them.
+"""
+import numpy as np
+import pybullet  # pytype: disable=import-error
+from toolz.dicttoolz import merge_with
+
+from torchrl.env.vecenv import VecEnv, pop_terminal_obs
+from vision4leg.envs import pybullet_client as bullet_client
+from vision4leg.envs import step_profiler
+from vision4leg.envs.env_wrappers import observation_dictionary_to_array_wrapper
+from vision4leg.envs.utilities import a1_randomizer_ground
+from vision4leg.envs.utilities import controllable_env_randomizer_from_config
+
+# Collision groups are the bits of a C int.
+MAX_ROBOTS = 31
+# Beyond the 10m the depth camera sees and the 30m the terrains reach.
+DEFAULT_TILE_SPACING = 50.
+_EXHAUSTED = object()
+# The randomizers that work on a tile. The getters of a TileClient return
+# world coordinates while resetBasePositionAndOrientation() takes positions
+# relative to the tile, so a randomizer must not write back positions it
+# read, like the block updates of a1_movable_randomizer do. These two keep
+# the positions they place bodies at, or do not move bodies at all.
+SUPPORTED_RANDOMIZERS = (
+  a1_randomizer_ground.TerrainRandomizer,
+  controllable_env_randomizer_from_config.ControllableEnvRandomizerFromConfig)
+
+
+def step_robots(pybullet_client, robots, actions):
+  """Steps robots that share one world with one stepSimulation() per action
+  repeat, see Minitaur.StepSubsteps(). The robots must have the same action
+  repeat."""
+  substeps = [robot.StepSubsteps(action)
+              for robot, action in zip(robots, actions)]
+  while all([next(substep, _EXHAUSTED) is not _EXHAUSTED
+             for substep in substeps]):
+    pybullet_client.stepSimulation()
+
+
+class SharedWorldVecEnv(VecEnv):
+  """Vector Env of robots in one pybullet world
+
+      Takes the same actions and returns the same batches as a VecEnv over
+      get_single_env envs, without the action normalization, see
+      get_env.get_shared_world_env().
+      The envs reset softly and cannot save snapshots, tasks with goal
+      positions are not supported, those are in world coordinates, and
+      the env randomizers must be SUPPORTED_RANDOMIZERS.
+      The world holds one client, and one EGL context for the depth images,
+      instead of one per env, but every depth view renders all tiles.
+  """
+
+  def __init__(self, env_nums, env_func, env_build_params,
+               max_episode_steps=None, auto_reset=False,
+               tile_spacing=DEFAULT_TILE_SPACING):
+    """Builds the world and the envs.
+
+    Args:
+      env_nums: The number of robots, at most MAX_ROBOTS.
+      env_func: The env builder, build_a1_ground_env.
+      env_build_params: The keyword arguments of env_func.
+      max_episode_steps: Episodes end after this many steps, as with gym's
+        TimeLimit. None for no limit.
+      auto_reset: Whether done envs are reset inside step, see VecEnv.
+      tile_spacing: The distance between the tile origins, in meters.
+    """
+    if env_nums > MAX_ROBOTS:
+      raise ValueError(
+        'at most {} robots share a world, got {}.'.format(
+          MAX_ROBOTS, env_nums))
+    if env_build_params.get("goal", False) or \
+        env_build_params.get("subgoal", False) or \
+        env_build_params.get("subgoal_reward", None) is not None:
+      raise ValueError('goal tasks are not supported on a shared world.')
+    self.env_nums = env_nums
+    self.auto_reset = auto_reset
+    self.training = True
+    self._max_episode_steps = max_episode_steps
+    self._elapsed_steps = np.zeros(env_nums, dtype=np.int64)
+    self.step_profiler = step_profiler.StepProfiler(
+      enabled=env_build_params.get("profile_step", False))
+    self._pybullet_client = bullet_client.BulletClient(
+      connection_mode=pybullet.GUI
+      if env_build_params.get("enable_rendering", False) else pybullet.DIRECT)
+
+    self.envs = []
+    for i in range(env_nums):
+      env = env_func(
+        pybullet_client=bullet_client.TileClient(
+          self._pybullet_client, 1 << i),
+        tile_origin=[0, i * tile_spacing, 0], **env_build_params)
+      if not isinstance(
+          env, observation_dictionary_to_array_wrapper.
+          ObservationDictionaryToArrayWrapper):
+        raise ValueError(
+          'action and observation wrappers are not supported on a shared '
+          'world.')
+      unsupported = [
+        "{}.{}".format(type(randomizer).__module__, type(randomizer).__name__)
+        for randomizer in env.env_randomizers
+        if not isinstance(randomizer, SUPPORTED_RANDOMIZERS)]
+      if unsupported:
+        raise ValueError(
+          'randomizers {} are not supported on a shared world.'.format(
+            unsupported))
+      self.envs.append(env)
+
+  def train(self):
+    self.training = True
+
+  def eval(self):
+    self.training = False
+
+  def close(self):
+    for env in self.envs:
+      env.close()
+    if hasattr(self.envs[0], "depth_renderer"):
+      self.envs[0].depth_renderer.detach(self._pybullet_client)
+    self._pybullet_client.disconnect()
+
+  def _reset_env(self, index):
+    self._elapsed_steps[index] = 0
+    return self.envs[index].reset()
+
+  def reset(self, **kwargs):
+    obs = [self._reset_env(index) for index in range(self.env_nums)]
+    self._obs = np.stack(obs)
+    return self._obs
+
+  def partial_reset(self, index_mask, **kwargs):
+    indexs = np.argwhere(index_mask == 1).reshape((-1))
+    reset_obs = [self._reset_env(index) for index in indexs]
+    self._obs[index_mask] = reset_obs
+    return self._obs
+
+  def step_wait(self):
+    actions = np.reshape(self._actions, (self.env_nums, -1))
+    for env, action in zip(self.envs, actions):
+      env._start_step(action)
+    lap_time = self.step_profiler.start()
+    step_robots(self._pybullet_client,
+                [env.robot for env in self.envs], actions)
+    self.step_profiler.lap("robot_step", lap_time)
+
+    result = []
+    for index, env in enumerate(self.envs):
+      obs, rew, done, info = env._finish_step(env.step_profiler.start())
+      obs = env._flatten_observation(obs)
+      self._elapsed_steps[index] += 1
+      if self._max_episode_steps is not None and \
+          self._elapsed_steps[index] >= self._max_episode_steps:
+        info["TimeLimit.truncated"] = not done
+        done = True
+      if self.auto_reset and done:
+        info["terminal_obs"] = obs
+        obs = self._reset_env(index)
+      result.append((obs, rew, done, info))
+    obs, rews, dones, infos = zip(*result)
+    self._obs = np.stack(obs)
+    terminal_obs = pop_terminal_obs(self._obs, infos) \
+      if self.auto_reset else None
+    infos = merge_with(np.array, *infos)
+    if terminal_obs is not None:
+      infos["terminal_obs"] = terminal_obs
+    return self._obs, np.stack(rews)[:, np.newaxis], \
+      np.stack(dones)[:, np.newaxis], infos
+
+  def get_step_profile(self, reset=False):
+    """
+    Per phase step time of all envs summed up, robot_step is the time of
+    the shared simulation steps
+    """
+    return merge_with(
+      lambda totals: np.sum(totals, axis=0),
+      super().get_step_profile(reset=reset),
+      self.step_profiler.profile(reset=reset))
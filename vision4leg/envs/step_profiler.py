@@ -0,0 +1,49 @@
+"""Low-overhead wall time accounting for the phases of an env step.
+
+The env calls start() once and lap(phase, t) after each phase, every lap adds
+the time since the previous mark to the phase and counts one call. A disabled
+profiler returns immediately, so the hooks can stay in the step code.
+"""
+import collections
+import time
+
+import numpy as np
+
+
+class StepProfiler(object):
+  """Accumulates wall time and call counts per step phase."""
+
+  def __init__(self, enabled=False):
+    self.enabled = enabled
+    self._totals = collections.OrderedDict()
+
+  def start(self):
+    """Returns the time mark the first lap is measured from."""
+    if not self.enabled:
+      return 0.
+    return time.perf_counter()
+
+  def lap(self, phase, start_time):
+    """Adds the time since start_time to phase and returns a new mark."""
+    if not self.enabled:
+      return 0.
+    now = time.perf_counter()
+    total = self._totals.get(phase)
+    if total is None:
+      total = self._totals[phase] = [0., 0]
+    total[0] += now - start_time
+    total[1] += 1
+    return now
+
+  def profile(self, reset=False):
+    """Returns {phase: np.array([total seconds, calls])}.
+
+    Args:
+      reset: Whether to clear the accumulated times afterwards.
+    """
+    profile = collections.OrderedDict(
+      (phase, np.array(total, dtype=np.float64))
+      for phase, total in self._totals.items())
+    if reset:
+      self._totals.clear()
+    return profile
@@ -5,6 +5,7 @@ from __future__ import print_function
 from __future__ import absolute_import
 import random
 from pybullet_envs.minitaur.envs import env_randomizer_base
+from vision4leg.envs.utilities import heightfield_cache
 import numpy as np
 import enum
 import math
@@ -64,6 +65,14 @@ DIRECTION = [
   np.array([0, 0]),
   np.array([0, 0]),
 ]
+_DIRECTIONS = np.array(DIRECTION)
+# Empty cells around the grid of PoissonDisc2D, and the cells that can hold
+# points closer than the minimum distance to a point in the center cell.
+_POISSON_GRID_PADDING = 2
+_POISSON_NEIGHBOR_OFFSETS = np.array(list(itertools.product(
+  range(-_POISSON_GRID_PADDING, _POISSON_GRID_PADDING + 1), repeat=2)))
+# Where unused obstacles of an ObstaclePool wait, far below the ground.
+_PARKING_POSITION = np.array([0., 0., -20.])
 
 
 class PoissonDisc2D(object):
@@ -74,6 +83,9 @@ class PoissonDisc2D(object):
   Unlike the uniform sampling method that creates small clusters of points,
   Poisson disk method enforces the minimum distance between points and is more
   suitable for generating a spatial distribution of non-overlapping objects.
+
+  The samples around an active point are drawn and tested against the grid as
+  one numpy batch, then accepted in order as if they were drawn one by one.
   """
 
   def __init__(self, grid_length, grid_width, min_radius, max_sample_size):
@@ -96,9 +108,18 @@ class PoissonDisc2D(object):
     self._min_radius = min_radius
     self._max_sample_size = max_sample_size
 
-    # Flattern the 2D grid as an 1D array. The grid is used for fast nearest
-    # point searching.
-    self._grid = [None] * self._grid_size_x * self._grid_size_y
+    # The point of every cell, NaN for empty cells, indexed by (y, x). A cell
+    # holds at most one point since its diagonal is min_radius. The grid is
+    # padded with empty cells so that the neighbors of any cell can be read
+    # without bounds checks.
+    self._grid = np.full(
+      (self._grid_size_y + 2 * _POISSON_GRID_PADDING,
+       self._grid_size_x + 2 * _POISSON_GRID_PADDING, 2), np.nan)
+    # The neighbors of a cell as offsets into the flattened grid.
+    self._flat_grid = self._grid.reshape(-1, 2)
+    self._neighbor_offsets = (
+      _POISSON_NEIGHBOR_OFFSETS[:, 0] +
+      _POISSON_NEIGHBOR_OFFSETS[:, 1] * self._grid.shape[1])
 
     # Generate the first sample point and set it as an active site.
     first_sample = np.array(np.random.random_sample(
@@ -106,115 +127,67 @@ class PoissonDisc2D(object):
     self._active_list = [first_sample]
 
     # Also store the sample point in the grid.
-    self._grid[self._point_to_index_1d(first_sample)] = first_sample
-
-  def _point_to_index_1d(self, point):
-    """Computes the index of a point in the grid array.
-
-    Args:
-      point: A 2D point described by its coordinates (x, y).
-
-    Returns:
-      The index of the point within the self._grid array.
-    """
-    return self._index_2d_to_1d(self._point_to_index_2d(point))
-
-  def _point_to_index_2d(self, point):
-    """Computes the 2D index (aka cell ID) of a point in the grid.
-
-    Args:
-      point: A 2D point (list) described by its coordinates (x, y).
-
-    Returns:
-      x_index: The x index of the cell the point belongs to.
-      y_index: The y index of the cell the point belongs to.
-    """
-    x_index = int(point[0] / self._cell_length)
-    y_index = int(point[1] / self._cell_length)
-    return x_index, y_index
-
-  def _index_2d_to_1d(self, index2d):
-    """Converts the 2D index to the 1D position in the grid array.
+    self._store(first_sample)
 
-    Args:
-      index2d: The 2D index of a point (aka the cell ID) in the grid.
-
-    Returns:
-      The 1D position of the cell within the self._grid array.
-    """
-    return index2d[0] + index2d[1] * self._grid_size_x
-
-  def _is_in_grid(self, point):
-    """Checks if the point is inside the grid boundary.
-
-    Args:
-      point: A 2D point (list) described by its coordinates (x, y).
+  def _point_to_cell(self, points):
+    """Computes the padded grid cells (x, y) of an array of points."""
+    return (points / self._cell_length).astype(int) + _POISSON_GRID_PADDING
 
-    Returns:
-      Whether the point is inside the grid.
-    """
-    return (0 <= point[0] < self._grid_length) and (0 <= point[1] < self._grid_width)
-
-  def _is_in_range(self, index2d):
-    """Checks if the cell ID is within the grid.
-
-    Args:
-      index2d: The 2D index of a point (aka the cell ID) in the grid.
-
-    Returns:
-      Whether the cell (2D index) is inside the grid.
-    """
+  def _store(self, point):
+    x_index, y_index = self._point_to_cell(point)
+    self._grid[y_index, x_index] = point
 
-    return (0 <= index2d[0] < self._grid_size_x) and (0 <= index2d[1] < self._grid_size_y)
+  def _is_in_grid(self, points):
+    """Checks which points of an (n, 2) array are inside the grid boundary."""
+    return ((points[:, 0] >= 0) & (points[:, 0] < self._grid_length) &
+            (points[:, 1] >= 0) & (points[:, 1] < self._grid_width))
 
-  def _is_close_to_existing_points(self, point):
-    """Checks if the point is close to any already sampled (and stored) points.
+  def _is_close_to_existing_points(self, points):
+    """Checks which points are close to any already stored points.
 
     Args:
-      point: A 2D point (list) described by its coordinates (x, y).
+      points: Array of shape (n, 2) with points inside the grid.
 
     Returns:
-      True iff the distance of the point to any existing points is smaller than
-      the min_radius
+      Boolean array of shape (n,), True where the distance of the point to an
+      existing point is smaller than the min_radius.
     """
-    px, py = self._point_to_index_2d(point)
-    # Now we can check nearby cells for existing points
-    for neighbor_cell in itertools.product(range(px - 1, px + 2), range(py - 1, py + 2)):
-
-      if not self._is_in_range(neighbor_cell):
-        continue
-
-      maybe_a_point = self._grid[self._index_2d_to_1d(neighbor_cell)]
-      if maybe_a_point is not None and np.linalg.norm(maybe_a_point - point) < self._min_radius:
-        return True
-
-    return False
+    cells = self._point_to_cell(points)
+    # A point closer than min_radius is at most two cells away.
+    neighbors = self._flat_grid[
+      (cells[:, 0] + cells[:, 1] * self._grid.shape[1])[:, None] +
+      self._neighbor_offsets]
+    # Empty cells are NaN and never compare as close.
+    squared_distances = np.sum((neighbors - points[:, None]) ** 2, axis=-1)
+    return np.any(squared_distances < self._min_radius ** 2, axis=1)
 
   def sample(self):
     """Samples new points around some existing point.
 
-    Removes the sampling base point and also stores the new jksampled points if
+    Removes the sampling base point and also stores the new sampled points if
     they are far enough from all existing points.
     """
     active_point = self._active_list.pop()
-    for _ in range(self._max_sample_size):
-      # Generate random points near the current active_point between the radius
-      random_radius = np.random.uniform(
-        self._min_radius, 2 * self._min_radius)
-      random_angle = np.random.uniform(0, 2 * math.pi)
-
-      # The sampled 2D points near the active point
-      sample = random_radius * np.array([np.cos(random_angle),
-                                         np.sin(random_angle)]) + active_point
-
-      if not self._is_in_grid(sample):
-        continue
-
-      if self._is_close_to_existing_points(sample):
-        continue
-
+    # Random radii in [min_radius, 2 * min_radius) and random angles, from
+    # the same random stream as drawing one radius and angle at a time.
+    radius_angle = np.random.random_sample((self._max_sample_size, 2))
+    random_radius = self._min_radius + self._min_radius * radius_angle[:, 0]
+    random_angle = 2 * math.pi * radius_angle[:, 1]
+    samples = random_radius[:, None] * np.stack(
+      [np.cos(random_angle), np.sin(random_angle)], axis=-1) + active_point
+
+    samples = samples[self._is_in_grid(samples)]
+    samples = samples[~self._is_close_to_existing_points(samples)]
+
+    # The remaining samples can still be too close to each other. Accept them
+    # in order, dropping the later ones too close to each accepted sample.
+    while len(samples):
+      sample = samples[0]
       self._active_list.append(sample)
-      self._grid[self._point_to_index_1d(sample)] = sample
+      self._store(sample)
+      samples = samples[1:]
+      samples = samples[
+        np.sum((samples - sample) ** 2, axis=1) >= self._min_radius ** 2]
 
   def generate(self):
     """Generates the Poisson disc distribution of 2D points.
@@ -233,12 +206,84 @@ class PoissonDisc2D(object):
     while self._active_list:
       self.sample()
 
-    all_sites = []
-    for p in self._grid:
-      if p is not None:
-        all_sites.append(p)
+    grid = self._grid[_POISSON_GRID_PADDING:-_POISSON_GRID_PADDING,
+                      _POISSON_GRID_PADDING:-_POISSON_GRID_PADDING]
+    all_sites = grid[~np.isnan(grid[..., 0])]
+    return list(all_sites)
+
+
+class ObstaclePool(object):
+  """A fixed set of static boxes that is created once and re-posed after.
+
+  Boxes of the same size share one collision and one visual shape and are
+  created with a single batched createMultiBody call. Placing a new layout
+  only moves the bodies, the boxes it does not use are parked far below the
+  ground. resetSimulation() removes the bodies, so hard resets build a new
+  pool.
+  """
+
+  def __init__(self, pybullet_client, half_extents, collision_margin=0.05,
+               rgba_color=(0.1, 0.1, 0.1, 1)):
+    """Creates the boxes, all parked.
+
+    Args:
+      pybullet_client: The client the boxes are created in.
+      half_extents: Array of shape (num_boxes, 3) with the visual half
+        extents of every box.
+      collision_margin: Added to the x and y half extents of the collision
+        shapes.
+      rgba_color: The color of the boxes.
+    """
+    self._pybullet_client = pybullet_client
+    self.half_extents = np.array(half_extents, dtype=np.float64)
+    self.size = len(self.half_extents)
+    self.positions = np.tile(_PARKING_POSITION, (self.size, 1))
+    self.num_placed = 0
+    self.body_ids = [None] * self.size
+    sizes, size_ids = np.unique(
+      self.half_extents, axis=0, return_inverse=True)
+    for size_id, visual_half_extents in enumerate(sizes):
+      collision_half_extents = visual_half_extents + [
+        collision_margin, collision_margin, 0]
+      collision_shape = pybullet_client.createCollisionShape(
+        pybullet_client.GEOM_BOX,
+        halfExtents=collision_half_extents.tolist())
+      visual_shape = pybullet_client.createVisualShape(
+        pybullet_client.GEOM_BOX, halfExtents=visual_half_extents.tolist(),
+        rgbaColor=rgba_color)
+      box_ids = np.flatnonzero(size_ids.reshape(-1) == size_id)
+      body_ids = pybullet_client.createMultiBody(
+        baseMass=0,
+        baseCollisionShapeIndex=collision_shape,
+        baseVisualShapeIndex=visual_shape,
+        batchPositions=self.positions[box_ids].tolist())
+      for box_id, body_id in zip(box_ids, np.atleast_1d(body_ids)):
+        self.body_ids[box_id] = int(body_id)
+
+  def _move(self, box_ids):
+    reset_pose = self._pybullet_client.resetBasePositionAndOrientation
+    for box_id in box_ids:
+      reset_pose(self.body_ids[box_id], self.positions[box_id].tolist(),
+                 [0, 0, 0, 1])
 
-    return all_sites
+  def place(self, positions):
+    """Moves the first boxes to positions and parks the others.
+
+    Args:
+      positions: Array of shape (n, 3) with the center of each placed box.
+        Positions beyond the pool size are dropped.
+    """
+    num_placed = min(len(positions), self.size)
+    self.positions[:num_placed] = np.asarray(positions)[:num_placed]
+    self.positions[num_placed:] = _PARKING_POSITION
+    # Boxes that were parked before and still are do not move.
+    self._move(range(max(num_placed, self.num_placed)))
+    self.num_placed = num_placed
+
+  def shift(self, offsets):
+    """Moves every placed box by its row of offsets (num_placed, 2)."""
+    self.positions[:self.num_placed, :2] += offsets[:self.num_placed]
+    self._move(range(self.num_placed))
 
 
 class TerrainType(enum.Enum):
@@ -321,7 +366,9 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
                height_range=0.05,
                mesh_scale=None,
                random_shape=False,
-               moving=False
+               moving=False,
+               num_heightfields=None,
+               heightfield_cache_dir=None
                ):
     """Initializes the randomizer.
 
@@ -330,6 +377,14 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
       mesh_filename: The mesh file to be used. The mesh will only be loaded if
         terrain_type is set to TerrainType.TRIANGLE_MESH.
       mesh_scale: the scaling factor for the triangles in the mesh file.
+      num_heightfields: If set, random heightfields are drawn from this many
+        seeds instead of a new seed every time.
+      heightfield_cache_dir: If set, generated heightfields are stored in and
+        loaded from this directory, shared by all workers. Needs
+        num_heightfields, which bounds the number of files.
+
+    Raises:
+      ValueError: If heightfield_cache_dir is set without num_heightfields.
     """
     self._terrain_type = terrain_type
     self._mesh_filename = mesh_filename
@@ -339,6 +394,15 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
     self.moving = moving
     self.block_randomized_direction = np.random.randint(0, 20, size=(150,))
     self.prob = 0.4
+    self._num_heightfields = num_heightfields
+    self._heightfield_cache = None
+    if heightfield_cache_dir is not None:
+      if not num_heightfields:
+        raise ValueError(
+          'heightfield_cache_dir needs num_heightfields, otherwise every '
+          'field adds a file to the cache.')
+      self._heightfield_cache = heightfield_cache.HeightfieldCache(
+        heightfield_cache_dir)
     if self._terrain_type == TerrainType.TRIANGLE_MESH:
       # self.pybullet_client.setAdditionalSearchPath(os.path.join(os.path.dirname(__file__), '../assets'))
       file_path = os.path.join(os.path.dirname(
@@ -356,6 +420,9 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
           elif items[0] == 'f':
             self.f_lines.append(line)
     self.box_ids = []
+    self.block_ids = []
+    # The obstacles moved by randomize_step(), see ObstaclePool.
+    self.block_pool = None
     self.triangles = []
     self._created = False
     self.random_shape = random_shape
@@ -371,6 +438,11 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
     Args:
       env: A minitaur gym environment.
     """
+    if env.hard_reset:
+      # resetSimulation() removed every body, build the terrain again.
+      # Otherwise the bodies of the previous episode are re-posed.
+      self._created = False
+      self.terrain_created = False
     if self._terrain_type is TerrainType.TRIANGLE_MESH:
       self._load_triangle_mesh(env)
     if self._terrain_type is TerrainType.RANDOM_BLOCKS:
@@ -477,6 +549,10 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
       env: A minitaur gym environment.
 
     """
+    if self._created:
+      self._move_convex_blocks(env)
+      return
+    self.block_ids = []
     block_centers = np.split(np.random.uniform(
       [0, -0.5], [5, 0.5], size=(20, 2)), 20)
 
@@ -499,39 +575,44 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
           half_length, half_length, half_height],
         rgbaColor=(0.1, 0.1, 0.1, 1))
 
-      env.pybullet_client.createMultiBody(
+      b_id = env.pybullet_client.createMultiBody(
         baseMass=0,
         baseCollisionShapeIndex=box_id,
         baseVisualShapeIndex=box_visual_id,
         basePosition=[shifted_center[0], shifted_center[1], half_height])
+      self.block_ids.append((b_id, half_height))
+    self._created = True
+
+  def _move_convex_blocks(self, env):
+    block_centers = np.random.uniform(
+      [0, -0.5], [5, 0.5], size=(len(self.block_ids), 2))
+    for (b_id, half_height), center in zip(self.block_ids, block_centers):
+      z = half_height
+      # Blocks sampled near the start point go below the ground instead.
+      if abs(center[0]) < 0.3 and abs(center[1]) < 0.3:
+        z = -1 - half_height
+      env.pybullet_client.resetBasePositionAndOrientation(
+        b_id,
+        posObj=[center[0], center[1], z],
+        ornObj=[0, 0, 0, 1]
+      )
 
   def _randomize_random_blocks_sparse(self, env):
     scale = 3
-    for box_id, direction_id in zip(self.box_ids, self.block_randomized_direction):
-      _, b_id = box_id
-      pos, ori = env.pybullet_client.getBasePositionAndOrientation(b_id)
-      pos = list(pos)
-      pos[0] += DIRECTION[direction_id][0] * scale
-      pos[1] += DIRECTION[direction_id][1] * scale
-      env.pybullet_client.resetBasePositionAndOrientation(b_id,
-                                                          posObj=pos,
-                                                          ornObj=ori)
+    self.block_pool.shift(
+      _DIRECTIONS[self.block_randomized_direction] * scale)
 
   def _move_block_pos(self, env):
     self.poisson_disc = PoissonDisc2D(26, 6, 1., 150)
     block_centers = self.poisson_disc.generate()
     np.random.shuffle(block_centers)
-    for idx, box_id in enumerate(self.box_ids):
-      _, b_id = box_id
-      # x, y = pos
-      shifted_center = block_centers[idx].reshape(
-        2) + np.array([2.5, -3.0])
-      env.pybullet_client.resetBasePositionAndOrientation(
-        b_id,
-        posObj=[shifted_center[0],
-                shifted_center[1], self.half_height],
-        ornObj=[0, 0, 0, 1]
-      )
+    # Layouts with fewer points than blocks park the remaining blocks.
+    block_centers = np.array(
+      block_centers[:self.block_pool.size]).reshape(-1, 2)
+    positions = np.zeros((len(block_centers), 3))
+    positions[:, :2] = block_centers + np.array([2.5, -3.0])
+    positions[:, 2] = self.half_height
+    self.block_pool.place(positions)
 
   def _sample_goal_in_maze(self, env, first_time=False):
     goal_pos = np.random.uniform([-15, -15], [15, 15], size=(2,))
@@ -564,50 +645,27 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
     if self._created:
       self._move_block_pos(env)
       return
-    self.box_ids = []
+    num_blocks = 50
     self.half_height = 0.7
     self.half_length = 0.3 / (2 * math.sqrt(2))
+    half_extents = np.tile(
+      [self.half_length * 1.7, self.half_length * 1.7, self.half_height],
+      (num_blocks, 1))
     if self.random_shape:
       delta_half_length = np.random.uniform(
-        low=-0.01, high=0.2, size=(50, 2))
-      delta_half_height = np.random.uniform(low=-0.25, high=0.25, size=50)
-
-    block_centers = np.split(np.random.uniform(
-      [2.0, -3.0], [30, 3.0], size=(50, 2)), 50)
-
-    for i, center in enumerate(block_centers):
-      # We want the blocks to be in front of the robot.
-      shifted_center = center.reshape(2) + np.array([2.5, -3.0])
-      if self.random_shape:
-        half_height = self.half_height + delta_half_height[i]
-        half_length = self.half_length + delta_half_length[i]
-        box_id = env.pybullet_client.createCollisionShape(
-          env.pybullet_client.GEOM_BOX, halfExtents=[half_length[0] * 1.7 + 0.05, half_length[1] * 1.7 + 0.05, half_height])
-
-        box_visual_id = env.pybullet_client.createVisualShape(
-          env.pybullet_client.GEOM_BOX, halfExtents=[
-            half_length[0] * 1.7, half_length[1] * 1.7, half_height],
-          rgbaColor=(0.1, 0.1, 0.1, 1))
-        b_id = env.pybullet_client.createMultiBody(
-          baseMass=0,
-          baseCollisionShapeIndex=box_id,
-          baseVisualShapeIndex=box_visual_id,
-          basePosition=[shifted_center[0], shifted_center[1], half_height * 0.5])
-      else:
-        box_id = env.pybullet_client.createCollisionShape(
-          env.pybullet_client.GEOM_BOX, halfExtents=[self.half_length * 1.7 + 0.05, self.half_length * 1.7 + 0.05, self.half_height])
-
-        box_visual_id = env.pybullet_client.createVisualShape(
-          env.pybullet_client.GEOM_BOX, halfExtents=[
-            self.half_length * 1.7, self.half_length * 1.7, self.half_height],
-          rgbaColor=(0.1, 0.1, 0.1, 1))
-        b_id = env.pybullet_client.createMultiBody(
-          baseMass=0,
-          baseCollisionShapeIndex=box_id,
-          baseVisualShapeIndex=box_visual_id,
-          basePosition=[shifted_center[0], shifted_center[1], self.half_height])
-      self.box_ids.append([shifted_center, b_id])
-      # print(env.pybullet_client.getBasePositionAndOrientation(b_id))
+        low=-0.01, high=0.2, size=(num_blocks, 2))
+      delta_half_height = np.random.uniform(
+        low=-0.25, high=0.25, size=num_blocks)
+      half_extents[:, :2] = (self.half_length + delta_half_length) * 1.7
+      half_extents[:, 2] = self.half_height + delta_half_height
+    self.block_pool = ObstaclePool(env.pybullet_client, half_extents)
+
+    # We want the blocks to be in front of the robot.
+    positions = np.zeros((num_blocks, 3))
+    positions[:, :2] = np.random.uniform(
+      [2.0, -3.0], [30, 3.0], size=(num_blocks, 2)) + np.array([2.5, -3.0])
+    positions[:, 2] = half_extents[:, 2] * (0.5 if self.random_shape else 1.)
+    self.block_pool.place(positions)
 
     # Fench
     box_id = env.pybullet_client.createCollisionShape(
@@ -653,6 +711,9 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
     self._created = True
 
   def _generate_stairs(self, env):
+    if self._created:
+      # the stairs are always the same, keep them
+      return
     sth = 0.10
     boxHalfLength = 2
     boxHalfWidth = 25
@@ -754,55 +815,32 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
     self._created = True
 
   def _generate_field(self, env, num_rows=None, num_columns=None):
-    # print("Generate Field")
     if num_rows == None:
       num_rows = numHeightfieldRows
     if num_columns == None:
       num_columns = numHeightfieldRows
 
-    if not self.terrain_created:
-      self.heightfieldData = [0] * num_rows * num_columns
-
-    heightPerturbationRange = self.height_range
-
-    heightPerturbationRange = heightPerturbationRange
-    # if heightfieldSource == useProgrammatic:
-
-    for j in range(int(num_columns / 2)):
-      for i in range(int(num_rows / 2)):
-        height = random.uniform(0, heightPerturbationRange)
-        self.heightfieldData[2 * i +
-                             2 * j * num_rows] = height
-        self.heightfieldData[2 * i + 1 +
-                             2 * j * num_rows] = height
-        self.heightfieldData[2 * i + (2 * j + 1) *
-                             num_rows] = height
-        self.heightfieldData[2 * i + 1 + (2 * j + 1) *
-                             num_rows] = height
-    for j in range(-5, 5):
-      for i in range(-5, 5):
-        x = int(num_rows / 4) + i
-        y = int(num_columns / 4) + j
-        # print(x, y)
-        self.heightfieldData[2 * x +
-                             2 * y * num_rows] = 0
-        self.heightfieldData[2 * x + 1 +
-                             2 * y * num_rows] = 0
-        self.heightfieldData[2 * x + (2 * y + 1) *
-                             num_rows] = 0
-        self.heightfieldData[2 * x + 1 + (2 * y + 1) *
-                             num_rows] = 0
-
     if self.terrain_created:
+      # Soft resets keep the heightfield body, a new field would not be used.
       return
+
+    seed = np.random.randint(
+      self._num_heightfields if self._num_heightfields else 2 ** 31)
+    if self._heightfield_cache is not None:
+      self.heightfieldData = self._heightfield_cache.get(
+        num_rows, num_columns, self.height_range, seed)
     else:
-      self.terrainShape = env.pybullet_client.createCollisionShape(
-        shapeType=env.pybullet_client.GEOM_HEIGHTFIELD,
-        meshScale=[.12, .12, 1.0],
-        heightfieldTextureScaling=0,
-        heightfieldData=self.heightfieldData,
-        numHeightfieldRows=num_rows,
-        numHeightfieldColumns=num_columns)
+      self.heightfieldData = heightfield_cache.generate_heightfield(
+        num_rows, num_columns, self.height_range, seed)
+
+    self.terrainShape = env.pybullet_client.createCollisionShape(
+      shapeType=env.pybullet_client.GEOM_HEIGHTFIELD,
+      meshScale=[.12, .12, 1.0],
+      heightfieldTextureScaling=0,
+      # a list is parsed fastest
+      heightfieldData=self.heightfieldData.tolist(),
+      numHeightfieldRows=num_rows,
+      numHeightfieldColumns=num_columns)
     terrain = env.pybullet_client.createMultiBody(0, self.terrainShape)
     env.pybullet_client.resetBasePositionAndOrientation(
       terrain, [0.0, 0.0, 0.0], [0, 0, 0, 1])
@@ -1602,30 +1640,14 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
     # print("create_time: ", time.time() - create_time)
 
   def _move_block_thin_wide_and_subgoal_pos(self, env, with_subgoal=False):
-    for b_id, pos in self.wide_box_ids:
-      x, y = pos
-      env.pybullet_client.resetBasePositionAndOrientation(
-        b_id,
-        posObj=[
-          x + np.random.rand() * 2 * self.prob,
-          y + np.random.rand() * 0 * self.prob,
-          self.half_height * 0.5],
-        ornObj=[0, 0, 0, 1]
-      )
-
-    block_centers = np.split(np.random.uniform(
-      [2.0, -3.0], [16.0, 3.0], size=(30, 2)), 30)
+    positions = self.wide_box_positions.copy()
+    positions[:, :2] += np.random.rand(len(positions), 2) * [2, 0] * self.prob
+    self.wide_box_pool.place(positions)
 
-    for idx, box_id in enumerate(self.thin_box_ids):
-      pos, b_id = box_id
-      # x, y = pos
-      shifted_center = block_centers[idx].reshape(2)
-      env.pybullet_client.resetBasePositionAndOrientation(
-        b_id,
-        posObj=[shifted_center[0],
-                shifted_center[1], self.half_height],
-        ornObj=[0, 0, 0, 1]
-      )
+    positions = np.full((self.thin_box_pool.size, 3), self.half_height)
+    positions[:, :2] = np.random.uniform(
+      [2.0, -3.0], [16.0, 3.0], size=(self.thin_box_pool.size, 2))
+    self.thin_box_pool.place(positions)
 
     if with_subgoal:
       self.subgoal_centers = np.random.uniform(
@@ -1685,140 +1707,38 @@ class TerrainRandomizer(env_randomizer_base.EnvRandomizerBase):
           basePosition=[shifted_center[0], shifted_center[1], self.radius])
         self.subgoal_ids.append(b_id)
 
-    self.box_ids = []
-    self.wide_box_ids = []
     half_length = 0.25
-
     self.half_height = 1.0
 
-    box_id = env.pybullet_client.createCollisionShape(
-      env.pybullet_client.GEOM_BOX,
-      halfExtents=[
-        half_length+0.05, 0.4 + 0.05, self.half_height*0.5
-      ]
-    )
-
-    box_visual_id = env.pybullet_client.createVisualShape(
-      env.pybullet_client.GEOM_BOX,
-      halfExtents=[half_length, 0.4, self.half_height*0.5],
-      rgbaColor=(0.1, 0.1, 0.1, 1)
-    )
-
-    b_id = env.pybullet_client.createMultiBody(
-      baseMass=0,
-      baseCollisionShapeIndex=box_id,
-      baseVisualShapeIndex=box_visual_id,
-      basePosition=[2, 0.75, self.half_height*0.5]
-    )
-    self.wide_box_ids.append((b_id, (2, 0.75)))
-
-    box_id = env.pybullet_client.createCollisionShape(
-      env.pybullet_client.GEOM_BOX,
-      halfExtents=[
-        half_length+0.05, 0.4 + 0.05, self.half_height*0.5
-      ]
-    )
-
-    box_visual_id = env.pybullet_client.createVisualShape(
-      env.pybullet_client.GEOM_BOX,
-      halfExtents=[half_length, 0.4, self.half_height*0.5],
-      rgbaColor=(0.1, 0.1, 0.1, 1)
-    )
-
-    b_id = env.pybullet_client.createMultiBody(
-      baseMass=0,
-      baseCollisionShapeIndex=box_id,
-      baseVisualShapeIndex=box_visual_id,
-      basePosition=[2, -0.75, self.half_height*0.5]
-    )
-    self.wide_box_ids.append((b_id, (2, -0.75)))
-
+    # Two short walls at the start, then rows of one long wall in the middle
+    # and two on the sides.
+    wide_centers = [(2, 0.75), (2, -0.75)]
+    wide_half_widths = [0.4, 0.4]
     for i in range(7):
-      box_id = env.pybullet_client.createCollisionShape(
-        env.pybullet_client.GEOM_BOX, halfExtents=[half_length+0.05, 0.8 + 0.05, self.half_height * 0.5])
-
-      box_visual_id = env.pybullet_client.createVisualShape(
-        env.pybullet_client.GEOM_BOX, halfExtents=[
-          half_length, 0.8, self.half_height * 0.5],
-        rgbaColor=(0.1, 0.1, 0.1, 1))
-
-      b_id = env.pybullet_client.createMultiBody(
-        baseMass=0,
-        baseCollisionShapeIndex=box_id,
-        baseVisualShapeIndex=box_visual_id,
-        basePosition=[5 + i * 7, 0, self.half_height * 0.5])
-      self.wide_box_ids.append((b_id, (5 + i * 7, 0)))
-
-      box_id = env.pybullet_client.createCollisionShape(
-        env.pybullet_client.GEOM_BOX,
-        halfExtents=[
-          half_length+0.05, 0.8 + 0.05, self.half_height * 0.5
-        ]
-      )
-
-      box_visual_id = env.pybullet_client.createVisualShape(
-        env.pybullet_client.GEOM_BOX,
-        halfExtents=[half_length, 0.8, self.half_height * 0.5],
-        rgbaColor=(0.1, 0.1, 0.1, 1)
-      )
-
-      b_id = env.pybullet_client.createMultiBody(
-        baseMass=0,
-        baseCollisionShapeIndex=box_id,
-        baseVisualShapeIndex=box_visual_id,
-        basePosition=[8 + i * 7, -1.8, self.half_height * 0.5]
-      )
-      self.wide_box_ids.append((b_id, (8 + i * 7, -1.8)))
-
-      box_id = env.pybullet_client.createCollisionShape(
-        env.pybullet_client.GEOM_BOX,
-        halfExtents=[
-          half_length+0.05, 0.8 + 0.05, self.half_height * 0.5
-        ]
-      )
-
-      box_visual_id = env.pybullet_client.createVisualShape(
-        env.pybullet_client.GEOM_BOX,
-        halfExtents=[half_length, 0.8, self.half_height * 0.5],
-        rgbaColor=(0.1, 0.1, 0.1, 1)
-      )
-
-      b_id = env.pybullet_client.createMultiBody(
-        baseMass=0,
-        baseCollisionShapeIndex=box_id,
-        baseVisualShapeIndex=box_visual_id,
-        basePosition=[8 + i * 7, 1.8, self.half_height * 0.5]
-      )
-      self.wide_box_ids.append((b_id, (8 + i * 7, 1.8)))
-
-    self.thin_box_ids = []
+      wide_centers += [(5 + i * 7, 0), (8 + i * 7, -1.8), (8 + i * 7, 1.8)]
+      wide_half_widths += [0.8, 0.8, 0.8]
+    half_extents = np.zeros((len(wide_centers), 3))
+    half_extents[:, 0] = half_length
+    half_extents[:, 1] = wide_half_widths
+    half_extents[:, 2] = self.half_height * 0.5
+    self.wide_box_positions = np.zeros((len(wide_centers), 3))
+    self.wide_box_positions[:, :2] = wide_centers
+    self.wide_box_positions[:, 2] = self.half_height * 0.5
+    self.wide_box_pool = ObstaclePool(env.pybullet_client, half_extents)
+    self.wide_box_pool.place(self.wide_box_positions)
+
+    num_thin_boxes = 30
     half_length = 0.3 / (2 * math.sqrt(2))
-
-    # self.half_height = 0.7
-
-    block_centers = np.split(np.random.uniform(
-      [2.0, -2.0], [30.0, 2.0], size=(30, 2)), 30)
-
-    for center in block_centers:
-      # We want the blocks to be in front of the robot.
-      # shifted_center = np.array(center) - [2, _GRID_WIDTH / 2]
-      shifted_center = center.reshape(2)
-
-      box_id = env.pybullet_client.createCollisionShape(
-        env.pybullet_client.GEOM_BOX, halfExtents=[half_length * 1.7 + 0.05, half_length * 1.7 + 0.05, self.half_height])
-
-      box_visual_id = env.pybullet_client.createVisualShape(
-        env.pybullet_client.GEOM_BOX, halfExtents=[
-          half_length * 1.7, half_length * 1.7, self.half_height],
-        rgbaColor=(0.1, 0.1, 0.1, 1))
-
-      b_id = env.pybullet_client.createMultiBody(
-        baseMass=0,
-        baseCollisionShapeIndex=box_id,
-        baseVisualShapeIndex=box_visual_id,
-        basePosition=[shifted_center[0], shifted_center[1], self.half_height])
-      self.thin_box_ids.append([shifted_center, b_id])
-      self.box_ids.append([shifted_center, b_id])
+    self.thin_box_pool = ObstaclePool(
+      env.pybullet_client,
+      np.tile([half_length * 1.7, half_length * 1.7, self.half_height],
+              (num_thin_boxes, 1)))
+    positions = np.full((num_thin_boxes, 3), self.half_height)
+    positions[:, :2] = np.random.uniform(
+      [2.0, -2.0], [30.0, 2.0], size=(num_thin_boxes, 2))
+    self.thin_box_pool.place(positions)
+    # Only the thin boxes move with moving=True.
+    self.block_pool = self.thin_box_pool
 
     # Fench
     box_id = env.pybullet_client.createCollisionShape(
@@ -0,0 +1,78 @@
+"""Random heightfields generated with numpy and cached on disk.
+
+A heightfield is fully determined by its size, height range and seed, so it
+is stored under a hash of those values. Cached fields are .npy files, every
+worker that asks for the same terrain loads it instead of generating it.
+"""
+import hashlib
+import os
+import tempfile
+
+import numpy as np
+
+# Bump when generate_heightfield() changes, to invalidate old cache files.
+_HEIGHTFIELD_VERSION = 1
+# Half the side of the flat square around the spawn point, in 2x2 cells.
+_FLAT_SPAWN_CELLS = 5
+
+
+def generate_heightfield(num_rows, num_columns, height_range, seed):
+  """Generates a field of random 2x2 blocks with a flat spawn area.
+
+  Args:
+    num_rows: The number of heightfield rows (samples along x).
+    num_columns: The number of heightfield columns (samples along y).
+    height_range: Block heights are uniform in [0, height_range).
+    seed: The seed of the block heights.
+
+  Returns:
+    A float32 array of num_rows * num_columns heights in the order
+    createCollisionShape expects, sample (i, j) at index i + j * num_rows.
+  """
+  heights = np.zeros((num_columns, num_rows), dtype=np.float32)
+  block_columns, block_rows = num_columns // 2, num_rows // 2
+  blocks = np.random.RandomState(seed).uniform(
+    0, height_range, size=(block_columns, block_rows))
+  spawn_row, spawn_column = num_rows // 4, num_columns // 4
+  blocks[spawn_column - _FLAT_SPAWN_CELLS:spawn_column + _FLAT_SPAWN_CELLS,
+         spawn_row - _FLAT_SPAWN_CELLS:spawn_row + _FLAT_SPAWN_CELLS] = 0
+  heights[:2 * block_columns, :2 * block_rows] = np.repeat(
+    np.repeat(blocks, 2, axis=0), 2, axis=1)
+  return heights.reshape(-1)
+
+
+class HeightfieldCache(object):
+  """Content-addressed store of generated heightfields."""
+
+  def __init__(self, cache_dir):
+    self._cache_dir = os.path.expanduser(cache_dir)
+    if not os.path.isdir(self._cache_dir):
+      os.makedirs(self._cache_dir, exist_ok=True)
+
+  def path(self, num_rows, num_columns, height_range, seed):
+    key = repr((_HEIGHTFIELD_VERSION, int(num_rows), int(num_columns),
+                float(height_range), int(seed)))
+    return os.path.join(
+      self._cache_dir,
+      "heightfield_" + hashlib.sha1(key.encode()).hexdigest() + ".npy")
+
+  def get(self, num_rows, num_columns, height_range, seed):
+    """Returns the heightfield, generating and storing it on the first
+    request. See generate_heightfield() for the arguments."""
+    path = self.path(num_rows, num_columns, height_range, seed)
+    if not os.path.exists(path):
+      heights = generate_heightfield(num_rows, num_columns, height_range, seed)
+      # Workers may race on the same field, each writes a private file and
+      # the atomic rename makes one of the identical results visible.
+      handle, tmp_path = tempfile.mkstemp(dir=self._cache_dir, suffix=".tmp")
+      try:
+        with os.fdopen(handle, "wb") as f:
+          np.save(f, heights)
+        os.replace(tmp_path, path)
+      except BaseException:
+        if os.path.exists(tmp_path):
+          os.remove(tmp_path)
+        raise
+    # Loaded into memory, createCollisionShape reads memory maps element by
+    # element.
+    return np.load(path)
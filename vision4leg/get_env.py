@@ -5,6 +5,11 @@ from torchrl.env.vecenv import VecEnv
 from torchrl.env.subproc_vecenv import SubProcVecEnv
 from gym.wrappers.time_limit import TimeLimit
 from vision4leg.env_dict import ENV_DICT, TIMELIMIT_DICT
+from vision4leg.envs.shared_world_env import SharedWorldVecEnv
+
+# Envs built by build_a1_ground_env, the only builder that takes a shared
+# pybullet client, see SharedWorldVecEnv.
+SHARED_WORLD_ENVS = ["A1MoveGround"]
 
 
 def wrap_continuous_env(env, obs_norm, reward_scale):
@@ -55,17 +60,43 @@ class NormObsWithImg(gym.ObservationWrapper, BaseWrapper):
     self._obs_var = copy.deepcopy(source_env._obs_var)
     self._obs_mean = copy.deepcopy(source_env._obs_mean)
 
-  def observation(self, observation):
-    if self.training:
-      self._obs_normalizer.update_estimate(
-        observation[..., :self.state_shape]
-      )
+  def filt(self, observation):
     img_obs = observation[..., self.state_shape:]
     return np.hstack([
       self._obs_normalizer.filt(observation[..., :self.state_shape]),
       img_obs
     ])
 
+  def observation(self, observation):
+    if self.training:
+      self._obs_normalizer.update_estimate(
+        observation[..., :self.state_shape]
+      )
+    return self.filt(observation)
+
+  def terminal_observation(self, infos):
+    # terminal obs of auto reset envs are normalized without updating
+    if "terminal_obs" in infos:
+      infos["terminal_obs"] = self.filt(infos["terminal_obs"])
+    return infos
+
+  def partial_reset(self, index_mask, **kwargs):
+    # only the reset envs update the estimate
+    obs = self._wrapped_env.partial_reset(index_mask, **kwargs)
+    if self.training:
+      self._obs_normalizer.update_estimate(
+        obs[index_mask][..., :self.state_shape])
+    return self.filt(obs)
+
+  def step(self, action):
+    obs, rews, dones, infos = super().step(action)
+    return obs, rews, dones, self.terminal_observation(infos)
+
+  def step_wait(self):
+    obs, rews, dones, infos = self._wrapped_env.step_wait()
+    obs = self.observation(obs)
+    return obs, rews, dones, self.terminal_observation(infos)
+
 
 def get_single_env(env_id, env_param):
   print(env_id, env_param)
@@ -109,7 +140,7 @@ def get_vec_env(env_id, env_param, vec_env_nums):
 
     vec_env = VecEnv(
       vec_env_nums, [get_single_env] * vec_env_nums,
-      env_args)
+      env_args, auto_reset=env_param[0].get("auto_reset", False))
 
     if "obs_norm" in env_param[0] and env_param[0]["obs_norm"]:
       if "get_image" in env_param[0]["env_build"]:
@@ -120,7 +151,7 @@ def get_vec_env(env_id, env_param, vec_env_nums):
   else:
     vec_env = VecEnv(
       vec_env_nums, get_single_env,
-      [env_id, env_param])
+      [env_id, env_param], auto_reset=env_param.get("auto_reset", False))
 
     if "obs_norm" in env_param and env_param["obs_norm"]:
       if "get_image" in env_param["env_build"]:
@@ -130,15 +161,50 @@ def get_vec_env(env_id, env_param, vec_env_nums):
     return vec_env
 
 
+def get_shared_world_env(env_id, env_param, vec_env_nums):
+  """
+  Like get_vec_env, but the robots of the envs share one pybullet world,
+  see SharedWorldVecEnv
+  """
+  if env_id not in SHARED_WORLD_ENVS:
+    raise ValueError(
+      "{} is not supported on a shared world, use one of {}".format(
+        env_id, SHARED_WORLD_ENVS))
+  if "rew_norm" in env_param:
+    raise ValueError("rew_norm is not supported on a shared world")
+  max_episode_steps = None
+  if env_id in TIMELIMIT_DICT:
+    max_episode_steps = env_param.get("horizon", TIMELIMIT_DICT[env_id])
+  vec_env = SharedWorldVecEnv(
+    vec_env_nums, ENV_DICT[env_id], env_param["env_build"],
+    max_episode_steps=max_episode_steps,
+    auto_reset=env_param.get("auto_reset", False),
+    **env_param.get("shared_world", {}))
+
+  if isinstance(vec_env.action_space, gym.spaces.Box):
+    vec_env = NormAct(vec_env)
+  if "obs_norm" in env_param and env_param["obs_norm"]:
+    if "get_image" in env_param["env_build"]:
+      vec_env = NormObsWithImg(vec_env)
+    else:
+      vec_env = NormObs(vec_env)
+  return vec_env
+
+
 def get_subprocvec_env(env_id, env_param, vec_env_nums, proc_nums):
   if isinstance(env_param, list):
     assert vec_env_nums % len(env_param) == 0
     env_args = [
       [env_id, env_sub_params] for env_sub_params in env_param
     ] * (vec_env_nums // len(env_param))
+    shared_memory = "shared_memory" in env_param[0] and \
+      env_param[0]["shared_memory"]
+    start_method = env_param[0].get("start_method", None)
+    auto_reset = env_param[0].get("auto_reset", False)
     vec_env = SubProcVecEnv(
       proc_nums, vec_env_nums, [get_single_env] * vec_env_nums,
-      env_args
+      env_args, shared_memory=shared_memory,
+      start_method=start_method, auto_reset=auto_reset
     )
 
     if "obs_norm" in env_param[0] and env_param[0]["obs_norm"]:
@@ -149,9 +215,14 @@ def get_subprocvec_env(env_id, env_param, vec_env_nums, proc_nums):
     return vec_env
 
   else:
+    shared_memory = "shared_memory" in env_param and \
+      env_param["shared_memory"]
+    start_method = env_param.get("start_method", None)
+    auto_reset = env_param.get("auto_reset", False)
     vec_env = SubProcVecEnv(
       proc_nums, vec_env_nums, get_single_env,
-      [env_id, env_param])
+      [env_id, env_param], shared_memory=shared_memory,
+      start_method=start_method, auto_reset=auto_reset)
 
     if "obs_norm" in env_param and env_param["obs_norm"]:
       if "get_image" in env_param["env_build"]:
@@ -18,6 +18,7 @@
 from vision4leg.envs import locomotion_gym_config
 from vision4leg.robots import robot_config
 from vision4leg.robots import minitaur
+from vision4leg.robots import a1_kinematics
 from vision4leg.robots import laikago_motor
 from vision4leg.robots import laikago_constants
 import pybullet as pyb  # pytype: disable=import-error
@@ -175,7 +176,8 @@ class A1(minitaur.Minitaur):
       allow_knee_contact=False,
       is_render=False,
       reset_position_random_range=0,
-      init_pos=None
+      init_pos=None,
+      settled_state_cache=None
   ):
     self._urdf_filename = urdf_filename
     self.init_pos = init_pos
@@ -213,7 +215,8 @@ class A1(minitaur.Minitaur):
       enable_action_filter=enable_action_filter,
       reset_time=reset_time,
       is_render=is_render,
-      reset_position_random_range=reset_position_random_range
+      reset_position_random_range=reset_position_random_range,
+      settled_state_cache=settled_state_cache
     )
 
   def _LoadRobotURDF(self):
@@ -249,9 +252,48 @@ class A1(minitaur.Minitaur):
   def GetHipPositionsInBaseFrame(self):
     return _DEFAULT_HIP_POSITIONS
 
+  def ComputeMotorAnglesFromFootLocalPosition(self, leg_id,
+                                              foot_local_position):
+    """Computes the motor angles of a leg in closed form, see a1_kinematics.
+
+    Args:
+      leg_id: The leg index.
+      foot_local_position: The foot link's position in the base frame.
+
+    Returns:
+      A tuple. The position indices and the angles for all joints along the
+      leg. The position indices is consistent with the joint orders as returned
+      by GetMotorAngles API.
+    """
+    joint_position_idxs = list(
+      range(leg_id * DOFS_PER_LEG, (leg_id + 1) * DOFS_PER_LEG))
+    joint_angles = (
+      a1_kinematics.joint_angles_from_foot_positions_in_base_frame(
+        foot_local_position, leg_id))
+    joint_angles = np.multiply(
+      joint_angles - self._motor_offset[joint_position_idxs],
+      self._motor_direction[joint_position_idxs])
+    return joint_position_idxs, joint_angles.tolist()
+
+  def ComputeLegJacobian(self, leg_id):
+    """Computes the 3 x 3 Jacobian of a leg in the base frame, the columns of
+    the leg joints in the 3 x N pybullet Jacobian of ComputeJacobian()."""
+    return a1_kinematics.leg_jacobians(
+      self._joint_positions[leg_id * DOFS_PER_LEG:(leg_id + 1) *
+                            DOFS_PER_LEG], leg_id)
+
+  def MapContactForceToJointTorques(self, leg_id, contact_force):
+    """Maps the foot contact force to the leg joint torques."""
+    leg_torques = np.matmul(contact_force, self.ComputeLegJacobian(leg_id))
+    return {
+      joint_id: torque * self._motor_direction[joint_id]
+      for joint_id, torque in zip(
+        range(leg_id * DOFS_PER_LEG, (leg_id + 1) * DOFS_PER_LEG),
+        leg_torques)
+    }
+
   def GetFootContacts(self):
-    all_contacts = self._pybullet_client.getContactPoints(
-      bodyA=self.quadruped)
+    all_contacts = self._GetContactPoints()
 
     contacts = [False, False, False, False]
     for contact in all_contacts:
@@ -0,0 +1,172 @@
+"""Closed-form leg kinematics of the A1.
+
+Each A1 leg is an abduction joint about x followed by hip and knee joints
+about y, with equally long upper and lower legs. That gives closed-form
+forward kinematics, inverse kinematics and Jacobians, computed here for
+any number of legs at once with numpy instead of one pybullet
+calculateInverseKinematics / calculateJacobian call per leg.
+
+Legs are ordered FR, FL, RR, RL like the motors. Positions are in the
+frame pybullet reports for the base, which is centred on the trunk's
+center of mass with the trunk's orientation. The toe position is the toe
+link that GetFootPositionsInBaseFrame reads.
+"""
+import numpy as np
+
+NUM_LEGS = 4
+UPPER_LEG_LENGTH = 0.2
+LOWER_LEG_LENGTH = 0.2
+# Lateral offset of the upper leg from the abduction axis, right legs are
+# offset to -y.
+HIP_LENGTH = 0.08505
+HIP_LENGTH_SIGNS = np.array([-1., 1., -1., 1.])
+# Abduction joints in the URDF trunk frame.
+HIP_OFFSETS = np.array([
+  [0.183, -0.047, 0.],
+  [0.183, 0.047, 0.],
+  [-0.183, -0.047, 0.],
+  [-0.183, 0.047, 0.],
+])
+# The trunk center of mass in the URDF trunk frame, the origin of the base
+# frame reported by pybullet.
+COM_OFFSET = np.array([0.012731, 0.002186, 0.000515])
+HIP_POSITIONS_IN_BASE_FRAME = HIP_OFFSETS - COM_OFFSET
+
+
+def _leg_rows(values):
+  """Reads a flat array of the values of all 12 motors as (4, 3)."""
+  values = np.asarray(values, dtype=np.float64)
+  if values.shape == (3 * NUM_LEGS,):
+    values = values.reshape((NUM_LEGS, 3))
+  return values
+
+
+def _leg_ids(shape, leg_ids):
+  if leg_ids is None:
+    leg_ids = np.arange(NUM_LEGS)
+  return np.broadcast_to(leg_ids, shape)
+
+
+def foot_positions_in_hip_frame(joint_angles, leg_ids=None):
+  """Computes the toe positions relative to the abduction joints.
+
+  Args:
+    joint_angles: Array of shape (..., 3) with the abduction, hip and knee
+      angles of each leg. A flat array of the 12 motor angles is read as
+      (4, 3).
+    leg_ids: The leg of each row of joint_angles, broadcast against
+      joint_angles.shape[:-1]. Defaults to all four legs in order.
+
+  Returns:
+    Array of shape (..., 3) with the toe positions.
+  """
+  joint_angles = _leg_rows(joint_angles)
+  abduction, hip, knee = np.moveaxis(joint_angles, -1, 0)
+  hip_length = HIP_LENGTH * HIP_LENGTH_SIGNS[
+    _leg_ids(abduction.shape, leg_ids)]
+  leg_length = np.sqrt(
+    UPPER_LEG_LENGTH ** 2 + LOWER_LEG_LENGTH ** 2 +
+    2 * UPPER_LEG_LENGTH * LOWER_LEG_LENGTH * np.cos(knee))
+  swing = hip + knee / 2
+  x = -leg_length * np.sin(swing)
+  z_sagittal = -leg_length * np.cos(swing)
+  cos_abduction, sin_abduction = np.cos(abduction), np.sin(abduction)
+  y = cos_abduction * hip_length - sin_abduction * z_sagittal
+  z = sin_abduction * hip_length + cos_abduction * z_sagittal
+  return np.stack([x, y, z], axis=-1)
+
+
+def foot_positions_in_base_frame(joint_angles, leg_ids=None):
+  """Computes the toe positions in the base frame, see
+  foot_positions_in_hip_frame() for the arguments."""
+  positions = foot_positions_in_hip_frame(joint_angles, leg_ids)
+  return positions + HIP_POSITIONS_IN_BASE_FRAME[
+    _leg_ids(positions.shape[:-1], leg_ids)]
+
+
+def joint_angles_from_foot_positions_in_hip_frame(foot_positions,
+                                                  leg_ids=None):
+  """Computes the joint angles that place the toes at the given positions.
+
+  The knee always bends backwards (negative knee angle) like on the robot.
+  Unreachable positions are clipped to the workspace boundary.
+
+  Args:
+    foot_positions: Array of shape (..., 3) with toe positions relative to the
+      abduction joints.
+    leg_ids: The leg of each row of foot_positions, broadcast against
+      foot_positions.shape[:-1]. Defaults to all four legs in order.
+
+  Returns:
+    Array of shape (..., 3) with the abduction, hip and knee angles.
+  """
+  x, y, z = np.moveaxis(np.asarray(foot_positions, dtype=np.float64), -1, 0)
+  hip_length = HIP_LENGTH * HIP_LENGTH_SIGNS[_leg_ids(x.shape, leg_ids)]
+  cos_knee = (x ** 2 + y ** 2 + z ** 2 - hip_length ** 2 -
+              UPPER_LEG_LENGTH ** 2 - LOWER_LEG_LENGTH ** 2) / (
+                2 * UPPER_LEG_LENGTH * LOWER_LEG_LENGTH)
+  knee = -np.arccos(np.clip(cos_knee, -1., 1.))
+  leg_length = np.sqrt(
+    UPPER_LEG_LENGTH ** 2 + LOWER_LEG_LENGTH ** 2 +
+    2 * UPPER_LEG_LENGTH * LOWER_LEG_LENGTH * np.cos(knee))
+  hip = np.arcsin(np.clip(-x / leg_length, -1., 1.)) - knee / 2
+  z_sagittal = -leg_length * np.cos(hip + knee / 2)
+  abduction = np.arctan2(hip_length * z - z_sagittal * y,
+                         hip_length * y + z_sagittal * z)
+  return np.stack([abduction, hip, knee], axis=-1)
+
+
+def joint_angles_from_foot_positions_in_base_frame(foot_positions,
+                                                   leg_ids=None):
+  """Computes the joint angles from toe positions in the base frame, see
+  joint_angles_from_foot_positions_in_hip_frame() for the arguments."""
+  foot_positions = np.asarray(foot_positions, dtype=np.float64)
+  return joint_angles_from_foot_positions_in_hip_frame(
+    foot_positions - HIP_POSITIONS_IN_BASE_FRAME[
+      _leg_ids(foot_positions.shape[:-1], leg_ids)], leg_ids)
+
+
+def leg_jacobians(joint_angles, leg_ids=None):
+  """Computes the Jacobians of the toe positions w.r.t. the leg joints.
+
+  Args:
+    joint_angles: Array of shape (..., 3), see foot_positions_in_hip_frame().
+    leg_ids: The leg of each row of joint_angles.
+
+  Returns:
+    Array of shape (..., 3, 3). Entry [i, j] is the derivative of toe
+    coordinate i w.r.t. joint j of the leg, the same as the leg's columns of
+    the pybullet Jacobian in the base frame.
+  """
+  joint_angles = _leg_rows(joint_angles)
+  abduction, hip, knee = np.moveaxis(joint_angles, -1, 0)
+  hip_length = HIP_LENGTH * HIP_LENGTH_SIGNS[
+    _leg_ids(abduction.shape, leg_ids)]
+  leg_length = np.sqrt(
+    UPPER_LEG_LENGTH ** 2 + LOWER_LEG_LENGTH ** 2 +
+    2 * UPPER_LEG_LENGTH * LOWER_LEG_LENGTH * np.cos(knee))
+  # d leg_length / d knee
+  leg_length_rate = -(UPPER_LEG_LENGTH * LOWER_LEG_LENGTH *
+                      np.sin(knee)) / leg_length
+  swing = hip + knee / 2
+  sin_swing, cos_swing = np.sin(swing), np.cos(swing)
+  cos_abduction, sin_abduction = np.cos(abduction), np.sin(abduction)
+  z_sagittal = -leg_length * cos_swing
+  # Sagittal plane coordinates w.r.t. the hip and the knee.
+  dx_dhip = -leg_length * cos_swing
+  dz_dhip = leg_length * sin_swing
+  dx_dknee = -leg_length_rate * sin_swing + dx_dhip / 2
+  dz_dknee = -leg_length_rate * cos_swing + dz_dhip / 2
+
+  jacobians = np.zeros(abduction.shape + (3, 3))
+  jacobians[..., 0, 1] = dx_dhip
+  jacobians[..., 0, 2] = dx_dknee
+  jacobians[..., 1, 0] = -sin_abduction * hip_length - (
+    cos_abduction * z_sagittal)
+  jacobians[..., 1, 1] = -sin_abduction * dz_dhip
+  jacobians[..., 1, 2] = -sin_abduction * dz_dknee
+  jacobians[..., 2, 0] = cos_abduction * hip_length - (
+    sin_abduction * z_sagittal)
+  jacobians[..., 2, 1] = cos_abduction * dz_dhip
+  jacobians[..., 2, 2] = cos_abduction * dz_dknee
+  return jacobians
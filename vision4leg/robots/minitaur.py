@@ -22,6 +22,7 @@ from vision4leg.robots import action_filter
 from vision4leg.robots import robot_config
 from vision4leg.robots import minitaur_motor
 from vision4leg.robots import minitaur_constants
+from vision4leg.robots import observation_latency
 import numpy as np
 import re
 import math
@@ -54,10 +55,29 @@ _CHASSIS_NAME_PATTERN = re.compile(r"chassis\D*center")
 _MOTOR_NAME_PATTERN = re.compile(r"motor\D*joint")
 _KNEE_NAME_PATTERN = re.compile(r"knee\D*")
 _BRACKET_NAME_PATTERN = re.compile(r"motor\D*_bracket_joint")
+# Fields of the tuples returned by getContactPoints.
+_BODY_B_FIELD_NUMBER = 2
+_LINK_A_FIELD_NUMBER = 3
+_LINK_B_FIELD_NUMBER = 4
 _LEG_NAME_PATTERN1 = re.compile(r"hip\D*joint")
 _LEG_NAME_PATTERN2 = re.compile(r"hip\D*link")
 _LEG_NAME_PATTERN3 = re.compile(r"motor\D*link")
 SENSOR_NOISE_STDDEV = (0.0, 0.0, 0.0, 0.0, 0.0)
+# Robot attributes updated by the settle down motion, they are stored along
+# with the simulation state of a settled robot.
+_SETTLED_STATE_ATTRIBUTES = (
+  "_joint_states", "_joint_positions", "_joint_velocities",
+  "_base_position", "_base_orientation", "_base_velocity",
+  "_base_angular_velocity",
+  "_observation_history", "_control_observation", "_observed_motor_torques", "_applied_motor_torque",
+  "_overheat_counter", "_motor_enabled_list", "_is_safe",
+  "_state_action_counter", "last_state_time", "last_action_time")
+# Robot attributes that change while stepping, saved with the pybullet state
+# by GetSnapshot().
+_SNAPSHOT_ATTRIBUTES = _SETTLED_STATE_ATTRIBUTES + (
+  "_step_counter", "_last_action")
+# Upper bound of the settled states kept per cache.
+_MAX_SETTLED_STATES = 16
 MINITAUR_DEFAULT_MOTOR_DIRECTIONS = (-1, -1, -1, -1, 1, 1, 1, 1)
 MINITAUR_DEFAULT_MOTOR_OFFSETS = (0, 0, 0, 0, 0, 0, 0, 0)
 MINITAUR_NUM_MOTORS = 8
@@ -118,7 +138,8 @@ class Minitaur(object):
                enable_action_interpolation=False,
                enable_action_filter=False,
                is_render=False,
-               reset_time=-1):
+               reset_time=-1,
+               settled_state_cache=None):
     """Constructs a minitaur and reset it to the initial states.
 
     Args:
@@ -167,8 +188,16 @@ class Minitaur(object):
         with the previous action in order to produce smoother motions
       enable_action_filter: Boolean specifying if a lowpass filter should be
         used to smooth actions.
+      is_render: Whether the simulation is rendered in a GUI. The debug
+        visualizer camera follows the robot if so, or if the client is
+        connected in GUI mode.
+      settled_state_cache: An optional dict to store the state of the robot
+        after the settle down motion of Reset(). Later resets from the same
+        start pose restore it instead of simulating the motion again. It can
+        be shared by the robots that are rebuilt in the same world.
     """
     self.reset_position_random_range = reset_position_random_range
+    self._settled_state_cache = settled_state_cache
     self.num_motors = num_motors
     self.num_legs = self.num_motors // dofs_per_leg
     self._pybullet_client = pybullet_client
@@ -182,14 +211,23 @@ class Minitaur(object):
     self._pd_latency = pd_latency
     self._control_latency = control_latency
     self._observation_noise_stdev = observation_noise_stdev
-    self._observation_history = collections.deque(maxlen=100)
+    self._observation_history = observation_latency.ObservationHistory(
+      capacity=100)
     self._control_observation = []
     self._chassis_link_ids = [-1]
     self._leg_link_ids = []
     self._motor_link_ids = []
     self._foot_link_ids = []
+    # Link and contact states of the current substep, queried on first use.
+    self._foot_link_states = None
+    self._contact_points = None
 
     self._is_render = is_render
+    # Only a GUI shows the debug visualizer camera that follows the robot,
+    # headless simulations skip those calls on every substep.
+    self._follow_camera = is_render or (
+      self._pybullet_client.getConnectionInfo()["connectionMethod"] ==
+      self._pybullet_client.GUI)
 
     self._motor_overheat_protection = motor_overheat_protection
     self._on_rack = on_rack
@@ -255,20 +293,19 @@ class Minitaur(object):
   def _StepInternal(self, action, motor_control_mode):
     self.ApplyAction(action, motor_control_mode)
     self._pybullet_client.stepSimulation()
-
-    base_pos = self.GetBasePosition()
-    # RECORD_DICT["joint_angle"].append(np.array(base_pos))
-    # np.save("trajectory", RECORD_DICT)
-    # print(RECORD_DICT)
-    # if self._is_render:
-
-    # Also keep the previous orientation of the camera set by the user.
-    [yaw, pitch,
-     dist] = self._pybullet_client.getDebugVisualizerCamera()[8:11]
-    self._pybullet_client.resetDebugVisualizerCamera(dist, yaw, pitch,
-                                                     base_pos)
-    self._pybullet_client.configureDebugVisualizer(
-      self._pybullet_client.COV_ENABLE_SINGLE_STEP_RENDERING, 1)
+    self._FinishStepInternal()
+
+  def _FinishStepInternal(self):
+    """Reads the robot state after a simulation step."""
+    if self._follow_camera:
+      base_pos = self.GetBasePosition()
+      # Also keep the previous orientation of the camera set by the user.
+      [yaw, pitch,
+       dist] = self._pybullet_client.getDebugVisualizerCamera()[8:11]
+      self._pybullet_client.resetDebugVisualizerCamera(dist, yaw, pitch,
+                                                       base_pos)
+      self._pybullet_client.configureDebugVisualizer(
+        self._pybullet_client.COV_ENABLE_SINGLE_STEP_RENDERING, 1)
 
     self.ReceiveObservation()
     self._state_action_counter += 1
@@ -285,6 +322,30 @@ class Minitaur(object):
 
     self._last_action = action
 
+  def StepSubsteps(self, action):
+    """Steps like Step(), but leaves stepSimulation() to the caller.
+
+    A generator that yields once per action repeat, after the motor commands
+    of that simulation step are applied. Robots that share one pybullet world
+    are advanced together: apply the commands of all of them, step the world
+    once, resume all of them. Exhausting the generator reads the state after
+    the last step.
+
+    Args:
+      action: The action of one env step, as for Step().
+    """
+    if self._enable_action_filter:
+      action = self._FilterAction(action)
+
+    for i in range(self._action_repeat):
+      proc_action = self.ProcessAction(action, i)
+      self.ApplyAction(proc_action, self._motor_control_mode)
+      yield
+      self._FinishStepInternal()
+      self._step_counter += 1
+
+    self._last_action = action
+
   def Terminate(self):
     pass
 
@@ -451,6 +512,7 @@ class Minitaur(object):
       self._BuildMotorIdList()
       self._RecordMassInfoFromURDF()
       self._RecordInertiaInfoFromURDF()
+      self._nominal_dynamics = self._GetDynamicsSignature()
       self.ResetPose(add_constraint=True)
     else:
       position = self._GetDefaultInitPosition()
@@ -473,10 +535,93 @@ class Minitaur(object):
     self._state_action_counter = 0
     self._is_safe = True
     self._last_action = None
-    self._SettleDownForReset(default_motor_angles, reset_time)
+    self._SettleDownOrRestore(default_motor_angles, reset_time)
     if self._enable_action_filter:
       self._ResetActionFilter()
 
+  def _SettleDownOrRestore(self, default_motor_angles, reset_time):
+    """Settles the robot down or restores a cached settled state.
+
+    The cache is keyed by the start pose, the default motor angles and the
+    reset time. It is bypassed when the masses, inertias or frictions differ
+    from the URDF, e.g. under domain randomization, since the settled state
+    depends on them.
+    """
+    if self._settled_state_cache is None or reset_time <= 0 or (
+        self._GetDynamicsSignature() != self._nominal_dynamics):
+      self._SettleDownForReset(default_motor_angles, reset_time)
+      return
+
+    position, orientation = (
+      self._pybullet_client.getBasePositionAndOrientation(self.quadruped))
+    key = (position, orientation, reset_time,
+           None if default_motor_angles is None else
+           tuple(default_motor_angles))
+    settled_state = self._settled_state_cache.get(key)
+    if settled_state is not None:
+      self._RestoreSettledState(settled_state)
+      return
+
+    self._SettleDownForReset(default_motor_angles, reset_time)
+    if len(self._settled_state_cache) < _MAX_SETTLED_STATES:
+      self._settled_state_cache[key] = self._GetSettledState()
+
+  def _GetDynamicsSignature(self):
+    """Returns the masses, frictions and inertias of all links."""
+    num_joints = self._pybullet_client.getNumJoints(self.quadruped)
+    return tuple(
+      self._pybullet_client.getDynamicsInfo(self.quadruped, link_id)[:3]
+      for link_id in range(-1, num_joints))
+
+  def _GetSettledState(self):
+    """Captures the simulation and observation state of the robot."""
+    num_joints = self._pybullet_client.getNumJoints(self.quadruped)
+    joint_states = self._pybullet_client.getJointStates(
+      self.quadruped, range(num_joints))
+    return {
+      "base": self._pybullet_client.getBasePositionAndOrientation(
+        self.quadruped),
+      "base_velocity": self._pybullet_client.getBaseVelocity(
+        self.quadruped),
+      "joints": [joint_state[:2] for joint_state in joint_states],
+      "attributes": {
+        name: copy.deepcopy(getattr(self, name))
+        for name in _SETTLED_STATE_ATTRIBUTES
+      },
+    }
+
+  def _RestoreSettledState(self, settled_state):
+    """Restores a state captured by _GetSettledState()."""
+    self._pybullet_client.resetBasePositionAndOrientation(
+      self.quadruped, *settled_state["base"])
+    self._pybullet_client.resetBaseVelocity(
+      self.quadruped, *settled_state["base_velocity"])
+    for joint_id, (position, velocity) in enumerate(settled_state["joints"]):
+      self._pybullet_client.resetJointState(
+        self.quadruped, joint_id, position, targetVelocity=velocity)
+    for name, value in settled_state["attributes"].items():
+      setattr(self, name, copy.deepcopy(value))
+    self._foot_link_states = None
+    self._contact_points = None
+
+  def GetSnapshot(self):
+    """Captures the robot attributes that change while stepping.
+
+    The simulation state itself is saved by pybullet's saveState(), see
+    LocomotionGymEnv.save_snapshot().
+    """
+    names = _SNAPSHOT_ATTRIBUTES
+    if self._enable_action_filter:
+      names += ("_action_filter",)
+    return {name: copy.deepcopy(getattr(self, name)) for name in names}
+
+  def RestoreSnapshot(self, snapshot):
+    """Restores the attributes captured by GetSnapshot()."""
+    for name, value in snapshot.items():
+      setattr(self, name, copy.deepcopy(value))
+    self._foot_link_states = None
+    self._contact_points = None
+
   def _LoadRobotURDF(self):
     """Loads the URDF file for the robot."""
     urdf_file = self.GetURDFFile()
@@ -642,8 +787,7 @@ class Minitaur(object):
     Returns:
       The velocity of minitaur's base.
     """
-    velocity, _ = self._pybullet_client.getBaseVelocity(self.quadruped)
-    return velocity
+    return self._base_velocity
 
   def GetTrueBaseRollPitchYaw(self):
     """Get minitaur's base orientation in euler angle in the world frame.
@@ -743,34 +887,44 @@ class Minitaur(object):
       A list of 4 booleans. The ith boolean is True if leg i is in contact with
       ground.
     """
+    ground_links = set(
+      contact[_LINK_A_FIELD_NUMBER] for contact in self._GetContactPoints()
+      if contact[_BODY_B_FIELD_NUMBER] == 0 and
+      contact[_LINK_B_FIELD_NUMBER] == -1)
     contacts = []
     for leg_idx in range(MINITAUR_NUM_MOTORS // 2):
       link_id_1 = self._foot_link_ids[leg_idx * 2]
       link_id_2 = self._foot_link_ids[leg_idx * 2 + 1]
-      contact_1 = bool(
-        self._pybullet_client.getContactPoints(bodyA=0,
-                                               bodyB=self.quadruped,
-                                               linkIndexA=-1,
-                                               linkIndexB=link_id_1))
-      contact_2 = bool(
-        self._pybullet_client.getContactPoints(bodyA=0,
-                                               bodyB=self.quadruped,
-                                               linkIndexA=-1,
-                                               linkIndexB=link_id_2))
-      contacts.append(contact_1 or contact_2)
+      contacts.append(link_id_1 in ground_links or link_id_2 in ground_links)
     return contacts
 
+  def _GetContactPoints(self):
+    """Returns the contact points of the robot in the current substep."""
+    if self._contact_points is None:
+      self._contact_points = self._pybullet_client.getContactPoints(
+        bodyA=self.quadruped)
+    return self._contact_points
+
+  def _GetFootLinkStates(self):
+    """Returns the link states of the feet in the current substep."""
+    if self._foot_link_states is None:
+      self._foot_link_states = self._pybullet_client.getLinkStates(
+        self.quadruped, self._foot_link_ids)
+    return self._foot_link_states
+
   def GetFootPositionsInBaseFrame(self):
     """Get the robot's foot position in the base frame."""
     assert len(self._foot_link_ids) == self.num_legs
-    foot_positions = []
-    for foot_id in self.GetFootLinkIDs():
-      foot_positions.append(
-        kinematics.link_position_in_base_frame(
-          robot=self,
-          link_id=foot_id,
-        ))
-    return np.array(foot_positions)
+    # Same frame as kinematics.link_position_in_base_frame, applied to all
+    # feet at once.
+    inverse_translation, inverse_rotation = (
+      self._pybullet_client.invertTransform(
+        self.GetBasePosition(), self.GetBaseOrientation()))
+    rotation = np.reshape(
+      self._pybullet_client.getMatrixFromQuaternion(inverse_rotation), (3, 3))
+    foot_positions = np.array(
+      [link_state[0] for link_state in self._GetFootLinkStates()])
+    return foot_positions.dot(rotation.T) + inverse_translation
 
   def GetTrueMotorAngles(self):
     """Gets the eight motor angles at the current moment, mapped to [-pi, pi].
@@ -778,9 +932,8 @@ class Minitaur(object):
     Returns:
       Motor angles, mapped to [-pi, pi].
     """
-    motor_angles = [state[0] for state in self._joint_states]
     motor_angles = np.multiply(
-      np.asarray(motor_angles) - np.asarray(self._motor_offset),
+      self._joint_positions - np.asarray(self._motor_offset),
       self._motor_direction)
     return motor_angles
 
@@ -804,9 +957,8 @@ class Minitaur(object):
     Returns:
       Velocities of all eight motors.
     """
-    motor_velocities = [state[1] for state in self._joint_states]
-
-    motor_velocities = np.multiply(motor_velocities, self._motor_direction)
+    motor_velocities = np.multiply(
+      self._joint_velocities, self._motor_direction)
     return motor_velocities
 
   def GetMotorVelocities(self):
@@ -875,8 +1027,7 @@ class Minitaur(object):
     Returns:
       rate of (roll, pitch, yaw) change of the minitaur's base.
     """
-    angular_velocity = self._pybullet_client.getBaseVelocity(self.quadruped)[
-      1]
+    angular_velocity = self._base_angular_velocity
     orientation = self.GetTrueBaseOrientation()
     return self.TransformAngularVelocityToLocalFrame(angular_velocity,
                                                      orientation)
@@ -1193,12 +1344,20 @@ class Minitaur(object):
     """Receive the observation from sensors.
 
     This function is called once per step. The observations are only updated
-    when this function is called.
+    when this function is called. It takes a snapshot of the joint and base
+    states that the getters read from, link states and contact points are
+    queried at most once until the next call.
     """
     self._joint_states = self._pybullet_client.getJointStates(
       self.quadruped, self._motor_id_list)
+    self._joint_positions, self._joint_velocities = np.array(
+      [joint_state[:2] for joint_state in self._joint_states]).T
     self._base_position, orientation = (
       self._pybullet_client.getBasePositionAndOrientation(self.quadruped))
+    self._base_velocity, self._base_angular_velocity = (
+      self._pybullet_client.getBaseVelocity(self.quadruped))
+    self._foot_link_states = None
+    self._contact_points = None
     # Computes the relative orientation relative to the robot's
     # initial_orientation.
     _, self._base_orientation = self._pybullet_client.multiplyTransforms(
@@ -1206,7 +1365,7 @@ class Minitaur(object):
       orientationA=orientation,
       positionB=[0, 0, 0],
       orientationB=self._init_orientation_inv)
-    self._observation_history.appendleft(self.GetTrueObservation())
+    self._observation_history.append(self.GetTrueObservation())
     self._control_observation = self._GetControlObservation()
     self.last_state_time = self._state_action_counter * self.time_step
 
@@ -1214,24 +1373,13 @@ class Minitaur(object):
     """Get observation that is delayed by the amount specified in latency.
 
     Args:
-      latency: The latency (in seconds) of the delayed observation.
+      latency: The latency (in seconds) of the delayed observation, a float or
+        an array with one latency per channel of GetTrueObservation().
 
     Returns:
       observation: The observation which was actually latency seconds ago.
     """
-    if latency <= 0 or len(self._observation_history) == 1:
-      observation = self._observation_history[0]
-    else:
-      n_steps_ago = int(latency / self.time_step)
-      if n_steps_ago + 1 >= len(self._observation_history):
-        return self._observation_history[-1]
-      remaining_latency = latency - n_steps_ago * self.time_step
-      blend_alpha = remaining_latency / self.time_step
-      observation = (
-        (1.0 - blend_alpha) *
-        np.array(self._observation_history[n_steps_ago]) +
-        blend_alpha * np.array(self._observation_history[n_steps_ago + 1]))
-    return observation
+    return self._observation_history.delayed(latency, self.time_step)
 
   def _GetPDObservation(self):
     pd_delayed_observation = self._GetDelayedObservation(self._pd_latency)
@@ -1258,7 +1406,9 @@ class Minitaur(object):
     receiving the observation from microcontroller.
 
     Args:
-      latency: The latency (in seconds) of the control loop.
+      latency: The latency (in seconds) of the control loop. An array with one
+        latency per channel of GetTrueObservation() delays the motor and IMU
+        channels differently, see observation_latency.channel_latencies().
     """
     self._control_latency = latency
 
@@ -0,0 +1,124 @@
+"""A preallocated history of the true robot observations with latency.
+
+The robot appends its true observation after every substep. A delayed
+observation linearly interpolates the two entries around the fractional age
+latency / time_step, like the deque of lists the robot kept before. The
+latency can be one value for all channels or one value per channel, in the
+latter case the gather indices and weights are computed once per latency
+and every channel is read from its own age with two flat takes, so motors and
+the IMU can lag differently at about the cost of a single latency.
+"""
+import numpy as np
+
+
+def channel_latencies(num_motors, motor_latency, imu_latency):
+  """Returns per-channel latencies in the layout of GetTrueObservation().
+
+  Args:
+    num_motors: The number of motors of the robot.
+    motor_latency: The latency (in seconds) of the motor angles, velocities and
+      torques.
+    imu_latency: The latency (in seconds) of the base orientation and the
+      angular velocity.
+
+  Returns:
+    An array of 3 * num_motors motor latencies followed by 7 IMU latencies.
+  """
+  return np.concatenate([
+    np.full(3 * num_motors, motor_latency, dtype=np.float64),
+    np.full(7, imu_latency, dtype=np.float64)])
+
+
+class ObservationHistory(object):
+  """A ring buffer of the most recent observations, age 0 is the newest.
+
+  Every observation is stored twice, at slot i and i + capacity, so the
+  observation of age a is always at slot head + a without wrapping around.
+  """
+
+  def __init__(self, capacity=100, dtype=np.float64):
+    self.capacity = capacity
+    self.dtype = dtype
+    # Allocated on the first append, when the observation size is known.
+    self._buffer = None
+    self._flat_buffer = None
+    self._head = 0
+    self._size = 0
+    # Gather indices and weights of the last per-channel latency.
+    self._plan_key = None
+    self._plan = None
+
+  def __len__(self):
+    return self._size
+
+  def clear(self):
+    self._head = 0
+    self._size = 0
+
+  def append(self, observation):
+    """Adds the newest observation, dropping the oldest one when full."""
+    if self._buffer is None:
+      self._buffer = np.zeros(
+        (2 * self.capacity, len(observation)), dtype=self.dtype)
+      self._flat_buffer = self._buffer.reshape(-1)
+    self._head = (self._head - 1) % self.capacity
+    self._buffer[self._head] = observation
+    self._buffer[self._head + self.capacity] = self._buffer[self._head]
+    self._size = min(self._size + 1, self.capacity)
+
+  def __getitem__(self, age):
+    """Returns the observation of the given age, negative ages count from
+    the oldest one."""
+    if age < 0:
+      age += self._size
+    if not 0 <= age < self._size:
+      raise IndexError("observation history index out of range")
+    return self._buffer[self._head + age]
+
+  def _channel_plan(self, latency, time_step):
+    """Returns the flat gather indices and blend weights of the latencies."""
+    key = (latency.tobytes(), time_step, self._size)
+    if key != self._plan_key:
+      num_channels = self._buffer.shape[1]
+      latency = np.maximum(latency, 0.)
+      n_steps_ago = np.floor(latency / time_step)
+      blend_alpha = (latency - n_steps_ago * time_step) / time_step
+      beyond = n_steps_ago + 1 >= self._size
+      n_steps_ago = np.where(beyond, self._size - 1, n_steps_ago).astype(int)
+      blend_alpha = np.where(beyond, 0., blend_alpha)
+      newer = n_steps_ago * num_channels + np.arange(num_channels)
+      self._plan = (newer, newer + num_channels, 1.0 - blend_alpha,
+                    blend_alpha)
+      self._plan_key = key
+    return self._plan
+
+  def delayed(self, latency, time_step):
+    """Returns the observation that was actually latency seconds ago.
+
+    Args:
+      latency: The latency in seconds, a float or an array with one latency
+        per channel.
+      time_step: The time between two appended observations.
+
+    Returns:
+      A new array with the delayed observation. Latencies beyond the history
+      return the oldest observation.
+    """
+    if np.ndim(latency) == 0:
+      if latency <= 0 or self._size == 1:
+        return self[0].copy()
+      n_steps_ago = int(latency / time_step)
+      if n_steps_ago + 1 >= self._size:
+        return self[-1].copy()
+      remaining_latency = latency - n_steps_ago * time_step
+      blend_alpha = remaining_latency / time_step
+      return ((1.0 - blend_alpha) * self._buffer[self._head + n_steps_ago] +
+              blend_alpha * self._buffer[self._head + n_steps_ago + 1])
+
+    newer, older, newer_weight, older_weight = self._channel_plan(
+      np.asarray(latency, dtype=np.float64), time_step)
+    offset = self._head * self._buffer.shape[1]
+    observation = self._flat_buffer.take(newer + offset)
+    observation *= newer_weight
+    observation += older_weight * self._flat_buffer.take(older + offset)
+    return observation
@@ -0,0 +1,119 @@
+"""Depth image post-processing shared by the simulated and the real robot.
+
+The policy sees depth as sqrt(log(d + 1)) of the metric depth clipped to a
+working range. Everything here runs in float32 and in place on the frame, the
+simulator adds randomly placed blinding spots with a single fancy-indexed
+assignment, and the nonlinear transform can be replaced by a precomputed
+lookup table over the clipped range.
+"""
+import numpy as np
+
+# Near / far planes of the simulated head camera.
+CAMERA_NEAR = 0.01
+CAMERA_FAR = 1000.
+
+
+def buffer_to_metric(depth_buffer, near=CAMERA_NEAR, far=CAMERA_FAR, out=None):
+  """Maps an OpenGL depth buffer in [0, 1] to metric depth.
+
+  Args:
+    depth_buffer: The non-linear depth buffer returned by getCameraImage.
+    near: The near plane of the projection.
+    far: The far plane of the projection.
+    out: Optional float array to write the metric depth into, may be
+      depth_buffer itself.
+
+  Returns:
+    The metric depth, far * near / (far - (far - near) * depth_buffer).
+  """
+  out = np.multiply(depth_buffer, -(far - near), out=out)
+  out += far
+  np.divide(far * near, out, out=out)
+  return out
+
+
+class DepthProcessor(object):
+  """Clips metric depth and applies the sqrt(log(d + 1)) transform."""
+
+  def __init__(self,
+               min_depth=0.3,
+               max_depth=10.,
+               invalid_threshold=None,
+               use_lookup_table=False,
+               lookup_table_size=16384,
+               dtype=np.float32):
+    """Initializes the processor.
+
+    Args:
+      min_depth: Depth below this value is clipped to it.
+      max_depth: Depth above this value is clipped to it.
+      invalid_threshold: Readings below this value are treated as missing and
+        set to max_depth (real sensors report 0 for no return). None keeps
+        them, which then get clipped to min_depth.
+      use_lookup_table: Whether to replace the transform by a lookup table
+        over [min_depth, max_depth] with nearest entry rounding. numpy's
+        SIMD log / sqrt are usually faster, only enable it where it
+        measures faster.
+      lookup_table_size: The number of entries of the lookup table.
+      dtype: The dtype of the processed frames.
+    """
+    self.min_depth = min_depth
+    self.max_depth = max_depth
+    self.invalid_threshold = invalid_threshold
+    self.dtype = dtype
+    self.lookup_table = None
+    if use_lookup_table:
+      samples = np.linspace(min_depth, max_depth, lookup_table_size)
+      self.lookup_table = np.sqrt(np.log(samples + 1)).astype(dtype)
+      self._lookup_scale = (lookup_table_size - 1) / (max_depth - min_depth)
+      self._lookup_offset = 0.5 - min_depth * self._lookup_scale
+      self._lookup_index = None
+
+  def add_blinding_spots(self, depth, np_random,
+                         min_spots=3, max_spots=30, value=10):
+    """Sets a random number of random pixels of a (C, H, W) frame to value.
+
+    Draws the same random numbers as the per pixel loop it replaces, so
+    seeded runs see the same spots.
+    """
+    num_spots = np_random.randint(min_spots, max_spots)
+    indices = np_random.randint(
+      0, min(depth.shape[-2:]), size=(num_spots, 2))
+    depth[..., indices[:, 0], indices[:, 1]] = value
+    return depth
+
+  def transform(self, depth, out=None):
+    """Clips the metric depth and applies sqrt(log(d + 1)).
+
+    Args:
+      depth: The metric depth.
+      out: Optional array of self.dtype to write into, may be depth itself.
+        A new array is allocated if None.
+
+    Returns:
+      The processed depth.
+    """
+    if out is None:
+      out = np.array(depth, dtype=self.dtype)
+    elif out is not depth:
+      out[...] = depth
+    if self.invalid_threshold is not None:
+      out[out < self.invalid_threshold] = self.max_depth
+    np.clip(out, self.min_depth, self.max_depth, out=out)
+
+    if self.lookup_table is None:
+      np.log1p(out, out=out)
+      np.sqrt(out, out=out)
+      return out
+
+    if self._lookup_index is None or self._lookup_index.shape != out.shape:
+      self._lookup_index = np.empty(out.shape, dtype=np.intp)
+    # nearest entry: truncate (d - min_depth) * scale + 0.5
+    out *= self._lookup_scale
+    out += self._lookup_offset
+    self._lookup_index[...] = out
+    np.take(self.lookup_table, self._lookup_index, out=out, mode='clip')
+    return out
+
+  def __call__(self, depth, out=None):
+    return self.transform(depth, out=out)